@@ -1,22 +1,32 @@
 # app.py
-from flask import Flask, jsonify, request
+from typing import Optional
+from flask import Blueprint, Flask, jsonify, request
 from flask_cors import CORS
-from dotenv import load_dotenv  
-import os
+from config import load_env
 from supabase_client import supabase_client
+from connection import connection_pool
+from metrics import cache_collector, instrument_flask, registry
+from resilience import protect_flask
+from rate_limit import rate_limited
+from json_provider import install_json_provider, ndjson_response, wants_ndjson
 import uuid
 
-load_dotenv()
+education_api = Blueprint('education', __name__)
 
-app = Flask(__name__)
-CORS(app)
+# Scraping /metrics reports cache counters without forcing the client to be built
+registry.register_collector(cache_collector(
+    'education', lambda: supabase_client.get_cache_stats() if supabase_client.initialized else None))
 
-@app.route('/')
+MAX_LEADERBOARD_LIMIT = 500
+MAX_LEADERBOARD_RADIUS = 50
+MAX_QUIZ_ATTEMPTS_LIMIT = 500
+
+@education_api.route('/')
 def home():
     return "Options Trading Education API with Supabase"
 
 # User Profile Endpoints
-@app.route('/api/user/profile', methods=['POST'])
+@education_api.route('/api/user/profile', methods=['POST'])
 def create_user_profile():
     """Create a new user profile"""
     try:
@@ -46,7 +56,7 @@ def create_user_profile():
             "message": f"Error creating user profile: {str(e)}"
         }), 500
 
-@app.route('/api/user/profile/<user_id>', methods=['GET'])
+@education_api.route('/api/user/profile/<user_id>', methods=['GET'])
 def get_user_profile(user_id):
     """Get user profile by user_id"""
     try:
@@ -69,7 +79,7 @@ def get_user_profile(user_id):
             "message": f"Error getting user profile: {str(e)}"
         }), 500
 
-@app.route('/api/user/<user_id>/stats', methods=['GET'])
+@education_api.route('/api/user/<user_id>/stats', methods=['GET'])
 def get_user_stats(user_id):
     """Get comprehensive user statistics"""
     try:
@@ -93,7 +103,8 @@ def get_user_stats(user_id):
         }), 500
 
 # Experience Endpoints
-@app.route('/api/user/<user_id>/experience', methods=['POST'])
+@education_api.route('/api/user/<user_id>/experience', methods=['POST'])
+@rate_limited('experience')
 def update_user_experience(user_id):
     """Update user experience points"""
     try:
@@ -129,7 +140,8 @@ def update_user_experience(user_id):
         }), 500
 
 # Quiz Endpoints
-@app.route('/api/quiz/attempt', methods=['POST'])
+@education_api.route('/api/quiz/attempt', methods=['POST'])
+@rate_limited('experience')
 def submit_quiz_attempt():
     """Submit a quiz attempt"""
     try:
@@ -148,17 +160,31 @@ def submit_quiz_attempt():
         quiz_data['percentage'] = (quiz_data['score'] / quiz_data['max_score']) * 100
         quiz_data['passed'] = quiz_data['percentage'] >= quiz_data.get('passing_score', 70)
         
-        result = supabase_client.save_quiz_attempt(quiz_data)
+        result = supabase_client.save_quiz_attempt(quiz_data, update_completion=False)
         
         if result:
-            # Award experience for quiz completion
+            # Award experience for quiz completion; the completed quiz is
+            # recorded in the same RPC instead of a separate profile update
             exp_gained = 50 if quiz_data['passed'] else 25  # More exp for passing
-            supabase_client.update_user_exp(
+            profile = supabase_client.update_user_exp(
                 quiz_data['user_id'], 
                 exp_gained, 
-                'quiz_completion'
+                'quiz_completion',
+                completed_quiz_id=quiz_data['quiz_id'] if quiz_data['passed'] else None
             )
             
+            if not profile:
+                # The attempt is stored, so don't invite a retry that would
+                # insert it again; still try to record the completion
+                if quiz_data['passed']:
+                    supabase_client.update_user_quiz_completion(quiz_data['user_id'], quiz_data['quiz_id'])
+                return jsonify({
+                    "success": True,
+                    "message": "Quiz attempt saved, but experience could not be awarded",
+                    "data": result,
+                    "exp_gained": 0
+                }), 201
+            
             return jsonify({
                 "success": True,
                 "message": "Quiz attempt saved successfully",
@@ -177,62 +203,116 @@ def submit_quiz_attempt():
             "message": f"Error saving quiz attempt: {str(e)}"
         }), 500
 
-@app.route('/api/user/<user_id>/quiz-attempts', methods=['GET'])
-def get_user_quiz_attempts(user_id):
-    """Get quiz attempts for a user"""
+def _quiz_attempts_response(user_id: str, quiz_id: Optional[str]):
+    """Shared body of the quiz-attempt history endpoints"""
     try:
-        quiz_id = request.args.get('quiz_id')
-        attempts = supabase_client.get_user_quiz_attempts(user_id, quiz_id)
+        fields = request.args.get('fields')
+        if wants_ndjson(request):
+            return ndjson_response(supabase_client.iter_user_quiz_attempts(user_id, quiz_id, fields))
+        
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_QUIZ_ATTEMPTS_LIMIT)
+        page = supabase_client.get_user_quiz_attempts_page(
+            user_id, quiz_id, limit, request.args.get('cursor'), fields
+        )
         
         return jsonify({
             "success": True,
-            "data": attempts
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error getting quiz attempts: {str(e)}"
         }), 500
 
-@app.route('/api/user/<user_id>/quiz-attempts/<quiz_id>', methods=['GET'])
+@education_api.route('/api/user/<user_id>/quiz-attempts', methods=['GET'])
+def get_user_quiz_attempts(user_id):
+    """Get quiz attempts for a user (paged via `cursor`, columns via `fields`)"""
+    return _quiz_attempts_response(user_id, request.args.get('quiz_id'))
+
+@education_api.route('/api/user/<user_id>/quiz-attempts/<quiz_id>', methods=['GET'])
 def get_specific_quiz_attempts(user_id, quiz_id):
-    """Get attempts for a specific quiz"""
+    """Get attempts for a specific quiz (paged via `cursor`, columns via `fields`)"""
+    return _quiz_attempts_response(user_id, quiz_id)
+
+# Leaderboard Endpoints
+@education_api.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Get leaderboard data (paged via `cursor`, or a window via `around`/`radius`)"""
     try:
-        attempts = supabase_client.get_user_quiz_attempts(user_id, quiz_id)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_LEADERBOARD_LIMIT)
+        around = request.args.get('around')
+        
+        if around:
+            radius = min(max(request.args.get('radius', 5, type=int), 0), MAX_LEADERBOARD_RADIUS)
+            ranking = supabase_client.get_leaderboard_rank(around, radius)
+            if not ranking:
+                return jsonify({
+                    "success": False,
+                    "message": "User not found on leaderboard"
+                }), 404
+            
+            return jsonify({
+                "success": True,
+                "data": ranking['neighbors'],
+                "rank": ranking['rank'],
+                "total": ranking['total'],
+                "next_cursor": ranking['next_cursor']
+            }), 200
+        
+        page = supabase_client.get_leaderboard_page(limit, request.args.get('cursor'))
         
         return jsonify({
             "success": True,
-            "data": attempts
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
-            "message": f"Error getting quiz attempts: {str(e)}"
+            "message": f"Error getting leaderboard: {str(e)}"
         }), 500
 
-# Leaderboard Endpoints
-@app.route('/api/leaderboard', methods=['GET'])
-def get_leaderboard():
-    """Get leaderboard data"""
+@education_api.route('/api/leaderboard/rank/<user_id>', methods=['GET'])
+def get_leaderboard_rank(user_id):
+    """Get a user's rank, optionally with `radius` neighbors on either side"""
     try:
-        limit = request.args.get('limit', 100, type=int)
-        leaderboard_data = supabase_client.get_leaderboard(limit)
+        radius = min(max(request.args.get('radius', 0, type=int), 0), MAX_LEADERBOARD_RADIUS)
+        ranking = supabase_client.get_leaderboard_rank(user_id, radius)
         
-        return jsonify({
-            "success": True,
-            "data": leaderboard_data
-        }), 200
+        if ranking:
+            return jsonify({
+                "success": True,
+                "data": ranking
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User not found on leaderboard"
+            }), 404
         
     except Exception as e:
         return jsonify({
             "success": False,
-            "message": f"Error getting leaderboard: {str(e)}"
+            "message": f"Error getting leaderboard rank: {str(e)}"
         }), 500
 
 # Badge/Achievement Endpoints
-@app.route('/api/user/<user_id>/badge', methods=['POST'])
+@education_api.route('/api/user/<user_id>/badge', methods=['POST'])
+@rate_limited('experience')
 def award_badge(user_id):
     """Award a badge to a user"""
     try:
@@ -268,5 +348,43 @@ def award_badge(user_id):
             "message": f"Error awarding badge: {str(e)}"
         }), 500
 
+# Cache Endpoints
+@education_api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get in-process cache hit/miss/eviction counters"""
+    return jsonify({
+        "success": True,
+        "data": supabase_client.get_cache_stats()
+    }), 200
+
+@education_api.route('/api/write-buffer/stats', methods=['GET'])
+def get_write_buffer_stats():
+    """Get write-behind buffer mode and flush counters"""
+    return jsonify({
+        "success": True,
+        "data": supabase_client.get_write_buffer_stats()
+    }), 200
+
+@education_api.route('/api/pool/stats', methods=['GET'])
+def get_pool_stats():
+    """Get Supabase connection pool configuration and utilization"""
+    return jsonify({
+        "success": True,
+        "data": connection_pool.get_stats()
+    }), 200
+
+def create_app() -> Flask:
+    """Build the Flask app; Supabase clients are created lazily on first use"""
+    load_env()
+    app = Flask(__name__)
+    CORS(app)
+    install_json_provider(app)
+    app.register_blueprint(education_api)
+    instrument_flask(app, 'education')
+    protect_flask(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,826 @@
+# asgi.py - ASGI entry points serving the API from the async clients
+#
+# Run with e.g.:
+#   hypercorn asgi:app --bind 0.0.0.0:5001        (education API)
+#   hypercorn asgi:quiz_app --bind 0.0.0.0:5002   (quiz API)
+#
+# A single worker keeps many requests in flight while they wait on Supabase,
+# and endpoints that need several independent queries issue them concurrently.
+# Both apps get the same JSON provider, /metrics, 503/Retry-After hooks and
+# write rate limits as the Flask apps. NDJSON streaming is Flask-only.
+import uuid
+
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+from async_client import AsyncSupabaseClient, AsyncQuizSupabaseClient
+from json_provider import install_json_provider
+from metrics import cache_collector, instrument_quart, registry
+from rate_limit import rate_limited_quart
+from resilience import protect_quart
+
+clients = {}
+
+registry.register_collector(cache_collector(
+    'education', lambda: clients['supabase'].get_cache_stats() if 'supabase' in clients else None))
+registry.register_collector(cache_collector(
+    'quiz', lambda: clients['quiz'].get_cache_stats() if 'quiz' in clients else None))
+
+
+def create_app(name: str, app_name: str) -> Quart:
+    """Build a Quart app with the shared JSON, metrics and upstream-outage hooks"""
+    app = cors(Quart(name))
+    install_json_provider(app)
+    instrument_quart(app, app_name)
+    protect_quart(app)
+    return app
+
+
+app = create_app(__name__, 'education')
+quiz_app = create_app("quiz_asgi", 'quiz')
+
+MAX_BATCH_ANSWERS = 100
+MAX_LEADERBOARD_LIMIT = 500
+MAX_LEADERBOARD_RADIUS = 50
+MAX_QUIZ_ATTEMPTS_LIMIT = 500
+
+
+def _batch_cost(body) -> int:
+    """Rate-limit tokens for a batch submission: one per answer"""
+    answers = body.get('answers') if isinstance(body, dict) else None
+    return min(max(len(answers), 1), MAX_BATCH_ANSWERS) if isinstance(answers, list) else 1
+
+
+@app.before_serving
+async def create_supabase_client():
+    clients['supabase'] = await AsyncSupabaseClient.create()
+
+
+@quiz_app.before_serving
+async def create_quiz_client():
+    clients['quiz'] = await AsyncQuizSupabaseClient.create()
+
+
+# Education API (mirrors app.py)
+@app.route('/')
+async def home():
+    return "Options Trading Education API with Supabase (async)"
+
+
+@app.route('/api/user/profile', methods=['POST'])
+async def create_user_profile():
+    """Create a new user profile"""
+    try:
+        user_data = await request.get_json()
+
+        # Generate user_id if not provided
+        if 'user_id' not in user_data:
+            user_data['user_id'] = str(uuid.uuid4())
+
+        result = await clients['supabase'].create_user_profile(user_data)
+
+        if result:
+            return jsonify({
+                "success": True,
+                "message": "User profile created successfully",
+                "data": result
+            }), 201
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to create user profile"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error creating user profile: {str(e)}"
+        }), 500
+
+
+@app.route('/api/user/profile/<user_id>', methods=['GET'])
+async def get_user_profile(user_id):
+    """Get user profile by user_id"""
+    try:
+        result = await clients['supabase'].get_user_profile(user_id)
+
+        if result:
+            return jsonify({
+                "success": True,
+                "data": result
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User profile not found"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting user profile: {str(e)}"
+        }), 500
+
+
+@app.route('/api/user/<user_id>/stats', methods=['GET'])
+async def get_user_stats(user_id):
+    """Get comprehensive user statistics"""
+    try:
+        stats = await clients['supabase'].get_user_stats(user_id)
+
+        if stats:
+            return jsonify({
+                "success": True,
+                "data": stats
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User not found"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting user stats: {str(e)}"
+        }), 500
+
+
+@app.route('/api/user/<user_id>/experience', methods=['POST'])
+@rate_limited_quart('experience')
+async def update_user_experience(user_id):
+    """Update user experience points"""
+    try:
+        data = await request.get_json()
+
+        exp_gained = data.get('exp_gained', 0)
+        activity_type = data.get('activity_type', 'unknown')
+
+        if exp_gained <= 0:
+            return jsonify({
+                "success": False,
+                "message": "Experience gained must be positive"
+            }), 400
+
+        result = await clients['supabase'].update_user_exp(user_id, exp_gained, activity_type)
+
+        if result:
+            return jsonify({
+                "success": True,
+                "message": "Experience updated successfully",
+                "data": result
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to update experience"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error updating experience: {str(e)}"
+        }), 500
+
+
+@app.route('/api/quiz/attempt', methods=['POST'])
+@rate_limited_quart('experience')
+async def submit_quiz_attempt():
+    """Submit a quiz attempt"""
+    try:
+        quiz_data = await request.get_json()
+
+        # Validate required fields
+        required_fields = ['user_id', 'quiz_id', 'score', 'max_score', 'answers']
+        for field in required_fields:
+            if field not in quiz_data:
+                return jsonify({
+                    "success": False,
+                    "message": f"Missing required field: {field}"
+                }), 400
+
+        # Calculate percentage and passed status
+        quiz_data['percentage'] = (quiz_data['score'] / quiz_data['max_score']) * 100
+        quiz_data['passed'] = quiz_data['percentage'] >= quiz_data.get('passing_score', 70)
+
+        supabase = clients['supabase']
+        result = await supabase.save_quiz_attempt(quiz_data, update_completion=False)
+
+        if result:
+            # The completed quiz is recorded in the same RPC as the experience
+            exp_gained = 50 if quiz_data['passed'] else 25
+            profile = await supabase.update_user_exp(
+                quiz_data['user_id'],
+                exp_gained,
+                'quiz_completion',
+                completed_quiz_id=quiz_data['quiz_id'] if quiz_data['passed'] else None
+            )
+
+            if not profile:
+                # The attempt is stored, so don't invite a retry that would
+                # insert it again; still try to record the completion
+                if quiz_data['passed']:
+                    await supabase.update_user_quiz_completion(quiz_data['user_id'], quiz_data['quiz_id'])
+                return jsonify({
+                    "success": True,
+                    "message": "Quiz attempt saved, but experience could not be awarded",
+                    "data": result,
+                    "exp_gained": 0
+                }), 201
+
+            return jsonify({
+                "success": True,
+                "message": "Quiz attempt saved successfully",
+                "data": result,
+                "exp_gained": exp_gained
+            }), 201
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to save quiz attempt"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error saving quiz attempt: {str(e)}"
+        }), 500
+
+
+async def _quiz_attempts_response(user_id, quiz_id):
+    """Shared body of the quiz-attempt history endpoints"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_QUIZ_ATTEMPTS_LIMIT)
+        page = await clients['supabase'].get_user_quiz_attempts_page(
+            user_id, quiz_id, limit, request.args.get('cursor'), request.args.get('fields')
+        )
+
+        return jsonify({
+            "success": True,
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quiz attempts: {str(e)}"
+        }), 500
+
+
+@app.route('/api/user/<user_id>/quiz-attempts', methods=['GET'])
+async def get_user_quiz_attempts(user_id):
+    """Get quiz attempts for a user (paged via `cursor`, columns via `fields`)"""
+    return await _quiz_attempts_response(user_id, request.args.get('quiz_id'))
+
+
+@app.route('/api/user/<user_id>/quiz-attempts/<quiz_id>', methods=['GET'])
+async def get_specific_quiz_attempts(user_id, quiz_id):
+    """Get attempts for a specific quiz (paged via `cursor`, columns via `fields`)"""
+    return await _quiz_attempts_response(user_id, quiz_id)
+
+
+@app.route('/api/leaderboard', methods=['GET'])
+async def get_leaderboard():
+    """Get leaderboard data (paged via `cursor`, or a window via `around`/`radius`)"""
+    try:
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_LEADERBOARD_LIMIT)
+        around = request.args.get('around')
+
+        if around:
+            radius = min(max(request.args.get('radius', 5, type=int), 0), MAX_LEADERBOARD_RADIUS)
+            ranking = await clients['supabase'].get_leaderboard_rank(around, radius)
+            if not ranking:
+                return jsonify({
+                    "success": False,
+                    "message": "User not found on leaderboard"
+                }), 404
+
+            return jsonify({
+                "success": True,
+                "data": ranking['neighbors'],
+                "rank": ranking['rank'],
+                "total": ranking['total'],
+                "next_cursor": ranking['next_cursor']
+            }), 200
+
+        page = await clients['supabase'].get_leaderboard_page(limit, request.args.get('cursor'))
+
+        return jsonify({
+            "success": True,
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting leaderboard: {str(e)}"
+        }), 500
+
+
+@app.route('/api/leaderboard/rank/<user_id>', methods=['GET'])
+async def get_leaderboard_rank(user_id):
+    """Get a user's rank, optionally with `radius` neighbors on either side"""
+    try:
+        radius = min(max(request.args.get('radius', 0, type=int), 0), MAX_LEADERBOARD_RADIUS)
+        ranking = await clients['supabase'].get_leaderboard_rank(user_id, radius)
+
+        if ranking:
+            return jsonify({
+                "success": True,
+                "data": ranking
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User not found on leaderboard"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting leaderboard rank: {str(e)}"
+        }), 500
+
+
+@app.route('/api/user/<user_id>/badge', methods=['POST'])
+@rate_limited_quart('experience')
+async def award_badge(user_id):
+    """Award a badge to a user"""
+    try:
+        data = await request.get_json()
+        badge_id = data.get('badge_id')
+        badge_name = data.get('badge_name')
+
+        if not badge_id or not badge_name:
+            return jsonify({
+                "success": False,
+                "message": "badge_id and badge_name are required"
+            }), 400
+
+        success = await clients['supabase'].award_badge(user_id, badge_id, badge_name)
+
+        if success:
+            # Award experience for earning badge
+            await clients['supabase'].update_user_exp(user_id, 100, 'badge_earned')
+
+            return jsonify({
+                "success": True,
+                "message": "Badge awarded successfully"
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to award badge or badge already exists"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error awarding badge: {str(e)}"
+        }), 500
+
+
+# Quiz API (mirrors quiz_app.py)
+@quiz_app.route('/')
+async def quiz_home():
+    return "Trading Quiz API with Supabase (async)"
+
+
+@quiz_app.route('/api/quizzes', methods=['GET'])
+async def get_quizzes():
+    """Get all quizzes, optionally filtered by difficulty"""
+    try:
+        difficulty = request.args.get('difficulty')
+        quizzes = await clients['quiz'].get_all_quizzes(difficulty)
+
+        return jsonify({
+            "success": True,
+            "data": quizzes
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quizzes: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/quizzes/<int:quiz_id>', methods=['GET'])
+async def get_quiz(quiz_id):
+    """Get a specific quiz by ID"""
+    try:
+        quiz = await clients['quiz'].get_quiz_by_id(quiz_id)
+
+        if quiz:
+            return jsonify({
+                "success": True,
+                "data": quiz
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Quiz not found"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quiz: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/quizzes', methods=['POST'])
+async def create_quiz():
+    """Create a new quiz (admin only)"""
+    try:
+        data = await request.get_json()
+
+        required_fields = ['question', 'choices', 'correct_choice', 'xp_reward', 'difficulty']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({
+                    "success": False,
+                    "message": f"Missing required field: {field}"
+                }), 400
+
+        # Validate choices is a list
+        if not isinstance(data['choices'], list) or len(data['choices']) < 2:
+            return jsonify({
+                "success": False,
+                "message": "Choices must be a list with at least 2 options"
+            }), 400
+
+        # Validate correct_choice is within range
+        if not (0 <= data['correct_choice'] < len(data['choices'])):
+            return jsonify({
+                "success": False,
+                "message": "correct_choice must be a valid index for the choices array"
+            }), 400
+
+        # Validate difficulty
+        if data['difficulty'] not in ['easy', 'medium', 'hard']:
+            return jsonify({
+                "success": False,
+                "message": "difficulty must be 'easy', 'medium', or 'hard'"
+            }), 400
+
+        quiz = await clients['quiz'].create_quiz(
+            question=data['question'],
+            choices=data['choices'],
+            correct_choice=data['correct_choice'],
+            xp_reward=data['xp_reward'],
+            difficulty=data['difficulty']
+        )
+
+        if quiz:
+            return jsonify({
+                "success": True,
+                "message": "Quiz created successfully",
+                "data": quiz
+            }), 201
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to create quiz"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error creating quiz: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/profile', methods=['POST'])
+async def create_quiz_user_profile():
+    """Create a new user profile"""
+    try:
+        data = await request.get_json()
+
+        if 'username' not in data:
+            return jsonify({
+                "success": False,
+                "message": "Username is required"
+            }), 400
+
+        # Generate user_id if not provided
+        user_id = data.get('user_id', str(uuid.uuid4()))
+
+        profile = await clients['quiz'].create_user_profile(user_id, data['username'])
+
+        if profile:
+            return jsonify({
+                "success": True,
+                "message": "User profile created successfully",
+                "data": profile
+            }), 201
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to create user profile"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error creating user profile: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/profile', methods=['GET'])
+async def get_quiz_user_profile(user_id):
+    """Get user profile"""
+    try:
+        profile = await clients['quiz'].get_user_profile(user_id)
+
+        if profile:
+            return jsonify({
+                "success": True,
+                "data": profile
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User profile not found"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting user profile: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/stats', methods=['GET'])
+async def get_quiz_user_stats(user_id):
+    """Get user statistics"""
+    try:
+        stats = await clients['quiz'].get_user_stats(user_id)
+
+        if stats:
+            return jsonify({
+                "success": True,
+                "data": stats
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User statistics not found"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting user stats: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/quiz/<int:quiz_id>/answer', methods=['POST'])
+@rate_limited_quart('answer')
+async def submit_quiz_answer(user_id, quiz_id):
+    """Submit an answer to a quiz"""
+    try:
+        data = await request.get_json()
+
+        if 'selected_choice' not in data:
+            return jsonify({
+                "success": False,
+                "message": "selected_choice is required"
+            }), 400
+
+        result = await clients['quiz'].submit_quiz_answer(user_id, quiz_id, data['selected_choice'])
+
+        if result["success"]:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error submitting quiz answer: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/quiz/answers', methods=['POST'])
+@rate_limited_quart('answer', cost=_batch_cost)
+async def submit_quiz_answers(user_id):
+    """Submit answers to several quizzes in one request"""
+    try:
+        data = await request.get_json()
+        answers = data.get('answers') if data else None
+
+        if not isinstance(answers, list) or not answers:
+            return jsonify({
+                "success": False,
+                "message": "answers must be a non-empty list"
+            }), 400
+
+        if len(answers) > MAX_BATCH_ANSWERS:
+            return jsonify({
+                "success": False,
+                "message": f"At most {MAX_BATCH_ANSWERS} answers can be submitted at once"
+            }), 400
+
+        for answer in answers:
+            if not isinstance(answer, dict) or 'quiz_id' not in answer or 'selected_choice' not in answer:
+                return jsonify({
+                    "success": False,
+                    "message": "Each answer requires quiz_id and selected_choice"
+                }), 400
+
+            # bool is a subclass of int, so true/false would pass as quiz 1/0
+            if not isinstance(answer['quiz_id'], int) or isinstance(answer['quiz_id'], bool):
+                return jsonify({
+                    "success": False,
+                    "message": "quiz_id must be an integer"
+                }), 400
+
+        result = await clients['quiz'].submit_quiz_answers(user_id, answers)
+
+        if result["success"]:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error submitting quiz answers: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/quiz-progress', methods=['GET'])
+async def get_user_quiz_progress(user_id):
+    """Get all quiz progress for a user"""
+    try:
+        progress = await clients['quiz'].get_user_quiz_progress(user_id)
+
+        return jsonify({
+            "success": True,
+            "data": progress
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quiz progress: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/quiz/<int:quiz_id>/progress', methods=['GET'])
+async def get_quiz_progress(user_id, quiz_id):
+    """Get progress for a specific quiz"""
+    try:
+        progress = await clients['quiz'].get_quiz_progress(user_id, quiz_id)
+
+        if progress:
+            return jsonify({
+                "success": True,
+                "data": progress
+            }), 200
+        else:
+            return jsonify({
+                "success": True,
+                "data": None,
+                "message": "No progress found for this quiz"
+            }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quiz progress: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/users/<user_id>/balance', methods=['POST'])
+@rate_limited_quart('balance')
+async def update_user_balance(user_id):
+    """Update user balance"""
+    try:
+        data = await request.get_json()
+
+        if 'amount' not in data:
+            return jsonify({
+                "success": False,
+                "message": "amount is required"
+            }), 400
+
+        result = await clients['quiz'].update_user_balance(user_id, data['amount'])
+
+        if result:
+            return jsonify({
+                "success": True,
+                "message": "Balance updated successfully",
+                "data": result
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Failed to update balance"
+            }), 400
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error updating balance: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/leaderboard', methods=['GET'])
+async def get_quiz_leaderboard():
+    """Get leaderboard (paged via `cursor`, or a window via `around`/`radius`)"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_LEADERBOARD_LIMIT)
+        around = request.args.get('around')
+
+        if around:
+            radius = min(max(request.args.get('radius', 5, type=int), 0), MAX_LEADERBOARD_RADIUS)
+            ranking = await clients['quiz'].get_leaderboard_rank(around, radius)
+            if not ranking:
+                return jsonify({
+                    "success": False,
+                    "message": "User not found on leaderboard"
+                }), 404
+
+            return jsonify({
+                "success": True,
+                "data": ranking['neighbors'],
+                "rank": ranking['rank'],
+                "total": ranking['total'],
+                "next_cursor": ranking['next_cursor']
+            }), 200
+
+        page = await clients['quiz'].get_leaderboard_page(limit, request.args.get('cursor'))
+
+        return jsonify({
+            "success": True,
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
+        }), 200
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting leaderboard: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/leaderboard/rank/<user_id>', methods=['GET'])
+async def get_quiz_leaderboard_rank(user_id):
+    """Get a user's rank, optionally with `radius` neighbors on either side"""
+    try:
+        radius = min(max(request.args.get('radius', 0, type=int), 0), MAX_LEADERBOARD_RADIUS)
+        ranking = await clients['quiz'].get_leaderboard_rank(user_id, radius)
+
+        if ranking:
+            return jsonify({
+                "success": True,
+                "data": ranking
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User not found on leaderboard"
+            }), 404
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting leaderboard rank: {str(e)}"
+        }), 500
+
+
+@quiz_app.route('/api/quiz-statistics', methods=['GET'])
+async def get_quiz_statistics():
+    """Get quiz statistics"""
+    try:
+        stats = await clients['quiz'].get_quiz_statistics()
+
+        return jsonify({
+            "success": True,
+            "data": stats
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting quiz statistics: {str(e)}"
+        }), 500
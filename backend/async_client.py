@@ -0,0 +1,422 @@
+# async_client.py - asyncio versions of SupabaseClient and QuizSupabaseClient
+#
+# Only the execute layer lives here: queries are built and rows shaped by the
+# helpers in supabase_client.py and quiz_client.py, so both stacks issue the
+# same requests and writes go through the same atomic RPCs.
+import asyncio
+import copy
+import os
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+import quiz_client as quiz_queries
+import supabase_client as education_queries
+from connection import connection_pool
+from leaderboard_index import CURSOR_FIELDS, LeaderboardIndex
+from pagination import decode_cursor, keyset_query, split_page
+from quiz_catalog import QuizCatalog
+from resilience import UpstreamUnavailable, note_served_stale
+from supabase_client import QUIZ_ATTEMPT_CURSOR_FIELDS, build_user_stats, quiz_attempt_columns, remember_profile
+
+if TYPE_CHECKING:
+    from supabase import AClient
+
+
+async def _create_supabase() -> "AClient":
+    return await connection_pool.get_async_client()
+
+
+async def _fetch_all(make_query: Callable, order: List[Tuple[str, bool]], page_size: int = 1000) -> List[Dict]:
+    """Every row of a select in `order`, fetched a keyset page at a time (see pagination.iter_keyset)"""
+    rows, after = [], None
+    while True:
+        page, more = split_page((await keyset_query(make_query(), order, after, page_size).execute()).data, page_size)
+        rows.extend(page)
+        if not more:
+            return rows
+        after = [page[-1][column] for column, _ in order]
+
+
+async def _ensure_seeded(index: LeaderboardIndex, lock: asyncio.Lock, make_query: Callable,
+                         order: List[Tuple[str, bool]]) -> bool:
+    """Async LeaderboardIndex.ensure_seeded: one load at a time, and callers
+    keep reading the current index while a reseed is in flight"""
+    if index.is_stale() and not (lock.locked() and index.seeded):
+        async with lock:
+            if index.is_stale():
+                try:
+                    index.install(await _fetch_all(make_query, order))
+                except Exception as e:
+                    index.record_failure(e)
+    return index.seeded
+
+
+async def _leaderboard_page(client, queries, limit: int, cursor: Optional[str]) -> Dict:
+    """Shared body of the async get_leaderboard_page methods"""
+    # A malformed cursor is the caller's error, so let ValueError through
+    after = decode_cursor(cursor, CURSOR_FIELDS) if cursor else None
+    try:
+        if await client._ensure_leaderboard():
+            return client.leaderboard.cursor_page(after, limit)
+
+        result = await queries.leaderboard_page_query(client.supabase, after, limit).execute()
+        return client.leaderboard.rows_page(*split_page(result.data, limit))
+    except Exception as e:
+        print(f"Error getting leaderboard page: {e}")
+        return {'entries': [], 'next_cursor': None}
+
+
+async def _leaderboard_rank(client, user_id: str, radius: int) -> Optional[Dict]:
+    """Shared body of the async get_leaderboard_rank methods"""
+    try:
+        if not await client._ensure_leaderboard():
+            return None
+        return client.leaderboard.ranking(user_id, radius)
+    except Exception as e:
+        print(f"Error getting leaderboard rank: {e}")
+        return None
+
+
+class AsyncSupabaseClient:
+    """Async counterpart of SupabaseClient.
+
+    Independent reads are issued concurrently with asyncio.gather, so e.g.
+    get_user_stats costs roughly its slowest query instead of the sum.
+    experience_logs rows are always written inside the award_experience RPC
+    (EXP_LOG_DURABILITY=sync): there is no flush thread on the event loop.
+    """
+
+    def __init__(self, supabase: "AClient"):
+        self.supabase = supabase
+        self.profile_cache = education_queries.new_profile_cache()
+        # Seeded by _ensure_leaderboard(), moved along by this client's
+        # writes; other processes' XP changes show up at the next reseed
+        self.leaderboard = education_queries.new_leaderboard_index()
+        self._leaderboard_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls) -> "AsyncSupabaseClient":
+        return cls(await _create_supabase())
+
+    def get_cache_stats(self) -> Dict:
+        """Get profile cache hit/miss/eviction counters"""
+        return {'profiles': self.profile_cache.stats()}
+
+    def _cache_profile(self, profile: Optional[Dict]) -> Optional[Dict]:
+        return remember_profile(self.profile_cache, self.leaderboard, profile)
+
+    async def create_user_profile(self, user_data: Dict) -> Optional[Dict]:
+        """Create a new user profile with initial experience data"""
+        try:
+            result = await education_queries.profile_insert_query(self.supabase, user_data).execute()
+            return self._cache_profile(result.data[0] if result.data else None)
+        except Exception as e:
+            print(f"Error creating user profile: {e}")
+            return None
+
+    async def update_user_exp(self, user_id: str, exp_gained: int, activity_type: str,
+                              completed_quiz_id: Optional[str] = None) -> Optional[Dict]:
+        """Update user experience points and level"""
+        return await self.award_experience(user_id, exp_gained, activity_type, completed_quiz_id)
+
+    async def award_experience(self, user_id: str, exp_gained: int, activity_type: str,
+                               completed_quiz_id: Optional[str] = None,
+                               metadata: Optional[Dict] = None) -> Optional[Dict]:
+        """Award experience in a single round trip via the award_experience RPC"""
+        try:
+            result = await education_queries.award_experience_call(
+                self.supabase, user_id, exp_gained, activity_type, completed_quiz_id, metadata, log=True
+            ).execute()
+            return self._cache_profile(result.data[0] if result.data else None)
+        except Exception as e:
+            print(f"Error awarding experience: {e}")
+            return None
+
+    async def save_quiz_attempt(self, quiz_attempt_data: Dict, update_completion: bool = True) -> Optional[Dict]:
+        """Save a quiz attempt (see SupabaseClient.save_quiz_attempt)"""
+        try:
+            result = await education_queries.quiz_attempt_insert_query(self.supabase, quiz_attempt_data).execute()
+
+            if update_completion and quiz_attempt_data.get('passed', False):
+                await self.update_user_quiz_completion(
+                    quiz_attempt_data.get('user_id'),
+                    quiz_attempt_data.get('quiz_id')
+                )
+
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error saving quiz attempt: {e}")
+            return None
+
+    async def update_user_quiz_completion(self, user_id: str, quiz_id: str) -> None:
+        """Update user's completed quizzes list"""
+        try:
+            result = await education_queries.completed_quiz_call(self.supabase, user_id, quiz_id).execute()
+            if result.data:
+                self._cache_profile(result.data[0])
+        except Exception as e:
+            print(f"Error updating quiz completion: {e}")
+
+    async def award_badge(self, user_id: str, badge_id: str, badge_name: str) -> bool:
+        """Award a badge to a user"""
+        try:
+            result = await education_queries.badge_call(self.supabase, user_id, badge_id, badge_name).execute()
+            if not result.data:
+                return False
+            self._cache_profile(result.data[0])
+            return True
+        except Exception as e:
+            print(f"Error awarding badge: {e}")
+            return False
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict]:
+        """Get user profile by user_id"""
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        try:
+            result = await education_queries.profile_query(self.supabase, user_id).execute()
+            profile = result.data[0] if result.data else None
+            if profile:
+                self.profile_cache.set(user_id, copy.deepcopy(profile))
+            return profile
+        except UpstreamUnavailable as e:
+            # Serve the last known profile rather than failing while upstream is down
+            print(f"Error getting user profile: {e}")
+            stale = self.profile_cache.get_stale(user_id)
+            if stale is None:
+                return None
+            note_served_stale()
+            return copy.deepcopy(stale)
+        except Exception as e:
+            print(f"Error getting user profile: {e}")
+            return None
+
+    async def get_user_quiz_attempts_page(self, user_id: str, quiz_id: str = None, limit: int = 50,
+                                          cursor: Optional[str] = None, fields: Optional[str] = None) -> Dict:
+        """Get one keyset page of a user's quiz attempts, newest first, and the next cursor"""
+        columns = quiz_attempt_columns(fields)
+        after = decode_cursor(cursor, QUIZ_ATTEMPT_CURSOR_FIELDS) if cursor else None
+        try:
+            result = await education_queries.quiz_attempts_page_query(
+                self.supabase, user_id, quiz_id, columns, after, limit
+            ).execute()
+            return education_queries.quiz_attempts_page(result.data, limit)
+        except Exception as e:
+            print(f"Error getting quiz attempts page: {e}")
+            return {'entries': [], 'next_cursor': None}
+
+    async def _ensure_leaderboard(self) -> bool:
+        return await _ensure_seeded(self.leaderboard, self._leaderboard_lock,
+                                    lambda: education_queries.leaderboard_rows_query(self.supabase),
+                                    education_queries.LEADERBOARD_ROWS_ORDER)
+
+    async def get_leaderboard_page(self, limit: int = 100, cursor: Optional[str] = None) -> Dict:
+        """Get one keyset page of the leaderboard and the cursor for the next page"""
+        return await _leaderboard_page(self, education_queries, limit, cursor)
+
+    async def get_leaderboard_rank(self, user_id: str, radius: int = 0) -> Optional[Dict]:
+        """Get a user's leaderboard rank and the users ranked around them"""
+        return await _leaderboard_rank(self, user_id, radius)
+
+    async def _activity_counts(self, user_id: str) -> Dict:
+        result = await education_queries.activity_counts_query(self.supabase, user_id).execute()
+        return result.data[0] if result.data else {}
+
+    async def get_user_stats(self, user_id: str) -> Optional[Dict]:
+        """Get comprehensive user statistics, fetching all parts concurrently"""
+        try:
+            user, counts = await asyncio.gather(
+                self.get_user_profile(user_id),
+                self._activity_counts(user_id)
+            )
+            if not user:
+                return None
+
+            return build_user_stats(user, counts)
+        except Exception as e:
+            print(f"Error getting user stats: {e}")
+            return None
+
+
+class AsyncQuizSupabaseClient:
+    """Async counterpart of QuizSupabaseClient"""
+
+    def __init__(self, supabase: "AClient"):
+        self.supabase = supabase
+        # Loaded asynchronously by _ensure_catalog(), so no sync loader
+        self.catalog = QuizCatalog(ttl=float(os.getenv("QUIZ_CATALOG_TTL", "300")),
+                                   retry_interval=float(os.getenv("QUIZ_CATALOG_RETRY_SECONDS", "5")))
+        self._catalog_lock = asyncio.Lock()
+        self.leaderboard = quiz_queries.new_leaderboard_index()
+        self._leaderboard_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls) -> "AsyncQuizSupabaseClient":
+        return cls(await _create_supabase())
+
+    async def _ensure_catalog(self, quiz_id: Optional[int] = None) -> None:
+        """Reload the quiz catalog if it is stale (or misses quiz_id)"""
+        if not self.catalog.needs_refresh(quiz_id):
+            return
+        async with self._catalog_lock:
+            if not self.catalog.needs_refresh(quiz_id):
+                return
+            try:
+                result = await quiz_queries.catalog_query(self.supabase).execute()
+                self.catalog.install(result.data or [])
+            except Exception as e:
+                self.catalog.record_failure(e)
+
+    def get_cache_stats(self) -> Dict:
+        """Get quiz catalog cache counters"""
+        return {'quiz_catalog': self.catalog.stats()}
+
+    async def get_all_quizzes(self, difficulty: Optional[str] = None) -> List[Dict]:
+        """Get all quizzes, optionally filtered by difficulty"""
+        try:
+            await self._ensure_catalog()
+            return self.catalog.all(difficulty)
+        except Exception as e:
+            print(f"Error getting quizzes: {e}")
+            return []
+
+    async def get_quiz_by_id(self, quiz_id: int) -> Optional[Dict]:
+        """Get a specific quiz by ID"""
+        try:
+            await self._ensure_catalog(quiz_id)
+            return self.catalog.get(quiz_id)
+        except Exception as e:
+            print(f"Error getting quiz {quiz_id}: {e}")
+            return None
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict]:
+        """Get user profile by user_id"""
+        try:
+            result = await quiz_queries.profile_query(self.supabase, user_id).execute()
+            return result.data
+        except Exception as e:
+            print(f"Error getting user profile: {e}")
+            return None
+
+    def _track_profile(self, profile: Optional[Dict]) -> Optional[Dict]:
+        if profile:
+            self.leaderboard.update(profile)
+        return profile
+
+    async def create_quiz(self, question: str, choices: List[str], correct_choice: int,
+                          xp_reward: int, difficulty: str) -> Optional[Dict]:
+        """Create a new quiz"""
+        try:
+            result = await quiz_queries.quiz_insert_query(
+                self.supabase, question, choices, correct_choice, xp_reward, difficulty
+            ).execute()
+            self.catalog.invalidate()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error creating quiz: {e}")
+            return None
+
+    async def create_user_profile(self, user_id: str, username: str) -> Optional[Dict]:
+        """Create a new user profile"""
+        try:
+            result = await quiz_queries.profile_insert_query(self.supabase, user_id, username).execute()
+            return self._track_profile(result.data[0] if result.data else None)
+        except Exception as e:
+            print(f"Error creating user profile: {e}")
+            return None
+
+    async def update_user_xp(self, user_id: str, xp_to_add: int) -> Optional[Dict]:
+        """Add XP to user and update level automatically"""
+        try:
+            result = await quiz_queries.add_user_xp_call(self.supabase, user_id, xp_to_add).execute()
+            return self._track_profile(result.data[0] if result.data else None)
+        except Exception as e:
+            print(f"Error updating user XP: {e}")
+            return None
+
+    async def update_user_balance(self, user_id: str, amount: int) -> Optional[Dict]:
+        """Update user balance (can be positive or negative)"""
+        try:
+            user = await self.get_user_profile(user_id)
+            if not user:
+                return None
+
+            result = await quiz_queries.balance_update_query(self.supabase, user, amount).execute()
+            return self._track_profile(result.data[0] if result.data else None)
+        except Exception as e:
+            print(f"Error updating user balance: {e}")
+            return None
+
+    async def submit_quiz_answer(self, user_id: str, quiz_id: int, selected_choice: int) -> Dict:
+        """Submit a quiz answer and update progress"""
+        return quiz_queries.single_answer_result(
+            await self.submit_quiz_answers(user_id, [{'quiz_id': quiz_id, 'selected_choice': selected_choice}])
+        )
+
+    async def submit_quiz_answers(self, user_id: str, answers: List[Dict]) -> Dict:
+        """Submit several quiz answers with one submit_quiz_answers RPC"""
+        try:
+            for quiz_id in {answer['quiz_id'] for answer in answers}:
+                await self._ensure_catalog(quiz_id)
+            results, graded = quiz_queries.grade_answers(self.catalog, answers)
+            if graded:
+                result = await quiz_queries.submit_answers_call(self.supabase, user_id, graded).execute()
+                profile = quiz_queries.apply_submission(user_id, results, result.data or [])
+                if profile is None:
+                    return {"success": False, "message": "User profile not found"}
+                self._track_profile(profile)
+
+            return quiz_queries.batch_result(results)
+        except Exception as e:
+            print(f"Error submitting quiz answers: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def get_user_quiz_progress(self, user_id: str) -> List[Dict]:
+        """Get all quiz progress for a user"""
+        try:
+            result = await quiz_queries.quiz_progress_query(self.supabase, user_id).execute()
+            return result.data or []
+        except Exception as e:
+            print(f"Error getting user quiz progress: {e}")
+            return []
+
+    async def get_quiz_progress(self, user_id: str, quiz_id: int) -> Optional[Dict]:
+        """Get progress for a specific quiz"""
+        try:
+            result = await quiz_queries.single_quiz_progress_query(self.supabase, user_id, quiz_id).execute()
+            return result.data
+        except Exception as e:
+            print(f"Error getting quiz progress: {e}")
+            return None
+
+    async def _ensure_leaderboard(self) -> bool:
+        return await _ensure_seeded(self.leaderboard, self._leaderboard_lock,
+                                    lambda: quiz_queries.leaderboard_rows_query(self.supabase),
+                                    quiz_queries.LEADERBOARD_ROWS_ORDER)
+
+    async def get_leaderboard_page(self, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Get one keyset page of the leaderboard and the cursor for the next page"""
+        return await _leaderboard_page(self, quiz_queries, limit, cursor)
+
+    async def get_leaderboard_rank(self, user_id: str, radius: int = 0) -> Optional[Dict]:
+        """Get a user's leaderboard rank and the users ranked around them"""
+        return await _leaderboard_rank(self, user_id, radius)
+
+    async def get_user_stats(self, user_id: str) -> Optional[Dict]:
+        """Get comprehensive user statistics"""
+        try:
+            result = await quiz_queries.user_stats_query(self.supabase, user_id).execute()
+            return result.data
+        except Exception as e:
+            print(f"Error getting user stats: {e}")
+            return None
+
+    async def get_quiz_statistics(self) -> List[Dict]:
+        """Get statistics for all quizzes"""
+        try:
+            result = await quiz_queries.quiz_statistics_query(self.supabase).execute()
+            return result.data or []
+        except Exception as e:
+            print(f"Error getting quiz statistics: {e}")
+            return []
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the backend modules.
+
+Each module is imported in a fresh interpreter with Supabase credentials
+removed from the environment, so this also verifies that the code can be
+imported offline (e.g. by pre-fork servers, linters or docs tooling).
+
+Usage: python check_import_time.py [--scale 1.5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Cumulative import budget per module, in milliseconds. The Flask apps pay
+# for Flask itself; the client modules must not pull in supabase/httpx.
+BUDGETS_MS = {
+    'config': 50,
+    'cache': 50,
+    'quiz_catalog': 50,
+    'connection': 60,
+    'metrics': 50,
+    'upstream': 50,
+    'resilience': 50,
+    'rate_limit': 50,
+    'supabase_client': 100,
+    'quiz_client': 100,
+    'app': 600,
+    'quiz_app': 600,
+    'pricing': 300,
+    'strategies': 350,
+    'montecarlo': 350,
+    'pricing_api': 600,
+    'risk': 300,
+    'risk_api': 600,
+    'server': 800,
+}
+
+
+def measure_import(module: str) -> float:
+    """Cumulative import time of `module` in milliseconds"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith('SUPABASE_')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply all budgets (for slow CI machines)')
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        allowed = budget * args.scale
+        try:
+            elapsed = measure_import(module)
+        except RuntimeError as e:
+            print(f"FAIL {module:<16} import error: {e}")
+            failed = True
+            continue
+
+        status = 'ok  ' if elapsed <= allowed else 'FAIL'
+        failed |= elapsed > allowed
+        print(f"{status} {module:<16} {elapsed:7.1f} ms (budget {allowed:.0f} ms)")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
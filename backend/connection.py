@@ -0,0 +1,285 @@
+# connection.py - Shared, pooled Supabase connections for the backend clients
+#
+# Both SupabaseClient and QuizSupabaseClient talk to the same Supabase project,
+# so they share one supabase Client per process whose PostgREST session runs
+# on a single tuned httpx connection pool (keep-alive, optional HTTP/2,
+# bounded size and timeouts). Pool sizing and timeouts come from environment
+# variables; see env.example.
+#
+# Nothing here touches the network or imports supabase/httpx until the first
+# client is requested, so importing the backend modules stays cheap and works
+# without credentials.
+#
+# STORAGE_BACKEND=sqlite swaps Supabase for the embedded database in
+# sqlite_backend.py (at SQLITE_PATH, in-memory by default), which answers the
+# same table()/rpc() calls; the clients and their caches are unchanged.
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Optional
+
+from config import load_env
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client, AClient
+    from resilience import UpstreamGuard
+
+
+class PoolConfig:
+    """Connection pool settings, read from the environment"""
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+        self.http2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+        self.connect_timeout = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("SUPABASE_READ_TIMEOUT", "10"))
+        self.write_timeout = float(os.getenv("SUPABASE_WRITE_TIMEOUT", "10"))
+        self.pool_timeout = float(os.getenv("SUPABASE_POOL_TIMEOUT", "5"))
+
+    def limits(self) -> "httpx.Limits":
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self) -> "httpx.Timeout":
+        import httpx
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+
+class PoolStats:
+    """Request counters for a pooled transport"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, failed: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight
+            }
+
+
+def _connection_counts(transport) -> Dict:
+    if transport is None:
+        return {}
+    from transport import connection_counts
+    return connection_counts(transport)
+
+
+@contextmanager
+def call_timeout(seconds: float):
+    """Bound every Supabase HTTP call made inside the block to `seconds`"""
+    from transport import call_timeout_override
+    token = call_timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        call_timeout_override.reset(token)
+
+
+class ConnectionPool:
+    """Process-wide Supabase clients sharing tuned httpx connection pools"""
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self._config = config
+        self.stats = PoolStats()
+        self.async_stats = PoolStats()
+        self._lock = threading.Lock()
+        self._client: Optional["Client"] = None
+        self._async_client: Optional["AClient"] = None
+        self._transport = None
+        self._async_transport = None
+        self._guard = None
+
+    @property
+    def config(self) -> PoolConfig:
+        # Read on first use so values from .env are picked up
+        if self._config is None:
+            load_env()
+            self._config = PoolConfig()
+        return self._config
+
+    @property
+    def storage_backend(self) -> str:
+        load_env()
+        return os.getenv("STORAGE_BACKEND", "supabase").lower()
+
+    @property
+    def guard(self) -> "UpstreamGuard":
+        """Deadline/retry/circuit-breaker policy shared by every client of this pool"""
+        if self._guard is None:
+            with self._lock:
+                if self._guard is None:
+                    from metrics import registry
+                    from resilience import UpstreamGuard
+                    guard = UpstreamGuard(enforce_timeouts=self.storage_backend != "sqlite")
+                    registry.register_collector(guard.collect)
+                    self._guard = guard
+        return self._guard
+
+    def _sqlite_backend(self):
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend(os.getenv("SQLITE_PATH", ":memory:"))
+
+    @staticmethod
+    def _credentials():
+        load_env()
+        url: str = os.getenv("SUPABASE_URL")
+        key: str = os.getenv("SUPABASE_ANON_KEY")
+
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
+        return url, key
+
+    def _pooled_session(self, session: "httpx.Client"):
+        from postgrest.utils import SyncClient
+        from transport import PooledTransport
+
+        self._transport = PooledTransport(
+            self.stats, http2=self.config.http2, limits=self.config.limits()
+        )
+        return SyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=self.config.timeout(),
+            transport=self._transport,
+            follow_redirects=True
+        )
+
+    def _pooled_async_session(self, session: "httpx.AsyncClient") -> "httpx.AsyncClient":
+        import httpx
+        from transport import AsyncPooledTransport
+
+        self._async_transport = AsyncPooledTransport(
+            self.async_stats, http2=self.config.http2, limits=self.config.limits()
+        )
+        return httpx.AsyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=self.config.timeout(),
+            transport=self._async_transport,
+            follow_redirects=True
+        )
+
+    def _install(self, client, make_session) -> None:
+        # supabase rebuilds its PostgREST client on auth events, so hook the
+        # factory rather than patching the current session only
+        init_postgrest = client._init_postgrest_client
+
+        def init_pooled_postgrest(*args, **kwargs):
+            postgrest = init_postgrest(*args, **kwargs)
+            postgrest.session = make_session(postgrest.session)
+            return postgrest
+
+        client._init_postgrest_client = init_pooled_postgrest
+        client._postgrest = None
+
+    def get_client(self) -> "Client":
+        """The shared synchronous supabase Client, built on first use"""
+        if self._client is None:
+            guard = self.guard
+            with self._lock:
+                if self._client is None:
+                    from upstream import InstrumentedClient
+                    if self.storage_backend == "sqlite":
+                        client = self._sqlite_backend()
+                    else:
+                        from supabase import create_client
+                        client = create_client(*self._credentials())
+                        self._install(client, self._pooled_session)
+                    # Every table()/rpc() round trip is timed for /metrics and
+                    # runs under the shared deadline/retry/breaker policy
+                    self._client = InstrumentedClient(client, guard)
+        return self._client
+
+    async def get_async_client(self) -> "AClient":
+        """The shared asynchronous supabase client (one per process/event loop)"""
+        if self._async_client is None:
+            from upstream import InstrumentedClient
+            if self.storage_backend == "sqlite":
+                # Same database as the sync clients, with awaitable execute()
+                client = self.get_client().wrapped.as_async()
+            else:
+                from supabase import acreate_client
+                client = await acreate_client(*self._credentials())
+                self._install(client, self._pooled_async_session)
+            self._async_client = InstrumentedClient(client, self.guard, asynchronous=True)
+        return self._async_client
+
+    def reset_after_fork(self) -> None:
+        """Replace connections inherited from a pre-fork parent process.
+
+        Call in the child right after fork (see gunicorn.conf.py). The
+        instrumented client objects are kept, so clients that already hold
+        them (and their warm caches) carry on, but they are rebound to a
+        fresh Supabase client whose HTTP pool opens its own sockets. Sockets
+        and file handles shared with the parent are dropped, not closed.
+        """
+        self._lock = threading.Lock()
+        self.stats = PoolStats()
+        self.async_stats = PoolStats()
+        self._transport = None
+        self._async_transport = None
+        # Rebuilt on first use in the child, on its own event loop
+        self._async_client = None
+        if self._client is None:
+            return
+
+        if self.storage_backend == "sqlite":
+            # An in-memory database only exists in this process's copy
+            if os.getenv("SQLITE_PATH", ":memory:") != ":memory:":
+                self._client.rebind(self._sqlite_backend())
+        else:
+            from supabase import create_client
+            client = create_client(*self._credentials())
+            self._install(client, self._pooled_session)
+            self._client.rebind(client)
+
+    def get_stats(self) -> Dict:
+        """Pool configuration and utilization"""
+        return {
+            'backend': self.storage_backend,
+            'config': {
+                'max_connections': self.config.max_connections,
+                'max_keepalive_connections': self.config.max_keepalive_connections,
+                'keepalive_expiry': self.config.keepalive_expiry,
+                'http2': self.config.http2
+            },
+            'breaker': self.guard.breaker.stats(),
+            'sync': {**self.stats.snapshot(), **_connection_counts(self._transport)},
+            'async': {**self.async_stats.snapshot(), **_connection_counts(self._async_transport)}
+        }
+
+
+# Global instance shared by both backend clients
+connection_pool = ConnectionPool()
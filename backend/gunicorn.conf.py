@@ -0,0 +1,102 @@
+# gunicorn.conf.py - Production serving config for server.py
+#
+# Run from the backend directory:
+#   gunicorn -c gunicorn.conf.py server:app
+#
+# The master imports the app once (preload_app) and warms the quiz catalog and
+# both leaderboard indexes before forking, so workers share those pages
+# copy-on-write and are ready as soon as they start; /readyz reports this.
+# Each worker then drops the connections it inherited (post_fork) and opens
+# its own Supabase HTTP pool.
+#
+# Metrics are recorded per worker; each worker writes snapshots to
+# METRICS_MULTIPROC_DIR and /metrics combines them, so a scrape covers every
+# worker whichever one answers it (see metrics.py).
+#
+# Graceful operations (signals to the master):
+#   HUP   re-read this file, re-warm the caches in the master and replace the
+#         workers one by one after they finish in-flight requests
+#   USR2  start a new master running new code (preloaded code is not
+#         re-imported on HUP); send TERM to the old master once it is up
+#   TERM  graceful shutdown within graceful_timeout
+#
+# Every setting can be overridden through the environment (see env.example).
+import multiprocessing
+import os
+import tempfile
+
+from config import load_env
+
+load_env()
+
+# Set before the app is imported so every process sees it
+os.environ["METRICS_MULTIPROC_DIR"] = (os.getenv("METRICS_MULTIPROC_DIR")
+                                       or os.path.join(tempfile.gettempdir(), "nku-metrics"))
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Requests mostly wait on Supabase, so each worker runs several threads; the
+# thread count should stay below SUPABASE_POOL_MAX_CONNECTIONS so threads
+# are not queued on the HTTP pool
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count() * 2 + 1)
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Optional worker recycling; the jitter keeps workers from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Empty to disable the access log
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+
+def _warm(server, force: bool) -> None:
+    from server import warm_caches
+    status = warm_caches(force=force)
+    cold = [name for name, warm in status.items() if not warm]
+    if cold:
+        server.log.warning("Caches not warm before fork: %s (workers will load them)", ", ".join(cold))
+    else:
+        server.log.info("Caches warm: %s", ", ".join(status))
+
+
+def on_starting(server):
+    from metrics import reset_multiprocess_dir
+    reset_multiprocess_dir()
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before workers fork
+    _warm(server, force=False)
+
+
+def on_reload(server):
+    # HUP: new workers fork from the master, so refresh its snapshot first
+    _warm(server, force=True)
+
+
+def post_fork(server, worker):
+    from connection import connection_pool
+    from metrics import start_snapshot_writer
+    connection_pool.reset_after_fork()
+    start_snapshot_writer()
+
+
+def worker_exit(server, worker):
+    # Stop Monte Carlo pool processes the worker may have started
+    from montecarlo import shutdown_pool
+    from metrics import write_snapshot
+    shutdown_pool()
+    # Final counts, kept by child_exit once the worker is gone
+    write_snapshot()
+
+
+def child_exit(server, worker):
+    # Runs in the master after a worker exits (or is killed)
+    from metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,332 @@
+# leaderboard_index.py - In-process ranked index over user XP
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pagination import encode_cursor
+from resilience import note_served_stale
+
+# Keys of the position dicts returned by LeaderboardIndex.position()
+CURSOR_FIELDS = ('xp', 'created_at', 'id')
+
+
+class _Node:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, levels: int):
+        self.key = key
+        self.value = value
+        self.next: List[Optional['_Node']] = [None] * levels
+        # width[i] = number of positions skipped by following next[i]
+        self.width = [1] * levels
+
+
+class RankedSkipList:
+    """Indexable skiplist: ordered keys with O(log n) insert, remove, rank and select"""
+
+    def __init__(self, max_levels: int = 32):
+        self.max_levels = max_levels
+        self.tail = _Node(None, None, 0)
+        self.head = _Node(None, None, max_levels)
+        self.head.next = [self.tail] * max_levels
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.max_levels and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def _find_chain(self, key) -> Tuple[List[_Node], List[int]]:
+        """Last node before `key` on every level, and the positions skipped per level"""
+        chain = [self.head] * self.max_levels
+        steps = [0] * self.max_levels
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key, value) -> None:
+        chain, steps = self._find_chain(key)
+        levels = self._random_levels()
+        new_node = _Node(key, value, levels)
+        skipped = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - skipped
+            prev.width[level] = skipped + 1
+            skipped += steps[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key) -> None:
+        chain, _ = self._find_chain(key)
+        target = chain[0].next[0]
+        if target is self.tail or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """0-based position of `key` (or where it would be inserted)"""
+        node = self.head
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def count_through(self, key) -> int:
+        """Number of keys <= `key`"""
+        node = self.head
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not self.tail and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def iter_from(self, index: int) -> Iterator[Tuple[Any, Any]]:
+        """Yield (key, value) pairs starting at 0-based position `index`"""
+        if index >= self.size:
+            return
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining and node.next[level] is not self.tail:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not self.tail:
+            yield node.key, node.value
+            node = node.next[0]
+
+
+class LeaderboardIndex:
+    """Ranked view of user XP kept in memory and updated on every XP write.
+
+    Users are ordered by XP descending, then created_at ascending (earlier
+    sign-ups win ties, matching the leaderboard view), then id. The index
+    is seeded once from the database via `loader` and reseeded every
+    `reseed_interval` seconds so writes made by other workers converge.
+    Async callers pass no loader and hand the loaded rows to install().
+    """
+
+    def __init__(self, loader: Optional[Callable[[], List[Dict]]], id_field: str, xp_field: str,
+                 fields: Optional[Sequence[str]] = None, reseed_interval: float = 300.0):
+        self._loader = loader
+        self.id_field = id_field
+        self.xp_field = xp_field
+        self.fields = tuple(fields) if fields else None
+        self.reseed_interval = reseed_interval
+        self._lock = threading.RLock()
+        self._list = RankedSkipList()
+        self._keys: Dict[Any, Tuple] = {}
+        self._rows: Dict[Any, Dict] = {}
+        self._seeded_at: Optional[float] = None
+        self._seed_lock = threading.Lock()
+        self._pending: Optional[Dict[Any, Dict]] = None
+        self.seed_errors = 0
+
+    @property
+    def seeded(self) -> bool:
+        return self._seeded_at is not None
+
+    def _key(self, row: Dict) -> Tuple:
+        return (-(row.get(self.xp_field) or 0), row.get('created_at') or '', str(row[self.id_field]))
+
+    def position(self, row: Dict) -> Dict:
+        """Sort-key values of a row, as stored in pagination cursors"""
+        return {
+            'xp': row.get(self.xp_field) or 0,
+            'created_at': row.get('created_at') or '',
+            'id': str(row[self.id_field])
+        }
+
+    def _project(self, row: Dict, rank: int) -> Dict:
+        if self.fields:
+            entry = {field: row.get(field) for field in self.fields}
+        else:
+            entry = dict(row)
+        entry['rank'] = rank
+        return entry
+
+    def is_stale(self) -> bool:
+        return not self.seeded or time.monotonic() - self._seeded_at >= self.reseed_interval
+
+    def seed(self, force: bool = True) -> bool:
+        """(Re)build the index from the database.
+
+        Single-flight: one caller runs the loader while concurrent callers
+        keep reading the current index (or, before the first seed, wait for
+        it and reuse the result). The loader runs without the index lock;
+        the new index is swapped in under it, with any update() made during
+        the load reapplied first.
+        """
+        if not self._seed_lock.acquire(blocking=not self.seeded):
+            return True
+        try:
+            if not force and not self.is_stale():
+                # Seeded by another caller while this one waited
+                return True
+            with self._lock:
+                self._pending = {}
+            try:
+                rows = self._loader()
+            except Exception as e:
+                with self._lock:
+                    self._pending = None
+                self.record_failure(e)
+                return False
+            self.install(rows)
+            return True
+        finally:
+            self._seed_lock.release()
+
+    def install(self, rows: List[Dict]) -> None:
+        """Swap in an index built from a full load of `rows`"""
+        ranked = RankedSkipList()
+        keys = {}
+        by_id = {}
+        for row in rows:
+            self._place(ranked, keys, by_id, row)
+        with self._lock:
+            for row in (self._pending or {}).values():
+                self._place(ranked, keys, by_id, row)
+            self._pending = None
+            self._list = ranked
+            self._keys = keys
+            self._rows = by_id
+            self._seeded_at = time.monotonic()
+
+    def record_failure(self, error: Exception) -> None:
+        """Count a failed load; the previous index (if any) keeps answering"""
+        self.seed_errors += 1
+        print(f"Error seeding leaderboard index: {error}")
+        if self.seeded:
+            note_served_stale()
+
+    def ensure_seeded(self) -> bool:
+        """Seed on first use or when the reseed interval has passed"""
+        if not self.is_stale():
+            return True
+        return self.seed(force=False) or self.seeded
+
+    def update(self, row: Dict) -> None:
+        """Insert or move a user after a profile write"""
+        if row.get(self.id_field) is None:
+            return
+        with self._lock:
+            user_id = row[self.id_field]
+            if self._pending is not None:
+                # A reseed is loading; its snapshot may predate this write
+                self._pending[user_id] = {**self._pending.get(user_id, {}), **row}
+            if self.seeded:
+                self._place(self._list, self._keys, self._rows, row)
+
+    def _place(self, ranked: RankedSkipList, keys: Dict, rows: Dict, row: Dict) -> None:
+        """Insert or move one user in the given index structures"""
+        user_id = row[self.id_field]
+        old_key = keys.get(user_id)
+        if old_key is not None:
+            ranked.remove(old_key)
+        merged = {**rows.get(user_id, {}), **row}
+        key = self._key(merged)
+        ranked.insert(key, merged)
+        keys[user_id] = key
+        rows[user_id] = merged
+
+    def __len__(self) -> int:
+        return len(self._list)
+
+    def top(self, limit: int) -> List[Dict]:
+        """The first `limit` users, with 1-based ranks"""
+        return self.slice(0, limit)
+
+    def slice(self, start: int, limit: int) -> List[Dict]:
+        return self._window(start, limit)[0]
+
+    def _window(self, start: int, limit: int) -> Tuple[List[Dict], Optional[Dict]]:
+        """Entries at 0-based `start`, plus the position of the last one if more follow"""
+        with self._lock:
+            start = max(0, start)
+            entries = []
+            last = None
+            for rank, (_, row) in enumerate(self._list.iter_from(start), start=start + 1):
+                if len(entries) >= limit:
+                    break
+                entries.append(self._project(row, rank))
+                last = row
+            more = last is not None and start + len(entries) < len(self._list)
+            return entries, (self.position(last) if more else None)
+
+    def page(self, after: Optional[Dict], limit: int) -> Tuple[List[Dict], Optional[Dict]]:
+        """Keyset page: the `limit` users ranked after cursor position `after`.
+
+        Seeking to the cursor is O(log n), so deep pages cost the same as the
+        first one, and pages stay stable when users above the cursor move.
+        """
+        with self._lock:
+            if after is None:
+                return self._window(0, limit)
+            key = (-(after['xp'] or 0), after['created_at'] or '', str(after['id']))
+            return self._window(self._list.count_through(key), limit)
+
+    def rank_of(self, user_id: Any) -> Optional[int]:
+        """1-based rank of a user, or None if unknown"""
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is None:
+                return None
+            return self._list.rank(key) + 1
+
+    def around(self, user_id: Any, radius: int) -> Optional[Dict]:
+        """A user's rank plus up to `radius` neighbors on either side"""
+        with self._lock:
+            rank = self.rank_of(user_id)
+            if rank is None:
+                return None
+            start = max(0, rank - 1 - radius)
+            window, after = self._window(start, rank - start + radius)
+            return {
+                'rank': rank,
+                'total': len(self._list),
+                'entry': window[rank - 1 - start],
+                'neighbors': window,
+                'after': after
+            }
+
+    def cursor_page(self, after: Optional[Dict], limit: int) -> Dict:
+        """page() as an API payload: entries plus the opaque cursor of the next page"""
+        entries, position = self.page(after, limit)
+        return {'entries': entries, 'next_cursor': encode_cursor(position) if position else None}
+
+    def rows_page(self, rows: List[Dict], more: bool) -> Dict:
+        """The same payload for a keyset page read from the database while unseeded"""
+        entries = [{field: row.get(field) for field in self.fields} for row in rows]
+        position = self.position(rows[-1]) if more and rows else None
+        return {'entries': entries, 'next_cursor': encode_cursor(position) if position else None}
+
+    def ranking(self, user_id: Any, radius: int) -> Optional[Dict]:
+        """around() with the cursor of the page after the window encoded"""
+        ranking = self.around(user_id, radius)
+        if ranking is None:
+            return None
+        after = ranking.pop('after')
+        ranking['next_cursor'] = encode_cursor(after) if after else None
+        return ranking
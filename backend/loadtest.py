@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load generator for the education (app.py) and quiz (quiz_app.py) APIs.
+
+Drives a weighted mix of endpoint scenarios in closed-loop mode (a fixed
+number of workers, each sending its next request as soon as the previous one
+returns) or open-loop mode (requests arrive at a fixed rate whether or not
+earlier ones have finished; latency is measured from the scheduled send time,
+so queueing is not hidden). A warm-up period is run and discarded first.
+
+Per-endpoint latencies go into HDR-style log-linear histograms (~1% value
+precision) and are reported as p50/p90/p95/p99/p99.9. Results can be written
+as JSON and compared against a previous run.
+
+Usage:
+    # start server.py on the embedded SQLite backend and load it
+    python loadtest.py --spawn --concurrency 16 --duration 30 --output run.json
+
+    # open loop at 200 req/s against a running server, compared to a baseline
+    python loadtest.py --edu-url http://localhost:5000/edu --quiz-url http://localhost:5000/quiz \\
+        --rate 200 --compare baseline.json --max-regression 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Scenario name -> relative weight in the default request mix
+DEFAULT_MIX = {
+    'edu_profile': 10,
+    'edu_stats': 5,
+    'edu_leaderboard': 10,
+    'edu_rank': 5,
+    'edu_experience': 5,
+    'quiz_list': 15,
+    'quiz_get': 10,
+    'quiz_answer': 10,
+    'quiz_batch': 3,
+    'quiz_leaderboard': 15,
+    'quiz_stats': 5,
+}
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond values, in the style of HdrHistogram.
+
+    Values are bucketed by their top 7 significant bits, which bounds the
+    relative error of any reported percentile to under 1% while keeping the
+    bucket count small regardless of the value range.
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min: Optional[int] = None
+        self.max = 0
+
+    def _bucket(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        return ((value >> shift) + 1 << shift) - 1
+
+    def record(self, value_us: float) -> None:
+        value = max(1, int(value_us))
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """Upper bound of the bucket holding the given percentile, in microseconds"""
+        if not self.total:
+            return 0
+        rank = max(1, int(round(percent / 100 * self.total + 0.5 - 1e-9)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        summary = {
+            'min': (self.min or 0) / 1000,
+            'mean': (self.sum / self.total / 1000) if self.total else 0,
+            'max': self.max / 1000,
+        }
+        for percent in PERCENTILES:
+            summary[f'p{percent:g}'] = self.percentile(percent) / 1000
+        return summary
+
+
+class EndpointStats:
+    """Latency histogram and status counts for one scenario"""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, latency_us: float, status: str, failed: bool) -> None:
+        self.histogram.record(latency_us)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if failed:
+            self.errors += 1
+
+    def merge(self, other: "EndpointStats") -> None:
+        self.histogram.merge(other.histogram)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.errors += other.errors
+
+
+class HttpTarget:
+    """Keep-alive HTTP connection to one app, owned by a single worker thread"""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        # Mount point of the API on the server, e.g. /edu on server.py
+        self.prefix = parts.path.rstrip('/')
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = factory(self.host, self.port, timeout=self.timeout)
+        return self._connection
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request(method, self.prefix + path, body=payload, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle keep-alive connection; retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class Fixtures:
+    """Users and quizzes created before the run, shared by all scenarios"""
+
+    def __init__(self):
+        self.edu_users: List[str] = []
+        self.quiz_users: List[str] = []
+        self.quiz_ids: List[int] = []
+
+
+# A scenario returns (app, method, path, body) for one request
+Scenario = Callable[[Fixtures, random.Random], Tuple[str, str, str, Optional[Dict]]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    'edu_profile': lambda f, r: ('edu', 'GET', f"/api/user/profile/{r.choice(f.edu_users)}", None),
+    'edu_stats': lambda f, r: ('edu', 'GET', f"/api/user/{r.choice(f.edu_users)}/stats", None),
+    'edu_leaderboard': lambda f, r: ('edu', 'GET', "/api/leaderboard?limit=50", None),
+    'edu_rank': lambda f, r: ('edu', 'GET', f"/api/leaderboard/rank/{r.choice(f.edu_users)}?radius=5", None),
+    'edu_experience': lambda f, r: ('edu', 'POST', f"/api/user/{r.choice(f.edu_users)}/experience",
+                                    {'exp_gained': r.randint(1, 50), 'activity_type': 'loadtest'}),
+    'quiz_list': lambda f, r: ('quiz', 'GET', "/api/quizzes", None),
+    'quiz_get': lambda f, r: ('quiz', 'GET', f"/api/quizzes/{r.choice(f.quiz_ids)}", None),
+    'quiz_answer': lambda f, r: ('quiz', 'POST',
+                                 f"/api/users/{r.choice(f.quiz_users)}/quiz/{r.choice(f.quiz_ids)}/answer",
+                                 {'selected_choice': r.randint(0, 3)}),
+    'quiz_batch': lambda f, r: ('quiz', 'POST', f"/api/users/{r.choice(f.quiz_users)}/quiz/answers",
+                                {'answers': [{'quiz_id': quiz_id, 'selected_choice': r.randint(0, 3)}
+                                             for quiz_id in r.sample(f.quiz_ids, min(5, len(f.quiz_ids)))]}),
+    'quiz_leaderboard': lambda f, r: ('quiz', 'GET', "/api/leaderboard?limit=50", None),
+    'quiz_stats': lambda f, r: ('quiz', 'GET', f"/api/users/{r.choice(f.quiz_users)}/stats", None),
+}
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """Parse `name=weight,...` (unknown names are an error)"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def create_fixtures(urls: Dict[str, str], users: int, timeout: float) -> Fixtures:
+    """Create test users in each app and fetch the quiz ids"""
+    fixtures = Fixtures()
+    run_id = uuid.uuid4().hex[:8]
+
+    if 'edu' in urls:
+        target = HttpTarget(urls['edu'], timeout)
+        for i in range(users):
+            user_id = f"load-{run_id}-{i}"
+            status, _ = target.request('POST', '/api/user/profile', {
+                'user_id': user_id, 'username': f"load_{run_id}_{i}", 'email': f"{user_id}@example.com"
+            })
+            if status in (200, 201):
+                fixtures.edu_users.append(user_id)
+        target.close()
+
+    if 'quiz' in urls:
+        target = HttpTarget(urls['quiz'], timeout)
+        for i in range(users):
+            user_id = str(uuid.uuid4())
+            status, _ = target.request('POST', '/api/users/profile', {
+                'user_id': user_id, 'username': f"load_{run_id}_{i}"
+            })
+            if status in (200, 201):
+                fixtures.quiz_users.append(user_id)
+        status, body = target.request('GET', '/api/quizzes')
+        if status == 200:
+            fixtures.quiz_ids = [quiz['id'] for quiz in json.loads(body)['data']]
+        target.close()
+
+    return fixtures
+
+
+def usable_scenarios(mix: Dict[str, float], urls: Dict[str, str], fixtures: Fixtures) -> Dict[str, float]:
+    """Drop scenarios whose app is not targeted or whose fixtures are missing"""
+    usable = {}
+    for name, weight in mix.items():
+        app = name.split('_', 1)[0]
+        if app not in urls or weight <= 0:
+            continue
+        if app == 'edu' and not fixtures.edu_users:
+            continue
+        if app == 'quiz' and (not fixtures.quiz_users or not fixtures.quiz_ids):
+            continue
+        usable[name] = weight
+    return usable
+
+
+class LoadRunner:
+    """Runs the request mix and collects per-scenario statistics"""
+
+    def __init__(self, urls: Dict[str, str], fixtures: Fixtures, mix: Dict[str, float],
+                 concurrency: int, duration: float, warmup: float, rate: Optional[float],
+                 timeout: float, seed: Optional[int]):
+        self.urls = urls
+        self.fixtures = fixtures
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.rate = rate
+        self.timeout = timeout
+        self.seed = seed
+        self._results: List[Dict[str, EndpointStats]] = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _send(self, targets: Dict[str, HttpTarget], name: str, rng: random.Random) -> Tuple[str, bool]:
+        app, method, path, body = SCENARIOS[name](self.fixtures, rng)
+        try:
+            status, _ = targets[app].request(method, path, body)
+            return str(status), status >= 400
+        except socket.timeout:
+            targets[app].close()
+            return 'timeout', True
+        except Exception as e:
+            targets[app].close()
+            return type(e).__name__, True
+
+    def _worker(self, index: int, record_from: float, stop_at: float,
+                schedule: Optional["queue.Queue"]) -> None:
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        targets = {app: HttpTarget(url, self.timeout) for app, url in self.urls.items()}
+        stats: Dict[str, EndpointStats] = {}
+        try:
+            while True:
+                if schedule is None:
+                    # Closed loop: next request as soon as the previous one returns
+                    intended = time.perf_counter()
+                    if intended >= stop_at:
+                        break
+                    name = rng.choices(self.names, self.weights)[0]
+                else:
+                    # Open loop: latency counts from the scheduled arrival time
+                    item = schedule.get()
+                    if item is None:
+                        break
+                    intended, name = item
+                    delay = intended - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                status, failed = self._send(targets, name, rng)
+                finished = time.perf_counter()
+                if intended >= record_from:
+                    stats.setdefault(name, EndpointStats()).record(
+                        (finished - intended) * 1e6, status, failed
+                    )
+        finally:
+            for target in targets.values():
+                target.close()
+            with self._lock:
+                self._results.append(stats)
+
+    def _schedule(self, schedule: "queue.Queue", start: float, stop_at: float) -> None:
+        rng = random.Random(self.seed)
+        interval = 1.0 / self.rate
+        next_at = start
+        # Bound the backlog so an overloaded server can't exhaust memory
+        max_backlog = max(1000, int(self.rate * 10))
+        while next_at < stop_at:
+            if schedule.qsize() < max_backlog:
+                schedule.put((next_at, rng.choices(self.names, self.weights)[0]))
+            else:
+                self.dropped += 1
+            # Poisson arrivals
+            next_at += rng.expovariate(1.0 / interval)
+            delay = next_at - time.perf_counter() - 0.05
+            if delay > 0:
+                time.sleep(delay)
+        for _ in range(self.concurrency):
+            schedule.put(None)
+
+    def run(self) -> Tuple[Dict[str, EndpointStats], float]:
+        start = time.perf_counter()
+        record_from = start + self.warmup
+        stop_at = record_from + self.duration
+        schedule = queue.Queue() if self.rate else None
+
+        threads = [
+            threading.Thread(target=self._worker, args=(i, record_from, stop_at, schedule), daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        if schedule is not None:
+            self._schedule(schedule, start, stop_at)
+        for thread in threads:
+            thread.join()
+
+        merged: Dict[str, EndpointStats] = {}
+        for stats in self._results:
+            for name, endpoint in stats.items():
+                merged.setdefault(name, EndpointStats()).merge(endpoint)
+        return merged, max(time.perf_counter(), stop_at) - record_from
+
+
+def build_report(args, urls: Dict[str, str], stats: Dict[str, EndpointStats],
+                 elapsed: float, dropped: int) -> Dict:
+    total = EndpointStats()
+    endpoints = {}
+    for name in sorted(stats):
+        endpoint = stats[name]
+        total.merge(endpoint)
+        endpoints[name] = {
+            'count': endpoint.histogram.total,
+            'errors': endpoint.errors,
+            'statuses': endpoint.statuses,
+            'throughput': endpoint.histogram.total / elapsed if elapsed else 0,
+            'latency_ms': endpoint.histogram.to_dict(),
+            'histogram_us': sorted(endpoint.histogram.counts.items()),
+        }
+    return {
+        'meta': {
+            'started_at': datetime.now().isoformat(),
+            'mode': 'open' if args.rate else 'closed',
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'elapsed': elapsed,
+            'targets': urls,
+            'mix': parse_mix(args.mix),
+            'dropped_arrivals': dropped,
+        },
+        'total': {
+            'count': total.histogram.total,
+            'errors': total.errors,
+            'throughput': total.histogram.total / elapsed if elapsed else 0,
+            'latency_ms': total.histogram.to_dict(),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def print_report(report: Dict) -> None:
+    meta = report['meta']
+    mode = f"open loop @ {meta['rate']:g} req/s" if meta['mode'] == 'open' else 'closed loop'
+    print(f"{mode}, {meta['concurrency']} workers, {meta['duration']:g}s (+{meta['warmup']:g}s warm-up)")
+    header = f"{'endpoint':<18}{'count':>8}{'err':>6}{'req/s':>9}" + ''.join(
+        f"{'p' + format(p, 'g'):>9}" for p in PERCENTILES) + f"{'max':>9}"
+    print(header + "   (latencies in ms)")
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, row in rows:
+        latency = row['latency_ms']
+        print(f"{name:<18}{row['count']:>8}{row['errors']:>6}{row['throughput']:>9.1f}" + ''.join(
+            f"{latency['p' + format(p, 'g')]:>9.2f}" for p in PERCENTILES) + f"{latency['max']:>9.2f}")
+    if meta['dropped_arrivals']:
+        print(f"warning: {meta['dropped_arrivals']} scheduled arrivals dropped (backlog full)")
+
+
+def compare_reports(report: Dict, baseline: Dict, max_regression: Optional[float]) -> bool:
+    """Print p50/p99/throughput changes vs. a baseline; False if p99 regressed too far"""
+    ok = True
+    print(f"\n{'endpoint':<18}{'p50 ms':>16}{'p99 ms':>16}{'req/s':>16}")
+    names = sorted(set(report['endpoints']) & set(baseline['endpoints'])) + ['TOTAL']
+    for name in names:
+        new = report['total'] if name == 'TOTAL' else report['endpoints'][name]
+        old = baseline['total'] if name == 'TOTAL' else baseline['endpoints'][name]
+        cells = []
+        for key, value_of in (('p50', lambda r: r['latency_ms']['p50']),
+                              ('p99', lambda r: r['latency_ms']['p99']),
+                              ('req/s', lambda r: r['throughput'])):
+            before, after = value_of(old), value_of(new)
+            change = ((after - before) / before * 100) if before else 0.0
+            cells.append(f"{after:>8.2f} ({change:+5.1f}%)")
+            if key == 'p99' and max_regression is not None and change > max_regression:
+                ok = False
+        print(f"{name:<18}" + ''.join(f"{cell:>16}" for cell in cells))
+    if not ok:
+        print(f"p99 regressed by more than {max_regression:g}% on at least one endpoint")
+    return ok
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_apps(apps: List[str], sqlite_path: str) -> Tuple[Dict[str, str], List[subprocess.Popen]]:
+    """Start server.py (both APIs) on the embedded SQLite backend and wait until it answers"""
+    prefixes = {'edu': '/edu', 'quiz': '/quiz'}
+    # Measure the backend itself, not the per-user write limits in front of it
+    env = dict(os.environ, STORAGE_BACKEND='sqlite', SQLITE_PATH=sqlite_path, RATE_LIMIT_ENABLED='false')
+    port = _free_port()
+    code = f"from server import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+    processes = [subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )]
+    urls = {app: f"http://127.0.0.1:{port}{prefixes[app]}" for app in apps}
+
+    deadline = time.monotonic() + 30
+    for app, url in urls.items():
+        target = HttpTarget(url, timeout=2)
+        while True:
+            try:
+                target.request('GET', '/')
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    stop_apps(processes)
+                    raise RuntimeError(f"{app} did not start on {url}")
+                time.sleep(0.1)
+            finally:
+                target.close()
+    return urls, processes
+
+
+def stop_apps(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog='\n'.join(__doc__.strip().splitlines()[1:]))
+    parser.add_argument('--edu-url', help='base URL of the education API (e.g. http://localhost:5000/edu)')
+    parser.add_argument('--quiz-url', help='base URL of the quiz API (e.g. http://localhost:5000/quiz)')
+    parser.add_argument('--spawn', action='store_true',
+                        help='start server.py locally on the embedded SQLite backend')
+    parser.add_argument('--sqlite-path', default=':memory:', help='database for --spawn')
+    parser.add_argument('--concurrency', type=int, default=8, help='worker threads')
+    parser.add_argument('--rate', type=float, help='open-loop arrival rate in req/s (default: closed loop)')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='discarded warm-up seconds')
+    parser.add_argument('--mix', help='scenario weights, e.g. quiz_list=5,edu_stats=1 '
+                                      f"(scenarios: {', '.join(SCENARIOS)})")
+    parser.add_argument('--users', type=int, default=50, help='test users created per app')
+    parser.add_argument('--timeout', type=float, default=10, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='random seed for a repeatable request sequence')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from a previous --output')
+    parser.add_argument('--max-regression', type=float,
+                        help='with --compare: exit 1 if any p99 is worse by more than this percent')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    processes = []
+    if args.spawn:
+        apps = sorted({name.split('_', 1)[0] for name, weight in mix.items() if weight > 0})
+        urls, processes = spawn_apps(apps, args.sqlite_path)
+    else:
+        urls = {app: url.rstrip('/') for app, url in (('edu', args.edu_url), ('quiz', args.quiz_url)) if url}
+        if not urls:
+            parser.error('pass --spawn or at least one of --edu-url/--quiz-url')
+
+    try:
+        fixtures = create_fixtures(urls, args.users, args.timeout)
+        scenarios = usable_scenarios(mix, urls, fixtures)
+        if not scenarios:
+            print("No runnable scenarios (could not create test users or load quizzes)")
+            return 1
+
+        runner = LoadRunner(urls, fixtures, scenarios, args.concurrency, args.duration,
+                            args.warmup, args.rate, args.timeout, args.seed)
+        stats, elapsed = runner.run()
+    finally:
+        stop_apps(processes)
+
+    report = build_report(args, urls, stats, elapsed, runner.dropped)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare_reports(report, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
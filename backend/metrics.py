@@ -0,0 +1,492 @@
+# metrics.py - In-process metrics exposed in the Prometheus text format
+#
+# A small dependency-free registry (counters and histograms with labels, plus
+# collector callbacks for values owned elsewhere such as cache counters) and
+# the Flask and Quart hooks that record per-route latency and per-request
+# upstream (Supabase) call counts. Upstream calls themselves are timed in
+# upstream.py.
+#
+# Under gunicorn every worker process has its own registry, so a scrape would
+# only see whichever worker answered. With METRICS_MULTIPROC_DIR set (done by
+# gunicorn.conf.py) each worker writes a snapshot of its registry to that
+# directory every METRICS_SNAPSHOT_SECONDS, and /metrics renders the answering
+# worker's live values plus the other workers' snapshots: counters and
+# histograms summed, collector values (caches, pools, breaker) labelled by
+# worker pid. Counts of exited workers are kept so totals never go backwards.
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merged(self, snapshots: Iterable[List]) -> Dict[Tuple[str, ...], float]:
+        """Own values plus those of other processes' snapshot() output"""
+        with self._lock:
+            values = dict(self._values)
+        for snapshot in snapshots:
+            for labels, value in snapshot:
+                values[tuple(labels)] = values.get(tuple(labels), 0) + value
+        return values
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted((self._values if values is None else values).items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self._series.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def merged(self, snapshots: Iterable[List]) -> Dict[Tuple[str, ...], List[float]]:
+        """Own series plus those of other processes' snapshot() output"""
+        with self._lock:
+            merged = {labels: list(series) for labels, series in self._series.items()}
+        for snapshot in snapshots:
+            for labels, series in snapshot:
+                own = merged.get(tuple(labels))
+                if own is None or len(own) != len(series):
+                    # Bucket layout changed between deploys; keep the newest
+                    merged.setdefault(tuple(labels), list(series))
+                    continue
+                merged[tuple(labels)] = [a + b for a, b in zip(own, series)]
+        return merged
+
+    def render(self, series_by_labels: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((self._series if series_by_labels is None else series_by_labels).items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}")
+        return lines
+
+
+class Registry:
+    """Metric families plus callbacks that render externally owned values"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Add a callback returning already-formatted exposition lines"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collect(self) -> List[str]:
+        lines: List[str] = []
+        for collector in list(self._collectors):
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        return lines
+
+    def render(self) -> str:
+        directory = multiprocess_dir()
+        if directory:
+            return self._render_multiprocess(directory)
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        lines.extend(self._collect())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """This process's values, as written to METRICS_MULTIPROC_DIR"""
+        return {
+            'metrics': {metric.name: metric.snapshot() for metric in list(self._metrics)},
+            'collected': self._collect()
+        }
+
+    def clear(self) -> None:
+        """Drop all recorded values (e.g. those a worker inherited from the master)"""
+        for metric in list(self._metrics):
+            metric.clear()
+
+    def _render_multiprocess(self, directory: str) -> str:
+        own = _snapshot_path(directory, os.getpid())
+        others = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    others.append((_path_pid(path), json.load(f)))
+            except (OSError, ValueError) as e:
+                # Being replaced or removed right now; skip it for this scrape
+                print(f"Error reading metrics snapshot {path}: {e}")
+
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render(metric.merged(
+                snapshot['metrics'].get(metric.name, []) for _, snapshot in others
+            )))
+        # Collector output is per process (cache sizes, pool state), so it is
+        # labelled by worker rather than summed; exited workers have none
+        collected = [(str(os.getpid()), self._collect())]
+        collected += [(pid, snapshot.get('collected', [])) for pid, snapshot in others]
+        lines.extend(_merge_by_worker(collected))
+        return '\n'.join(lines) + '\n'
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Directory shared by the worker processes' snapshots, if multi-process mode is on"""
+    return os.getenv("METRICS_MULTIPROC_DIR") or None
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"worker-{pid}.json")
+
+
+def _path_pid(path: str) -> str:
+    # worker-<pid>.json, or dead-<pid>-<ns>.json once the worker has exited
+    return os.path.basename(path).split('.')[0].split('-')[1]
+
+
+def _with_label(line: str, label: str) -> str:
+    """Add `label` to one exposition sample line"""
+    brace = line.find('{')
+    space = line.find(' ')
+    if brace != -1 and brace < space:
+        return f"{line[:brace + 1]}{label},{line[brace + 1:]}"
+    return f"{line[:space]}{{{label}}}{line[space:]}"
+
+
+def _merge_by_worker(collected: Iterable[Tuple[str, List[str]]]) -> List[str]:
+    """Combine per-process collector output into one family per metric, with
+    each sample labelled by the worker it came from"""
+    types: Dict[str, str] = {}
+    samples: Dict[str, List[str]] = {}
+    for pid, lines in collected:
+        family = None
+        for line in lines:
+            if line.startswith('# TYPE '):
+                family = line.split(' ')[2]
+                types.setdefault(family, line)
+            elif line and not line.startswith('#'):
+                name = family or line.split('{', 1)[0].split(' ', 1)[0]
+                samples.setdefault(name, []).append(_with_label(line, f'worker="{pid}"'))
+    lines: List[str] = []
+    for family, family_samples in samples.items():
+        if family in types:
+            lines.append(types[family])
+        lines.extend(family_samples)
+    return lines
+
+
+def write_snapshot() -> None:
+    """Write this process's registry snapshot for the other workers' scrapes"""
+    directory = multiprocess_dir()
+    if not directory:
+        return
+    path = _snapshot_path(directory, os.getpid())
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(registry.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Error writing metrics snapshot: {e}")
+
+
+def start_snapshot_writer() -> None:
+    """Start writing this worker's snapshot every METRICS_SNAPSHOT_SECONDS (call after fork)"""
+    if not multiprocess_dir():
+        return
+    interval = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "1"))
+    # Values recorded by the master before the fork (cache warming) are not this worker's
+    registry.clear()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            write_snapshot()
+
+    threading.Thread(target=run, name='metrics-snapshot', daemon=True).start()
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Keep an exited worker's counters but drop its per-process collector values (master side)"""
+    directory = multiprocess_dir()
+    if not directory:
+        return
+    path = _snapshot_path(directory, pid)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+        snapshot['collected'] = []
+        # Renamed so a new worker reusing the pid does not overwrite it
+        with open(os.path.join(directory, f"dead-{pid}-{time.time_ns()}.json"), 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error archiving metrics snapshot of worker {pid}: {e}")
+
+
+def reset_multiprocess_dir() -> None:
+    """Create the snapshot directory and remove snapshots from a previous run (master side)"""
+    directory = multiprocess_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json*')):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Error removing metrics snapshot {path}: {e}")
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ('app', 'method', 'route', 'status'))
+http_request_errors = registry.counter(
+    'http_request_errors_total', 'HTTP requests answered with a 5xx status',
+    ('app', 'method', 'route'))
+upstream_calls_per_request = registry.histogram(
+    'upstream_calls_per_request', 'Supabase calls made while serving one HTTP request',
+    ('app', 'route'), buckets=CALL_COUNT_BUCKETS)
+upstream_time_per_request = registry.histogram(
+    'upstream_seconds_per_request', 'Time spent in Supabase calls while serving one HTTP request',
+    ('app', 'route'))
+upstream_duration = registry.histogram(
+    'upstream_request_duration_seconds', 'Supabase call latency by table and operation',
+    ('table', 'operation'))
+upstream_errors = registry.counter(
+    'upstream_errors_total', 'Supabase calls that raised, by table and operation',
+    ('table', 'operation', 'error'))
+
+
+class RequestUpstreamTally:
+    """Upstream calls made on behalf of the current HTTP request"""
+
+    __slots__ = ('calls', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+current_tally: contextvars.ContextVar[Optional[RequestUpstreamTally]] = contextvars.ContextVar(
+    'current_tally', default=None
+)
+
+
+def record_upstream_call(table: str, operation: str, seconds: float, error: Optional[str] = None) -> None:
+    """Called by upstream.py after every Supabase call"""
+    upstream_duration.observe(seconds, table, operation)
+    if error:
+        upstream_errors.inc(table, operation, error)
+    tally = current_tally.get()
+    if tally is not None:
+        tally.calls += 1
+        tally.seconds += seconds
+
+
+def cache_collector(name: str, stats_source: Callable[[], Optional[Dict]]) -> Callable[[], List[str]]:
+    """Collector rendering TTLCache/QuizCatalog-style stats dicts as gauges.
+
+    `stats_source` returns {cache_name: stats} (or None while the owning
+    client has not been built yet, so scraping never forces it).
+    """
+    fields = (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+              ('expirations', 'counter'), ('loads', 'counter'), ('load_errors', 'counter'),
+              ('size', 'gauge'), ('hit_ratio', 'gauge'))
+
+    def collect() -> List[str]:
+        stats = stats_source() or {}
+        lines = []
+        for field, kind in fields:
+            metric = f"{name}_cache_{field}" + ('_total' if kind == 'counter' else '')
+            samples = [(cache, values[field]) for cache, values in sorted(stats.items())
+                       if isinstance(values, dict) and field in values]
+            if not samples:
+                continue
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache, value in samples:
+                lines.append(f'{metric}{{cache="{_escape(cache)}"}} {_number(value)}')
+        return lines
+
+    return collect
+
+
+def _record_request(app_name: str, request, status_code: int, started: float,
+                    tally: RequestUpstreamTally) -> None:
+    """Observe one finished request (Flask or Quart request object)"""
+    # Route template, not the raw path, to keep label cardinality bounded
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if route == '/metrics':
+        return
+    http_request_duration.observe(time.perf_counter() - started, app_name, request.method, route, str(status_code))
+    upstream_calls_per_request.observe(tally.calls, app_name, route)
+    upstream_time_per_request.observe(tally.seconds, app_name, route)
+    if status_code >= 500:
+        http_request_errors.inc(app_name, request.method, route)
+
+
+def instrument_flask(app, app_name: str) -> None:
+    """Time every request of `app` by route and count its upstream calls"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_tally = RequestUpstreamTally()
+        g._metrics_token = current_tally.set(g._metrics_tally)
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        tally = g.pop('_metrics_tally')
+        current_tally.reset(g.pop('_metrics_token'))
+        if response.is_streamed:
+            # The body (and its upstream calls) is produced after this hook,
+            # so observe the request once the stream has been sent
+            flask_request = request._get_current_object()
+            response.call_on_close(
+                lambda: _record_request(app_name, flask_request, response.status_code, started, tally))
+            return response
+        _record_request(app_name, request, response.status_code, started, tally)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument_quart(app, app_name: str) -> None:
+    """instrument_flask for the Quart apps in asgi.py"""
+    from quart import Response, g, request
+
+    # Hooks must be coroutines: Quart runs plain functions in a thread, where
+    # setting the context variable would not reach the request's task
+    @app.before_request
+    async def _start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_tally = RequestUpstreamTally()
+        g._metrics_token = current_tally.set(g._metrics_tally)
+
+    @app.after_request
+    async def _record(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        tally = g.pop('_metrics_tally')
+        current_tally.reset(g.pop('_metrics_token'))
+        _record_request(app_name, request, response.status_code, started, tally)
+        return response
+
+    @app.route('/metrics')
+    async def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,41 @@
+-- Migration 001: single round-trip experience award RPC
+-- Run in the Supabase SQL editor on databases created from supabase_schema.sql
+
+-- Award experience atomically: increment XP, recompute level, append the
+-- experience log row and (optionally) a completed quiz in one round trip.
+-- The UPDATE takes a row lock, so concurrent awards never lose increments.
+CREATE OR REPLACE FUNCTION award_experience(
+    p_user_id TEXT,
+    p_exp_gained INTEGER,
+    p_activity_type TEXT,
+    p_completed_quiz_id TEXT DEFAULT NULL,
+    p_metadata JSONB DEFAULT '{}'::jsonb
+)
+RETURNS SETOF user_profiles AS $$
+DECLARE
+    updated_profile user_profiles;
+BEGIN
+    UPDATE user_profiles
+    SET total_exp = total_exp + p_exp_gained,
+        level = calculate_user_level(total_exp + p_exp_gained),
+        last_active = NOW(),
+        completed_quizzes = CASE
+            WHEN p_completed_quiz_id IS NULL OR p_completed_quiz_id = ANY(completed_quizzes)
+            THEN completed_quizzes
+            ELSE array_append(completed_quizzes, p_completed_quiz_id)
+        END
+    WHERE user_id = p_user_id
+    RETURNING * INTO updated_profile;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO experience_logs (user_id, exp_gained, activity_type, total_exp_after, metadata)
+    VALUES (p_user_id, p_exp_gained, p_activity_type, updated_profile.total_exp, p_metadata);
+
+    RETURN NEXT updated_profile;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION award_experience(TEXT, INTEGER, TEXT, TEXT, JSONB) TO anon, authenticated;
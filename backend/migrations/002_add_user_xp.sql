@@ -0,0 +1,15 @@
+-- Migration 002: atomic XP increment used by quiz answer submission
+-- Run in the Supabase SQL editor on databases created from trading_quiz_schema.sql
+
+-- Atomically add XP to a user and return the updated profile
+-- (the level trigger recomputes level on the same UPDATE)
+CREATE OR REPLACE FUNCTION add_user_xp(p_user_id UUID, p_xp INTEGER)
+RETURNS SETOF users_profile AS $$
+    UPDATE users_profile
+    SET total_xp = total_xp + p_xp
+    WHERE id = p_user_id
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- The backend connects with SUPABASE_ANON_KEY, like award_experience (001)
+GRANT EXECUTE ON FUNCTION add_user_xp(UUID, INTEGER) TO anon, authenticated;
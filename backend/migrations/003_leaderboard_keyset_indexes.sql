@@ -0,0 +1,12 @@
+-- Migration 003: composite indexes backing keyset-paginated leaderboards
+-- Run in the Supabase SQL editor. Each index matches the leaderboard sort
+-- order (XP desc, then earliest sign-up, then id) so a page that starts
+-- after a cursor is an index seek, however deep the page is.
+
+-- supabase_schema.sql
+CREATE INDEX IF NOT EXISTS idx_user_profiles_leaderboard
+    ON user_profiles(total_exp DESC, created_at ASC, user_id ASC);
+
+-- trading_quiz_schema.sql
+CREATE INDEX IF NOT EXISTS idx_users_profile_leaderboard
+    ON users_profile(total_xp DESC, created_at ASC, id ASC);
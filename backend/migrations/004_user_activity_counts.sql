@@ -0,0 +1,23 @@
+-- Migration 004: server-side counters for the user stats endpoint
+-- Run in the Supabase SQL editor on databases created from supabase_schema.sql
+
+-- Lets COUNT(DISTINCT quiz_id) per user run as an index-only scan
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_quiz ON quiz_attempts(user_id, quiz_id);
+
+-- Per-user activity counters for get_user_stats, computed server-side so the
+-- response is one small row however much history the user has. The counts
+-- are answered from the (user_id, ...) indexes without reading quiz answers.
+CREATE OR REPLACE FUNCTION user_activity_counts(p_user_id TEXT)
+RETURNS TABLE (
+    total_quiz_attempts BIGINT,
+    distinct_quizzes BIGINT,
+    total_activities BIGINT
+) AS $$
+    SELECT
+        (SELECT COUNT(*) FROM quiz_attempts WHERE user_id = p_user_id),
+        (SELECT COUNT(DISTINCT quiz_id) FROM quiz_attempts WHERE user_id = p_user_id),
+        (SELECT COUNT(*) FROM experience_logs WHERE user_id = p_user_id);
+$$ LANGUAGE sql STABLE;
+
+-- get_user_stats calls this with the anon-key client, as for 001 and 005
+GRANT EXECUTE ON FUNCTION user_activity_counts(TEXT) TO anon, authenticated;
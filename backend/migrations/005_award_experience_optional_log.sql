@@ -0,0 +1,49 @@
+-- Migration 005: let award_experience skip its experience_logs insert
+-- Run in the Supabase SQL editor after migration 001. The backend batches
+-- experience_logs inserts itself when EXP_LOG_DURABILITY=buffered.
+
+-- Adding a parameter creates a new overload, so drop the old signature first
+DROP FUNCTION IF EXISTS award_experience(TEXT, INTEGER, TEXT, TEXT, JSONB);
+
+-- Award experience atomically: increment XP, recompute level, append the
+-- experience log row and (optionally) a completed quiz in one round trip.
+-- The UPDATE takes a row lock, so concurrent awards never lose increments.
+-- Pass p_log => FALSE when the caller batches experience_logs inserts itself.
+CREATE OR REPLACE FUNCTION award_experience(
+    p_user_id TEXT,
+    p_exp_gained INTEGER,
+    p_activity_type TEXT,
+    p_completed_quiz_id TEXT DEFAULT NULL,
+    p_metadata JSONB DEFAULT '{}'::jsonb,
+    p_log BOOLEAN DEFAULT TRUE
+)
+RETURNS SETOF user_profiles AS $$
+DECLARE
+    updated_profile user_profiles;
+BEGIN
+    UPDATE user_profiles
+    SET total_exp = total_exp + p_exp_gained,
+        level = calculate_user_level(total_exp + p_exp_gained),
+        last_active = NOW(),
+        completed_quizzes = CASE
+            WHEN p_completed_quiz_id IS NULL OR p_completed_quiz_id = ANY(completed_quizzes)
+            THEN completed_quizzes
+            ELSE array_append(completed_quizzes, p_completed_quiz_id)
+        END
+    WHERE user_id = p_user_id
+    RETURNING * INTO updated_profile;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF p_log THEN
+        INSERT INTO experience_logs (user_id, exp_gained, activity_type, total_exp_after, metadata)
+        VALUES (p_user_id, p_exp_gained, p_activity_type, updated_profile.total_exp, p_metadata);
+    END IF;
+
+    RETURN NEXT updated_profile;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION award_experience(TEXT, INTEGER, TEXT, TEXT, JSONB, BOOLEAN) TO anon, authenticated;
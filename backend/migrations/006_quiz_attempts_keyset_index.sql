@@ -0,0 +1,8 @@
+-- Migration 006: composite index backing keyset-paginated quiz attempt history
+-- Run in the Supabase SQL editor. Matches the history sort order (newest
+-- first, id as tie-breaker) within one user, so each page of
+-- /api/user/<id>/quiz-attempts is an index seek rather than a sort of the
+-- user's whole history. Per-quiz history filters the same index range.
+
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_history
+    ON quiz_attempts(user_id, completed_at DESC, id DESC);
@@ -0,0 +1,31 @@
+-- Migration 007: atomic appends to user_profiles.completed_quizzes / badges
+-- Run in the Supabase SQL editor after migration 001.
+--
+-- The backend used to read the profile, append in Python and write the
+-- whole array back, so concurrent writers (or a worker holding a cached
+-- profile) could overwrite each other's completions and badges. These
+-- functions append under the UPDATE's row lock instead.
+
+-- Record a completed quiz; returns the profile only if the quiz was added
+CREATE OR REPLACE FUNCTION add_completed_quiz(p_user_id TEXT, p_quiz_id TEXT)
+RETURNS SETOF user_profiles AS $$
+    UPDATE user_profiles
+    SET completed_quizzes = array_append(completed_quizzes, p_quiz_id)
+    WHERE user_id = p_user_id
+      AND NOT (p_quiz_id = ANY(completed_quizzes))
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Award a badge ({"id", "name", "earned_at"}); returns the profile only if
+-- the user did not already have a badge with that id
+CREATE OR REPLACE FUNCTION add_user_badge(p_user_id TEXT, p_badge JSONB)
+RETURNS SETOF user_profiles AS $$
+    UPDATE user_profiles
+    SET badges = COALESCE(badges, '[]'::jsonb) || jsonb_build_array(p_badge)
+    WHERE user_id = p_user_id
+      AND NOT COALESCE(badges, '[]'::jsonb) @> jsonb_build_array(jsonb_build_object('id', p_badge->'id'))
+    RETURNING *;
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION add_completed_quiz(TEXT, TEXT) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION add_user_badge(TEXT, JSONB) TO anon, authenticated;
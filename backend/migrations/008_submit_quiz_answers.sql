@@ -0,0 +1,73 @@
+-- Migration 008: grade a batch of quiz answers in one transaction
+-- Run in the Supabase SQL editor on databases created from trading_quiz_schema.sql
+--
+-- The backend used to read the progress rows, grade in Python, upsert them
+-- and then call add_user_xp, so two concurrent batches could both see
+-- best_score = 0 and award the same quiz twice, and a failed XP call left
+-- progress saying the XP had been earned. This function locks each progress
+-- row while it is updated and applies the XP delta in the same transaction.
+
+-- p_answers is a JSON array of {"quiz_id", "correct", "xp_reward"}, graded
+-- by the caller against the quiz catalog. Only the first correct answer for
+-- a quiz earns XP. Returns one row per answer, in order, with the XP it
+-- earned and the user's resulting total_xp and level; no rows if the user
+-- does not exist.
+CREATE OR REPLACE FUNCTION submit_quiz_answers(p_user_id UUID, p_answers JSONB)
+RETURNS TABLE (answer_index INTEGER, quiz_id BIGINT, xp_earned INTEGER, total_xp INTEGER, level INTEGER) AS $$
+DECLARE
+    v_answer JSONB;
+    v_index BIGINT;
+    v_quiz_id BIGINT;
+    v_correct BOOLEAN;
+    v_best_score INTEGER;
+    v_xp INTEGER;
+    v_total INTEGER := 0;
+    v_earned INTEGER[] := '{}';
+    v_total_xp INTEGER;
+    v_level INTEGER;
+BEGIN
+    -- Lock the profile first so concurrent batches for a user serialize
+    PERFORM 1 FROM users_profile WHERE id = p_user_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    FOR v_answer, v_index IN SELECT * FROM jsonb_array_elements(p_answers) WITH ORDINALITY LOOP
+        v_quiz_id := (v_answer->>'quiz_id')::BIGINT;
+        v_correct := (v_answer->>'correct')::BOOLEAN;
+
+        INSERT INTO user_quiz_progress (user_id, quiz_id, attempts, best_score, earned_xp)
+        VALUES (p_user_id, v_quiz_id, 0, 0, 0)
+        ON CONFLICT (user_id, quiz_id) DO NOTHING;
+
+        SELECT uqp.best_score INTO v_best_score
+        FROM user_quiz_progress uqp
+        WHERE uqp.user_id = p_user_id AND uqp.quiz_id = v_quiz_id
+        FOR UPDATE;
+
+        v_xp := CASE WHEN v_correct AND v_best_score = 0 THEN (v_answer->>'xp_reward')::INTEGER ELSE 0 END;
+        v_total := v_total + v_xp;
+        v_earned := array_append(v_earned, v_xp);
+
+        UPDATE user_quiz_progress uqp
+        SET attempts = uqp.attempts + 1,
+            best_score = GREATEST(uqp.best_score, CASE WHEN v_correct THEN 1 ELSE 0 END),
+            earned_xp = uqp.earned_xp + v_xp,
+            last_attempted = NOW()
+        WHERE uqp.user_id = p_user_id AND uqp.quiz_id = v_quiz_id;
+    END LOOP;
+
+    -- The level trigger recomputes level on this UPDATE
+    UPDATE users_profile up
+    SET total_xp = up.total_xp + v_total
+    WHERE up.id = p_user_id
+    RETURNING up.total_xp, up.level INTO v_total_xp, v_level;
+
+    RETURN QUERY
+    SELECT (e.i - 1)::INTEGER, (p_answers->(e.i::INTEGER - 1)->>'quiz_id')::BIGINT, e.xp, v_total_xp, v_level
+    FROM unnest(v_earned) WITH ORDINALITY AS e(xp, i);
+END;
+$$ LANGUAGE plpgsql;
+
+-- The backend connects with SUPABASE_ANON_KEY, like add_user_xp (002)
+GRANT EXECUTE ON FUNCTION submit_quiz_answers(UUID, JSONB) TO anon, authenticated;
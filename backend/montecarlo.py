@@ -0,0 +1,227 @@
+# montecarlo.py - Monte Carlo P&L distributions for option strategies
+#
+# Price paths follow geometric Brownian motion or Merton jump-diffusion
+# (Poisson jumps with normally distributed log sizes, drift-compensated so
+# the expected growth rate is still `drift`). Each path marks the strategy to
+# market with Black-Scholes at every step, which gives the P&L at expiry and
+# the worst peak-to-trough drawdown along the way.
+#
+# Paths are simulated in fixed-size shards, vectorized with NumPy, and large
+# runs are spread over a process pool. Every shard draws from its own child
+# of one SeedSequence, so a seed reproduces the same result whatever the
+# number of workers. A run is capped at MONTE_CARLO_MAX_PATHS paths and stops
+# at its time budget; shards not finished by then are dropped and the
+# result is flagged incomplete.
+import math
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import load_env
+from strategies import DAYS_PER_YEAR, Leg, StrategyBook
+
+MODELS = ('gbm', 'merton')
+SHARD_PATHS = 25000
+MAX_STEPS = 365
+# Bound on legs x paths x steps priced at once, to keep shard memory flat
+BLOCK_ELEMENTS = 1000000
+PNL_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class MonteCarloConfig:
+    """Pool size, path cap and default time budget, read from the environment"""
+
+    def __init__(self):
+        load_env()
+        self.workers = int(os.getenv("MONTE_CARLO_WORKERS") or os.cpu_count() or 1)
+        self.max_paths = int(os.getenv("MONTE_CARLO_MAX_PATHS", "2000000"))
+        self.time_budget = float(os.getenv("MONTE_CARLO_TIME_BUDGET", "10"))
+
+
+_config: Optional[MonteCarloConfig] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_config() -> MonteCarloConfig:
+    global _config
+    if _config is None:
+        _config = MonteCarloConfig()
+    return _config
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers are started by a clean server process rather than forked
+            # from a (possibly multi-threaded) web worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=get_config().workers, mp_context=context)
+        return _pool
+
+
+def _discard_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (they are restarted on the next large run)"""
+    _discard_pool()
+
+
+def simulate_shard(legs: Tuple[Leg, ...], spot: float, vol: float, rate: float, days: float,
+                   steps: int, paths: int, seed: np.random.SeedSequence, model: str = 'gbm',
+                   drift: Optional[float] = None, jump_intensity: float = 0.0, jump_mean: float = 0.0,
+                   jump_vol: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Final P&L and max drawdown of `paths` simulated paths (one array each)"""
+    rng = np.random.default_rng(seed)
+    book = StrategyBook(legs, spot, vol, rate, days)
+    drift = rate if drift is None else drift
+    dt = days / DAYS_PER_YEAR / steps
+
+    step_drift = (drift - 0.5 * vol * vol) * dt
+    if model == 'merton':
+        # Compensator keeps E[S_t] = S_0 * exp(drift * t) with jumps on
+        step_drift -= jump_intensity * (math.exp(jump_mean + 0.5 * jump_vol * jump_vol) - 1.0) * dt
+
+    log_spot = np.full(paths, math.log(spot))
+    pnl = np.full(paths, float(book.pnl(spot, days / DAYS_PER_YEAR)))
+    peak = pnl.copy()
+    drawdown = np.zeros(paths)
+    block = max(1, BLOCK_ELEMENTS // (paths * len(legs)))
+
+    for start in range(0, steps, block):
+        count = min(block, steps - start)
+        increments = step_drift + vol * math.sqrt(dt) * rng.standard_normal((paths, count))
+        if model == 'merton':
+            jumps = rng.poisson(jump_intensity * dt, (paths, count))
+            increments += jumps * jump_mean + np.sqrt(jumps) * jump_vol * rng.standard_normal((paths, count))
+        spots = np.exp(log_spot[:, None] + np.cumsum(increments, axis=1))
+        log_spot = np.log(spots[:, -1])
+
+        elapsed = np.arange(start + 1, start + count + 1) * dt
+        remaining = np.maximum(days / DAYS_PER_YEAR - elapsed, 0.0)
+        marks = book.pnl(spots, remaining[None, :])
+        running_peak = np.maximum(peak[:, None], np.maximum.accumulate(marks, axis=1))
+        drawdown = np.maximum(drawdown, (running_peak - marks).max(axis=1))
+        peak = running_peak[:, -1]
+        pnl = marks[:, -1]
+
+    return pnl, drawdown
+
+
+def _summarize(pnl: np.ndarray, drawdown: np.ndarray) -> Dict:
+    quantiles = np.quantile(pnl, PNL_QUANTILES)
+    return {
+        'probability_of_profit': float((pnl > 0).mean()),
+        'expected_pnl': float(pnl.mean()),
+        'pnl_std': float(pnl.std()),
+        'standard_error': float(pnl.std() / math.sqrt(pnl.size)),
+        'pnl_quantiles': {f"p{round(q * 100)}": float(value) for q, value in zip(PNL_QUANTILES, quantiles)},
+        'max_drawdown': {
+            'mean': float(drawdown.mean()),
+            'p95': float(np.quantile(drawdown, 0.95)),
+            'worst': float(drawdown.max())
+        }
+    }
+
+
+def simulate_strategy(legs: Tuple[Leg, ...], spot: float, vol: float, rate: float, days: float,
+                      paths: int = 100000, steps: Optional[int] = None, model: str = 'gbm',
+                      drift: Optional[float] = None, jump_intensity: float = 0.0, jump_mean: float = 0.0,
+                      jump_vol: float = 0.0, seed: Optional[int] = None,
+                      time_budget: Optional[float] = None) -> Dict:
+    """P&L distribution of a normalized leg set over simulated price paths"""
+    config = get_config()
+    if model not in MODELS:
+        raise ValueError(f"model must be one of: {', '.join(MODELS)}")
+    if spot <= 0 or vol < 0 or days <= 0:
+        raise ValueError("spot and days_to_expiry must be positive and vol non-negative")
+    if not 1 <= paths <= config.max_paths:
+        raise ValueError(f"paths must be between 1 and {config.max_paths}")
+    steps = steps or min(max(int(math.ceil(days)), 1), MAX_STEPS)
+    if not 1 <= steps <= MAX_STEPS:
+        raise ValueError(f"steps must be between 1 and {MAX_STEPS}")
+    if model == 'merton' and (jump_intensity < 0 or jump_vol < 0):
+        raise ValueError("jump_intensity and jump_vol must not be negative")
+    budget = config.time_budget if time_budget is None else min(time_budget, config.time_budget)
+
+    # A fresh seed is still reported so the run can be replayed; 53 bits
+    # survive a round trip through JavaScript numbers
+    seed = secrets.randbits(53) if seed is None else seed
+    seed_sequence = np.random.SeedSequence(seed)
+    sizes = [min(SHARD_PATHS, paths - start) for start in range(0, paths, SHARD_PATHS)]
+    children = seed_sequence.spawn(len(sizes))
+    shard_args = [(legs, spot, vol, rate, days, steps, size, child, model, drift,
+                   jump_intensity, jump_mean, jump_vol) for size, child in zip(sizes, children)]
+
+    started = time.perf_counter()
+    results: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    workers = min(config.workers, len(shard_args))
+    if workers <= 1:
+        for index, args in enumerate(shard_args):
+            if results and time.perf_counter() - started > budget:
+                break
+            results[index] = simulate_shard(*args)
+    else:
+        results = _run_pool(shard_args, started + budget)
+
+    if not results:
+        raise TimeoutError("No Monte Carlo shard finished within the time budget")
+    # Shard order, not completion order, so a seed gives the same arrays
+    ordered = [results[index] for index in sorted(results)]
+    pnl = np.concatenate([shard[0] for shard in ordered])
+    drawdown = np.concatenate([shard[1] for shard in ordered])
+
+    summary = _summarize(pnl, drawdown)
+    summary.update({
+        'paths': int(pnl.size),
+        'requested_paths': paths,
+        'complete': len(results) == len(shard_args),
+        'steps': steps,
+        'model': model,
+        'seed': seed,
+        'elapsed_seconds': round(time.perf_counter() - started, 4)
+    })
+    return summary
+
+
+def _run_pool(shard_args: List[Tuple], deadline: float) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    pool = _get_pool()
+    try:
+        pending = {pool.submit(simulate_shard, *args): index for index, args in enumerate(shard_args)}
+    except BrokenProcessPool:
+        _discard_pool()
+        pool = _get_pool()
+        pending = {pool.submit(simulate_shard, *args): index for index, args in enumerate(shard_args)}
+
+    results = {}
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=max(deadline - time.perf_counter(), 0.0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    except BrokenProcessPool:
+        _discard_pool()
+        raise
+    finally:
+        # Over budget: drop shards that have not started; running ones finish
+        # in the background and are discarded
+        for future in pending:
+            future.cancel()
+    return results
@@ -0,0 +1,82 @@
+# pagination.py - Opaque keyset cursors shared by the paginated endpoints
+import base64
+import json
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+STREAM_PAGE_SIZE = 500
+
+
+def encode_cursor(position: Dict) -> str:
+    """Turn the sort-key values of the last row on a page into an opaque cursor"""
+    raw = json.dumps(position, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, fields: Sequence[str]) -> Dict:
+    """Parse a cursor from `encode_cursor`; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict) or any(field not in position for field in fields):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def _quote(value) -> str:
+    # PostgREST filter values containing , . : ( ) must be double-quoted
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+
+def keyset_filter(order: List[Tuple[str, bool]], values: Sequence[Any]) -> str:
+    """PostgREST `or` filter selecting the rows that sort after `values`.
+
+    `order` lists (column, descending) pairs, most significant first, and
+    `values` holds each column's value on the last row already served.
+    For ORDER BY a DESC, b ASC this yields
+    `a.lt.X,and(a.eq.X,b.gt.Y)`, which an index on (a DESC, b) can seek to.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        equal = [f"{prev}.eq.{_quote(value)}" for (prev, _), value in zip(order[:i], values)]
+        operator = 'lt' if descending else 'gt'
+        step = f"{column}.{operator}.{_quote(values[i])}"
+        clauses.append(f"and({','.join(equal + [step])})" if equal else step)
+    return ','.join(clauses)
+
+
+def keyset_query(query, order: List[Tuple[str, bool]], after: Sequence[Any], limit: int):
+    """Order a select builder as a keyset page: rows after `after` (or from the
+    start if it is None), plus one extra row telling whether more follow"""
+    if after is not None:
+        query = query.or_(keyset_filter(order, after))
+    for column, descending in order:
+        query = query.order(column, desc=descending)
+    return query.limit(limit + 1)
+
+
+def split_page(rows: List[Dict], limit: int) -> Tuple[List[Dict], bool]:
+    """The rows of an executed keyset_query, and whether there is a next page"""
+    rows = rows or []
+    return rows[:limit], len(rows) > limit
+
+
+def iter_keyset(make_query: Callable[[], Any], order: List[Tuple[str, bool]],
+                page_size: int = STREAM_PAGE_SIZE) -> Iterator[Dict]:
+    """Yield every row of a select in `order`, a keyset page at a time.
+
+    `make_query` must return a fresh, unordered builder for each page
+    (builders are not reusable after execute) and `order` must be a total
+    order, e.g. ending in a unique id. Unlike .range() offsets, rows written
+    while the iteration runs cannot shift a page boundary, so no row is
+    yielded twice or skipped.
+    """
+    after = None
+    while True:
+        rows, more = split_page(keyset_query(make_query(), order, after, page_size).execute().data, page_size)
+        yield from rows
+        if not more:
+            return
+        after = [rows[-1][column] for column, _ in order]
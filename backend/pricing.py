@@ -0,0 +1,207 @@
+# pricing.py - Vectorized Black-Scholes prices and Greeks
+#
+# Every function takes NumPy arrays (or scalars) that broadcast against each
+# other, so a whole strike ladder or option chain is priced in one call.
+# Inputs use decimal units: time in years, volatility, rate and dividend
+# yield as fractions (0.25 = 25%).
+#
+# Greek conventions (the ones trading UIs display):
+#   delta, gamma  per 1.00 move in the underlying
+#   theta         per calendar day
+#   vega, rho     per 1 percentage point change in volatility / rate
+#
+# The normal CDF comes from scipy.special.ndtr when scipy is installed and
+# from a Chebyshev erfc approximation (relative error < 1.2e-7) otherwise.
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    from scipy.special import ndtr as _ndtr
+except ImportError:
+    _ndtr = None
+
+GREEKS = ('delta', 'gamma', 'theta', 'vega', 'rho')
+DAYS_PER_YEAR = 365.0
+
+# Implied vol search range and bracket width treated as converged
+IV_MIN = 1e-4
+IV_MAX = 5.0
+IV_TOL = 1e-10
+
+_SQRT_2PI = math.sqrt(2.0 * math.pi)
+
+
+def _erfc(x: np.ndarray) -> np.ndarray:
+    """Complementary error function (Numerical Recipes erfcc)"""
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    result = t * np.exp(poly)
+    return np.where(x >= 0, result, 2.0 - result)
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal cumulative distribution function"""
+    if _ndtr is not None:
+        return _ndtr(x)
+    return 0.5 * _erfc(-np.asarray(x, dtype=float) / math.sqrt(2.0))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal probability density function"""
+    return np.exp(-0.5 * np.square(x)) / _SQRT_2PI
+
+
+def parse_option_types(option_type) -> np.ndarray:
+    """Boolean call mask from 'call'/'put' strings (or a sequence of them)"""
+    types = np.char.lower(np.asarray(option_type, dtype=str))
+    invalid = ~np.isin(types, ('call', 'put', 'c', 'p'))
+    if invalid.any():
+        raise ValueError(f"Option type must be 'call' or 'put', got '{types[invalid].flat[0]}'")
+    return np.isin(types, ('call', 'c'))
+
+
+def black_scholes(spot, strike, t, vol, rate, is_call, dividend=0.0,
+                  greeks: bool = True) -> Dict[str, np.ndarray]:
+    """Price (and optionally Greeks) of European options, element-wise.
+
+    Expired options (t <= 0) and zero-volatility options are valued at their
+    discounted forward intrinsic value, with delta a step and the other
+    Greeks zero, instead of producing NaNs.
+    """
+    spot, strike, t, vol, rate, dividend, is_call = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (spot, strike, t, vol, rate, dividend)),
+        np.asarray(is_call, dtype=bool)
+    )
+    if (spot <= 0).any() or (strike <= 0).any():
+        raise ValueError("spot and strike must be positive")
+    if (vol < 0).any():
+        raise ValueError("vol must not be negative")
+
+    sign = np.where(is_call, 1.0, -1.0)
+    tau = np.maximum(t, 0.0)
+    discount = np.exp(-rate * tau)
+    carry = np.exp(-dividend * tau)
+
+    sigma_sqrt_t = vol * np.sqrt(tau)
+    live = sigma_sqrt_t > 0
+    # Placeholder width keeps the log/divide finite; those lanes are replaced below
+    width = np.where(live, sigma_sqrt_t, 1.0)
+    d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * tau) / width
+    d2 = d1 - width
+
+    nd1 = norm_cdf(sign * d1)
+    nd2 = norm_cdf(sign * d2)
+    price = sign * (spot * carry * nd1 - strike * discount * nd2)
+
+    # Degenerate lanes: deterministic forward, so the option is worth its
+    # discounted intrinsic value and delta is 0 or +/-carry
+    forward_itm = sign * (spot * carry - strike * discount) > 0
+    price = np.where(live, price, np.where(forward_itm, sign * (spot * carry - strike * discount), 0.0))
+    result = {'price': price}
+    if not greeks:
+        return result
+
+    pdf_d1 = norm_pdf(d1)
+    delta = sign * carry * nd1
+    gamma = carry * pdf_d1 / (spot * width)
+    vega = spot * carry * pdf_d1 * np.sqrt(tau)
+    theta = (-spot * carry * pdf_d1 * vol / (2.0 * np.sqrt(np.where(live, tau, 1.0)))
+             - sign * rate * strike * discount * nd2
+             + sign * dividend * spot * carry * nd1)
+    rho = sign * strike * tau * discount * nd2
+
+    result['delta'] = np.where(live, delta, np.where(forward_itm, sign * carry, 0.0))
+    result['gamma'] = np.where(live, gamma, 0.0)
+    result['theta'] = np.where(live, theta, 0.0) / DAYS_PER_YEAR
+    result['vega'] = np.where(live, vega, 0.0) / 100.0
+    result['rho'] = np.where(live, rho, np.where(forward_itm, sign * strike * tau * discount, 0.0)) / 100.0
+    return result
+
+
+def price_batch(spot, strike, t, vol, rate, option_type, dividend=0.0,
+                greeks: bool = True, max_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Black-Scholes over broadcastable columns with 'call'/'put' types"""
+    is_call = parse_option_types(option_type)
+    size = np.broadcast_shapes(*(np.shape(value) for value in (spot, strike, t, vol, rate, dividend)),
+                               is_call.shape)
+    if max_size is not None and int(np.prod(size)) > max_size:
+        raise ValueError(f"Batch too large: at most {max_size} options per request")
+    return black_scholes(spot, strike, t, vol, rate, is_call, dividend, greeks)
+
+
+def implied_volatility(price, spot, strike, t, rate, is_call, dividend=0.0, tol: float = 1e-8,
+                       max_iter: int = 100) -> Dict[str, np.ndarray]:
+    """Black-Scholes implied volatility of observed prices, element-wise.
+
+    Safeguarded Newton: every lane keeps a [lo, hi] bracket on the vol, and
+    a Newton step that leaves it (or meets a vanishing vega, deep in or out
+    of the money) is replaced by bisection, so each lane converges. Lanes
+    are dropped from the working set as they converge. Prices outside the
+    no-arbitrage bounds, or with no time left, have no implied vol: NaN with
+    converged False.
+    """
+    columns = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (price, spot, strike, t, rate, dividend)),
+        np.asarray(is_call, dtype=bool)
+    )
+    shape = columns[0].shape
+    price, spot, strike, t, rate, dividend, is_call = (np.ravel(column) for column in columns)
+    if (spot <= 0).any() or (strike <= 0).any():
+        raise ValueError("spot and strike must be positive")
+
+    tau = np.maximum(t, 0.0)
+    discount = np.exp(-rate * tau)
+    forward_spot = spot * np.exp(-dividend * tau)
+    lower = np.maximum(np.where(is_call, forward_spot - strike * discount, strike * discount - forward_spot), 0.0)
+    upper = np.where(is_call, forward_spot, strike * discount)
+    solvable = np.isfinite(price) & (tau > 0) & (price > lower) & (price < upper)
+
+    vol = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    iterations = np.zeros(price.shape, dtype=np.int64)
+
+    lanes = np.flatnonzero(solvable)
+    # Prices above what IV_MAX produces are left unsolved
+    at_max = black_scholes(spot[lanes], strike[lanes], tau[lanes], IV_MAX, rate[lanes], is_call[lanes],
+                           dividend[lanes], greeks=False)['price']
+    lanes = lanes[at_max >= price[lanes]]
+
+    # Start from the vol that puts the strike one standard deviation from
+    # the forward, kept inside a range where vega is not negligible
+    moneyness = np.abs(np.log(forward_spot[lanes] / (strike[lanes] * discount[lanes])))
+    sigma = np.clip(np.sqrt(2.0 * moneyness / tau[lanes]), 0.1, 2.0)
+    lo = np.full(lanes.size, IV_MIN)
+    hi = np.full(lanes.size, IV_MAX)
+
+    for iteration in range(1, max_iter + 1):
+        if lanes.size == 0:
+            break
+        result = black_scholes(spot[lanes], strike[lanes], tau[lanes], sigma, rate[lanes], is_call[lanes],
+                               dividend[lanes])
+        diff = result['price'] - price[lanes]
+        done = (np.abs(diff) <= tol) | (hi - lo <= IV_TOL)
+        vol[lanes[done]] = sigma[done]
+        converged[lanes[done]] = True
+        iterations[lanes] = iteration
+
+        keep = ~done
+        lanes, sigma, lo, hi, diff = lanes[keep], sigma[keep], lo[keep], hi[keep], diff[keep]
+        vega = result['vega'][keep] * 100.0
+        # Price rises with vol, so the sign of the error moves one bracket end
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff < 0, sigma, lo)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sigma - diff / vega
+        in_bracket = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        sigma = np.where(in_bracket, newton, 0.5 * (lo + hi))
+
+    return {
+        'implied_vol': vol.reshape(shape),
+        'converged': converged.reshape(shape),
+        'iterations': iterations.reshape(shape)
+    }
@@ -0,0 +1,235 @@
+# pricing_api.py - Options pricing endpoints backed by the vectorized engine
+from typing import Dict, List, Tuple
+
+import numpy as np
+from flask import Blueprint, Flask, jsonify, request
+from flask_cors import CORS
+
+from config import load_env
+from json_provider import install_json_provider
+from metrics import cache_collector, instrument_flask, registry
+from montecarlo import simulate_strategy
+from pricing import implied_volatility, parse_option_types, price_batch
+from strategies import STRATEGY_TEMPLATES, normalize_legs, pl_surface, strategy_legs, surface_cache_stats
+
+pricing_api = Blueprint('pricing', __name__)
+
+registry.register_collector(cache_collector('pricing', lambda: {'pl_surface': surface_cache_stats()}))
+
+MAX_PRICING_BATCH = 100000
+PRICING_FIELDS = ('spot', 'strike', 't', 'vol', 'rate')
+IMPLIED_VOL_FIELDS = ('price', 'spot', 'strike', 't', 'rate')
+
+
+def option_columns(data: Dict, fields: Tuple[str, ...] = PRICING_FIELDS) -> Dict:
+    """Columns from either {"spot": ..., "strike": [...], ...} or {"options": [{...}, ...]}.
+
+    Columnar values may be scalars or lists and broadcast against each other,
+    so a strike ladder is one list of strikes with scalar spot/t/vol/rate.
+    `fields` are the required columns; type and dividend are optional.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    if 'options' in data:
+        options = data['options']
+        if not isinstance(options, list) or not options or not all(isinstance(o, dict) for o in options):
+            raise ValueError("options must be a non-empty list of objects")
+        data = {field: [option.get(field, data.get(field)) for option in options]
+                for field in fields + ('type', 'dividend')}
+
+    missing = [field for field in fields if data.get(field) is None
+               or (isinstance(data[field], list) and None in data[field])]
+    if missing:
+        raise ValueError(f"Missing required field: {', '.join(missing)}")
+    columns = {field: data[field] for field in fields}
+    columns['option_type'] = data.get('type') or 'call'
+    if isinstance(columns['option_type'], list):
+        columns['option_type'] = [value or 'call' for value in columns['option_type']]
+    dividend = data.get('dividend')
+    if isinstance(dividend, list):
+        dividend = [value or 0.0 for value in dividend]
+    columns['dividend'] = dividend or 0.0
+    return columns
+
+
+def strategy_request_legs(data: Dict) -> List:
+    """Legs of the template named by `strategy_id`, else the custom `legs`"""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    strategy_id = data.get('strategy_id')
+    if strategy_id is not None:
+        if strategy_id not in STRATEGY_TEMPLATES:
+            raise ValueError(f"Unknown strategy_id, expected one of: {', '.join(STRATEGY_TEMPLATES)}")
+        return strategy_legs(strategy_id)
+    legs = data.get('legs')
+    if not isinstance(legs, list) or not legs or not all(isinstance(leg, dict) for leg in legs):
+        raise ValueError("Provide strategy_id or legs as a non-empty list of objects")
+    return legs
+
+
+@pricing_api.route('/api/pricing/batch', methods=['POST'])
+def price_options():
+    """Black-Scholes price and Greeks for a batch of European options"""
+    try:
+        data = request.get_json(silent=True)
+        columns = option_columns(data)
+        greeks = data.get('greeks', True)
+        # bool("false") is True, so only JSON booleans are accepted
+        if not isinstance(greeks, bool):
+            raise ValueError("greeks must be true or false")
+        result = price_batch(**columns, greeks=greeks, max_size=MAX_PRICING_BATCH)
+
+        return jsonify({
+            "success": True,
+            "data": {name: values.ravel() for name, values in result.items()},
+            "count": int(result['price'].size),
+            "units": {
+                "theta": "per calendar day",
+                "vega": "per 1% volatility",
+                "rho": "per 1% rate"
+            } if greeks else None
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error pricing options: {str(e)}"
+        }), 500
+
+
+@pricing_api.route('/api/pricing/implied-vol', methods=['POST'])
+def implied_vols():
+    """Implied volatility of observed option prices, e.g. a whole chain"""
+    try:
+        data = request.get_json(silent=True)
+        columns = option_columns(data, IMPLIED_VOL_FIELDS)
+        is_call = parse_option_types(columns.pop('option_type'))
+        size = np.broadcast_shapes(*(np.shape(value) for value in columns.values()), is_call.shape)
+        if int(np.prod(size)) > MAX_PRICING_BATCH:
+            raise ValueError(f"Batch too large: at most {MAX_PRICING_BATCH} options per request")
+        result = implied_volatility(**columns, is_call=is_call)
+
+        return jsonify({
+            "success": True,
+            "data": {name: values.ravel() for name, values in result.items()},
+            "count": int(result['implied_vol'].size),
+            "converged": int(result['converged'].sum())
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error solving implied volatility: {str(e)}"
+        }), 500
+
+
+@pricing_api.route('/api/pricing/pl-surface', methods=['POST'])
+def strategy_pl_surface():
+    """P&L over spot x time to expiry for a strategy template or custom legs"""
+    try:
+        data = request.get_json(silent=True)
+        legs = strategy_request_legs(data)
+        price_range = data.get('price_range')
+        if price_range is not None and (not isinstance(price_range, list) or len(price_range) != 2):
+            raise ValueError("price_range must be [low, high]")
+        surface = pl_surface(
+            legs,
+            spot=float(data.get('spot', 100.0)),
+            vol=float(data.get('vol', 0.25)),
+            rate=float(data.get('rate', 0.05)),
+            days_to_expiry=float(data.get('days_to_expiry', 30)),
+            price_range=[float(value) for value in price_range] if price_range else None,
+            price_steps=int(data.get('price_steps', 101)),
+            time_steps=int(data.get('time_steps', 11))
+        )
+
+        return jsonify({
+            "success": True,
+            "data": {"strategy_id": data.get('strategy_id'), **surface}
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error building P&L surface: {str(e)}"
+        }), 500
+
+
+@pricing_api.route('/api/pricing/monte-carlo', methods=['POST'])
+def strategy_monte_carlo():
+    """Simulated P&L distribution for a strategy template or custom legs"""
+    try:
+        data = request.get_json(silent=True)
+        legs = normalize_legs(strategy_request_legs(data))
+        seed = data.get('seed')
+        steps = data.get('steps')
+        drift = data.get('drift')
+        time_budget = data.get('time_budget')
+        result = simulate_strategy(
+            legs,
+            spot=float(data.get('spot', 100.0)),
+            vol=float(data.get('vol', 0.25)),
+            rate=float(data.get('rate', 0.05)),
+            days=float(data.get('days_to_expiry', 30)),
+            paths=int(data.get('paths', 100000)),
+            steps=int(steps) if steps is not None else None,
+            model=data.get('model', 'gbm'),
+            drift=float(drift) if drift is not None else None,
+            jump_intensity=float(data.get('jump_intensity', 0.0)),
+            jump_mean=float(data.get('jump_mean', 0.0)),
+            jump_vol=float(data.get('jump_vol', 0.0)),
+            seed=int(seed) if seed is not None else None,
+            time_budget=float(time_budget) if time_budget is not None else None
+        )
+
+        return jsonify({
+            "success": True,
+            "data": {"strategy_id": data.get('strategy_id'), **result}
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except TimeoutError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error running simulation: {str(e)}"
+        }), 500
+
+
+def create_app() -> Flask:
+    """Build the Flask app serving only the pricing endpoints"""
+    load_env()
+    app = Flask(__name__)
+    CORS(app)
+    install_json_provider(app)
+    app.register_blueprint(pricing_api)
+    instrument_flask(app, 'pricing')
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5003, debug=True)
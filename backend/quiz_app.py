@@ -1,22 +1,36 @@
 # quiz_app.py - Flask app for Trading Quiz functionality
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, jsonify, request
 from flask_cors import CORS
-from dotenv import load_dotenv  
-import os
+from config import load_env
 from quiz_client import quiz_client
+from connection import connection_pool
+from metrics import cache_collector, instrument_flask, registry
+from resilience import protect_flask
+from rate_limit import rate_limited
+from json_provider import install_json_provider, ndjson_response, wants_ndjson
 import uuid
 
-load_dotenv()
+quiz_api = Blueprint('quiz', __name__)
 
-app = Flask(__name__)
-CORS(app)
+# Scraping /metrics reports cache counters without forcing the client to be built
+registry.register_collector(cache_collector(
+    'quiz', lambda: quiz_client.get_cache_stats() if quiz_client.initialized else None))
 
-@app.route('/')
+MAX_BATCH_ANSWERS = 100
+MAX_LEADERBOARD_LIMIT = 500
+MAX_LEADERBOARD_RADIUS = 50
+
+def _batch_cost(body) -> int:
+    """Rate-limit tokens for a batch submission: one per answer"""
+    answers = body.get('answers') if isinstance(body, dict) else None
+    return min(max(len(answers), 1), MAX_BATCH_ANSWERS) if isinstance(answers, list) else 1
+
+@quiz_api.route('/')
 def home():
     return "Trading Quiz API with Supabase"
 
 # Quiz Endpoints
-@app.route('/api/quizzes', methods=['GET'])
+@quiz_api.route('/api/quizzes', methods=['GET'])
 def get_quizzes():
     """Get all quizzes, optionally filtered by difficulty"""
     try:
@@ -34,7 +48,7 @@ def get_quizzes():
             "message": f"Error getting quizzes: {str(e)}"
         }), 500
 
-@app.route('/api/quizzes/<int:quiz_id>', methods=['GET'])
+@quiz_api.route('/api/quizzes/<int:quiz_id>', methods=['GET'])
 def get_quiz(quiz_id):
     """Get a specific quiz by ID"""
     try:
@@ -57,7 +71,7 @@ def get_quiz(quiz_id):
             "message": f"Error getting quiz: {str(e)}"
         }), 500
 
-@app.route('/api/quizzes', methods=['POST'])
+@quiz_api.route('/api/quizzes', methods=['POST'])
 def create_quiz():
     """Create a new quiz (admin only)"""
     try:
@@ -119,7 +133,7 @@ def create_quiz():
         }), 500
 
 # User Profile Endpoints
-@app.route('/api/users/profile', methods=['POST'])
+@quiz_api.route('/api/users/profile', methods=['POST'])
 def create_user_profile():
     """Create a new user profile"""
     try:
@@ -154,7 +168,7 @@ def create_user_profile():
             "message": f"Error creating user profile: {str(e)}"
         }), 500
 
-@app.route('/api/users/<user_id>/profile', methods=['GET'])
+@quiz_api.route('/api/users/<user_id>/profile', methods=['GET'])
 def get_user_profile(user_id):
     """Get user profile"""
     try:
@@ -177,7 +191,7 @@ def get_user_profile(user_id):
             "message": f"Error getting user profile: {str(e)}"
         }), 500
 
-@app.route('/api/users/<user_id>/stats', methods=['GET'])
+@quiz_api.route('/api/users/<user_id>/stats', methods=['GET'])
 def get_user_stats(user_id):
     """Get user statistics"""
     try:
@@ -201,7 +215,8 @@ def get_user_stats(user_id):
         }), 500
 
 # Quiz Interaction Endpoints
-@app.route('/api/users/<user_id>/quiz/<int:quiz_id>/answer', methods=['POST'])
+@quiz_api.route('/api/users/<user_id>/quiz/<int:quiz_id>/answer', methods=['POST'])
+@rate_limited('answer')
 def submit_quiz_answer(user_id, quiz_id):
     """Submit an answer to a quiz"""
     try:
@@ -226,10 +241,59 @@ def submit_quiz_answer(user_id, quiz_id):
             "message": f"Error submitting quiz answer: {str(e)}"
         }), 500
 
-@app.route('/api/users/<user_id>/quiz-progress', methods=['GET'])
+@quiz_api.route('/api/users/<user_id>/quiz/answers', methods=['POST'])
+@rate_limited('answer', cost=_batch_cost)
+def submit_quiz_answers(user_id):
+    """Submit answers to several quizzes in one request"""
+    try:
+        data = request.json
+        answers = data.get('answers') if data else None
+        
+        if not isinstance(answers, list) or not answers:
+            return jsonify({
+                "success": False,
+                "message": "answers must be a non-empty list"
+            }), 400
+        
+        if len(answers) > MAX_BATCH_ANSWERS:
+            return jsonify({
+                "success": False,
+                "message": f"At most {MAX_BATCH_ANSWERS} answers can be submitted at once"
+            }), 400
+        
+        for answer in answers:
+            if not isinstance(answer, dict) or 'quiz_id' not in answer or 'selected_choice' not in answer:
+                return jsonify({
+                    "success": False,
+                    "message": "Each answer requires quiz_id and selected_choice"
+                }), 400
+            
+            # bool is a subclass of int, so true/false would pass as quiz 1/0
+            if not isinstance(answer['quiz_id'], int) or isinstance(answer['quiz_id'], bool):
+                return jsonify({
+                    "success": False,
+                    "message": "quiz_id must be an integer"
+                }), 400
+        
+        result = quiz_client.submit_quiz_answers(user_id, answers)
+        
+        if result["success"]:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error submitting quiz answers: {str(e)}"
+        }), 500
+
+@quiz_api.route('/api/users/<user_id>/quiz-progress', methods=['GET'])
 def get_user_quiz_progress(user_id):
     """Get all quiz progress for a user"""
     try:
+        if wants_ndjson(request):
+            return ndjson_response(quiz_client.iter_user_quiz_progress(user_id))
         progress = quiz_client.get_user_quiz_progress(user_id)
         
         return jsonify({
@@ -243,7 +307,7 @@ def get_user_quiz_progress(user_id):
             "message": f"Error getting quiz progress: {str(e)}"
         }), 500
 
-@app.route('/api/users/<user_id>/quiz/<int:quiz_id>/progress', methods=['GET'])
+@quiz_api.route('/api/users/<user_id>/quiz/<int:quiz_id>/progress', methods=['GET'])
 def get_quiz_progress(user_id, quiz_id):
     """Get progress for a specific quiz"""
     try:
@@ -268,7 +332,8 @@ def get_quiz_progress(user_id, quiz_id):
         }), 500
 
 # Balance Management
-@app.route('/api/users/<user_id>/balance', methods=['POST'])
+@quiz_api.route('/api/users/<user_id>/balance', methods=['POST'])
+@rate_limited('balance')
 def update_user_balance(user_id):
     """Update user balance"""
     try:
@@ -301,28 +366,79 @@ def update_user_balance(user_id):
         }), 500
 
 # Leaderboard and Statistics
-@app.route('/api/leaderboard', methods=['GET'])
+@quiz_api.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get leaderboard"""
+    """Get leaderboard (paged via `cursor`, or a window via `around`/`radius`)"""
     try:
-        limit = request.args.get('limit', 50, type=int)
-        leaderboard = quiz_client.get_leaderboard(limit)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_LEADERBOARD_LIMIT)
+        around = request.args.get('around')
+        
+        if around:
+            radius = min(max(request.args.get('radius', 5, type=int), 0), MAX_LEADERBOARD_RADIUS)
+            ranking = quiz_client.get_leaderboard_rank(around, radius)
+            if not ranking:
+                return jsonify({
+                    "success": False,
+                    "message": "User not found on leaderboard"
+                }), 404
+            
+            return jsonify({
+                "success": True,
+                "data": ranking['neighbors'],
+                "rank": ranking['rank'],
+                "total": ranking['total'],
+                "next_cursor": ranking['next_cursor']
+            }), 200
+        
+        page = quiz_client.get_leaderboard_page(limit, request.args.get('cursor'))
         
         return jsonify({
             "success": True,
-            "data": leaderboard
+            "data": page['entries'],
+            "next_cursor": page['next_cursor']
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error getting leaderboard: {str(e)}"
         }), 500
 
-@app.route('/api/quiz-statistics', methods=['GET'])
+@quiz_api.route('/api/leaderboard/rank/<user_id>', methods=['GET'])
+def get_leaderboard_rank(user_id):
+    """Get a user's rank, optionally with `radius` neighbors on either side"""
+    try:
+        radius = min(max(request.args.get('radius', 0, type=int), 0), MAX_LEADERBOARD_RADIUS)
+        ranking = quiz_client.get_leaderboard_rank(user_id, radius)
+        
+        if ranking:
+            return jsonify({
+                "success": True,
+                "data": ranking
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "User not found on leaderboard"
+            }), 404
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error getting leaderboard rank: {str(e)}"
+        }), 500
+
+@quiz_api.route('/api/quiz-statistics', methods=['GET'])
 def get_quiz_statistics():
     """Get quiz statistics"""
     try:
+        if wants_ndjson(request):
+            return ndjson_response(quiz_client.iter_quiz_statistics())
         stats = quiz_client.get_quiz_statistics()
         
         return jsonify({
@@ -336,5 +452,34 @@ def get_quiz_statistics():
             "message": f"Error getting quiz statistics: {str(e)}"
         }), 500
 
+@quiz_api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get in-process cache counters"""
+    return jsonify({
+        "success": True,
+        "data": quiz_client.get_cache_stats()
+    }), 200
+
+@quiz_api.route('/api/pool/stats', methods=['GET'])
+def get_pool_stats():
+    """Get Supabase connection pool configuration and utilization"""
+    return jsonify({
+        "success": True,
+        "data": connection_pool.get_stats()
+    }), 200
+
+def create_app() -> Flask:
+    """Build the Flask app; Supabase clients are created lazily on first use"""
+    load_env()
+    app = Flask(__name__)
+    CORS(app)
+    install_json_provider(app)
+    app.register_blueprint(quiz_api)
+    instrument_flask(app, 'quiz')
+    protect_flask(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002, debug=True)
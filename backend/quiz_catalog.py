@@ -0,0 +1,151 @@
+# quiz_catalog.py - In-memory snapshot of the quizzes table
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from resilience import note_served_stale, note_unavailable
+
+
+class QuizCatalog:
+    """Quiz catalog loaded once and refreshed on TTL expiry or invalidation.
+
+    The catalog is tiny and changes rarely, so it is indexed in memory by id
+    and by difficulty, together with a compact answer key
+    (id -> (correct_choice, xp_reward)) used for grading.
+    """
+
+    def __init__(self, loader: Optional[Callable[[], List[Dict]]] = None, ttl: float = 300.0,
+                 miss_refresh_interval: float = 5.0, retry_interval: float = 5.0):
+        self._loader = loader
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._quizzes: List[Dict] = []
+        self._by_id: Dict[int, Dict] = {}
+        self._by_difficulty: Dict[str, List[Dict]] = {}
+        self._answer_key: Dict[int, Tuple[int, int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._invalidated = False
+        self.version = 0
+        self.loads = 0
+        self.load_errors = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        return (not self.loaded or self._invalidated
+                or time.monotonic() - self._loaded_at >= self.ttl)
+
+    def refresh(self, quiz_id: Optional[int] = None, force: bool = True) -> bool:
+        """Reload the catalog; on failure keep serving the previous snapshot.
+
+        With force=False the need for a reload is re-checked under the lock,
+        so concurrent callers that all saw a stale catalog load it once.
+        """
+        if self._loader is None:
+            # Owner loads asynchronously and calls install() itself
+            return False
+        with self._lock:
+            if not force and not self.needs_refresh(quiz_id):
+                return self.loaded
+            try:
+                quizzes = self._loader()
+            except Exception as e:
+                self.record_failure(e)
+                if self.loaded:
+                    # The previous snapshot still answers this request
+                    note_served_stale()
+                return False
+
+            self.install(quizzes)
+            return True
+
+    def record_failure(self, error: Exception) -> None:
+        """Count a failed load; reloads then wait for retry_interval"""
+        self.load_errors += 1
+        self._failed_at = time.monotonic()
+        print(f"Error loading quiz catalog: {error}")
+
+    def _retry_in(self) -> float:
+        """Seconds until a failed load may be retried (0 if not backing off)"""
+        if self._failed_at is None:
+            return 0.0
+        return max(self.retry_interval - (time.monotonic() - self._failed_at), 0.0)
+
+    def install(self, quizzes: List[Dict]) -> None:
+        """Replace the snapshot with already-fetched quiz rows"""
+        by_id = {}
+        by_difficulty: Dict[str, List[Dict]] = {}
+        answer_key = {}
+        for quiz in sorted(quizzes, key=lambda q: q['id']):
+            by_id[quiz['id']] = quiz
+            by_difficulty.setdefault(quiz['difficulty'], []).append(quiz)
+            answer_key[quiz['id']] = (quiz['correct_choice'], quiz['xp_reward'])
+
+        # Swap the indexes in one go so readers never see a partial catalog
+        self._quizzes = list(by_id.values())
+        self._by_id = by_id
+        self._by_difficulty = by_difficulty
+        self._answer_key = answer_key
+        self._loaded_at = time.monotonic()
+        self._invalidated = False
+        self.version += 1
+        self.loads += 1
+
+    def invalidate(self) -> None:
+        """Force a reload on next access (e.g. after a quiz is created)"""
+        self._invalidated = True
+
+    def needs_refresh(self, quiz_id: Optional[int] = None) -> bool:
+        """Whether the snapshot is stale, or misses quiz_id and may be reloaded.
+
+        An unknown id may be a quiz created by another worker; that triggers a
+        reload, but not more often than miss_refresh_interval so bogus ids
+        stay cheap. After a failed load nothing is reloaded for
+        retry_interval.
+        """
+        if self._retry_in() > 0:
+            return False
+        if self.is_stale():
+            return True
+        if quiz_id is not None and quiz_id not in self._by_id:
+            return time.monotonic() - self._loaded_at >= self.miss_refresh_interval
+        return False
+
+    def _ensure_fresh(self, quiz_id: Optional[int] = None) -> None:
+        if self.needs_refresh(quiz_id):
+            self.refresh(quiz_id, force=False)
+        elif not self.loaded and self._retry_in() > 0:
+            # Backing off with nothing to serve: report the outage rather
+            # than an empty catalog
+            note_unavailable(self._retry_in())
+
+    def all(self, difficulty: Optional[str] = None) -> List[Dict]:
+        """All quizzes ordered by id, optionally filtered by difficulty"""
+        self._ensure_fresh()
+        if difficulty:
+            return list(self._by_difficulty.get(difficulty, []))
+        return list(self._quizzes)
+
+    def get(self, quiz_id: int) -> Optional[Dict]:
+        self._ensure_fresh(quiz_id)
+        return self._by_id.get(quiz_id)
+
+    def answer(self, quiz_id: int) -> Optional[Tuple[int, int]]:
+        """(correct_choice, xp_reward) for a quiz, or None if unknown"""
+        self._ensure_fresh(quiz_id)
+        return self._answer_key.get(quiz_id)
+
+    def stats(self) -> Dict:
+        return {
+            'size': len(self._by_id),
+            'version': self.version,
+            'loads': self.loads,
+            'load_errors': self.load_errors,
+            'ttl': self.ttl,
+            'age': (time.monotonic() - self._loaded_at) if self.loaded else None
+        }
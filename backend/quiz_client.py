@@ -1,34 +1,208 @@
-from supabase import create_client, Client
-from dotenv import load_dotenv
 import os
 import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Any, Tuple
 import uuid
+from quiz_catalog import QuizCatalog
+from leaderboard_index import CURSOR_FIELDS, LeaderboardIndex
+from pagination import decode_cursor, iter_keyset, keyset_query, split_page
+from config import LazyProxy, load_env
+from connection import connection_pool
 
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
+
+def grade_answers(catalog: QuizCatalog, answers: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Grade a batch of answers against the in-memory answer key.
+    
+    Returns the per-answer results and the submit_quiz_answers RPC payload
+    for the answers that were graded; the RPC decides which of them earn XP.
+    """
+    results = []
+    graded = []
+    
+    for answer in answers:
+        quiz_id = answer['quiz_id']
+        key = catalog.answer(quiz_id)
+        if not key:
+            results.append({"quiz_id": quiz_id, "success": False, "message": "Quiz not found"})
+            continue
+        
+        correct_choice, xp_reward = key
+        is_correct = answer['selected_choice'] == correct_choice
+        quiz = catalog.get(quiz_id)
+        results.append({
+            "quiz_id": quiz_id,
+            "success": True,
+            "correct": is_correct,
+            "correct_choice": correct_choice,
+            "xp_earned": 0,
+            "explanation": f"The correct answer is: {quiz['choices'][correct_choice]}"
+        })
+        graded.append({"quiz_id": quiz_id, "correct": is_correct, "xp_reward": xp_reward})
+    
+    return results, graded
+
+LEADERBOARD_FIELDS = ('username', 'level', 'total_xp', 'balance', 'created_at')
+# Ranking fields plus the sort key, as read from users_profile
+LEADERBOARD_COLUMNS = 'id, username, level, total_xp, balance, created_at'
+LEADERBOARD_ORDER = [('total_xp', True), ('created_at', False), ('id', False)]
+# Stable while XP changes, so a paged full load sees every profile once
+LEADERBOARD_ROWS_ORDER = [('id', False)]
+
+def new_leaderboard_index(loader=None) -> LeaderboardIndex:
+    """Ranked index over users_profile XP (seeded by `loader`, or through install())"""
+    return LeaderboardIndex(
+        loader,
+        id_field='id',
+        xp_field='total_xp',
+        fields=LEADERBOARD_FIELDS,
+        reseed_interval=float(os.getenv("LEADERBOARD_RESEED_SECONDS", "300"))
+    )
+
+# Query builders shared with async_client.py; callers run .execute() (sync or awaited)
+def leaderboard_rows_query(supabase):
+    """Every profile's ranking fields, to be read in LEADERBOARD_ROWS_ORDER"""
+    return supabase.table('users_profile').select(LEADERBOARD_COLUMNS)
+
+def leaderboard_page_query(supabase, after: Optional[Dict], limit: int):
+    """Keyset page of the leaderboard read straight from users_profile"""
+    return keyset_query(
+        supabase.table('users_profile').select(LEADERBOARD_COLUMNS),
+        LEADERBOARD_ORDER,
+        [after[field] for field in CURSOR_FIELDS] if after else None,
+        limit
+    )
+
+def catalog_query(supabase):
+    return supabase.table('quizzes').select('*').order('id')
+
+def profile_query(supabase, user_id: str):
+    return supabase.table('users_profile').select('*').eq('id', user_id).single()
+
+def quiz_progress_rows_query(supabase, user_id: str):
+    return supabase.table('user_quiz_progress').select(
+        '*, quizzes(question, difficulty, xp_reward)'
+    ).eq('user_id', user_id)
+
+def quiz_progress_query(supabase, user_id: str):
+    return quiz_progress_rows_query(supabase, user_id).order('last_attempted', desc=True)
+
+def single_quiz_progress_query(supabase, user_id: str, quiz_id: int):
+    return supabase.table('user_quiz_progress').select('*').eq('user_id', user_id).eq('quiz_id', quiz_id).single()
+
+def user_stats_query(supabase, user_id: str):
+    return supabase.table('user_progress_summary').select('*').eq('id', user_id).single()
+
+def quiz_statistics_query(supabase):
+    return supabase.table('quiz_statistics').select('*')
+
+def quiz_insert_query(supabase, question: str, choices: List[str], correct_choice: int,
+                      xp_reward: int, difficulty: str):
+    return supabase.table('quizzes').insert({
+        'question': question,
+        'choices': choices,
+        'correct_choice': correct_choice,
+        'xp_reward': xp_reward,
+        'difficulty': difficulty
+    })
+
+def profile_insert_query(supabase, user_id: str, username: str):
+    # Convert string user_id to UUID if needed
+    if isinstance(user_id, str) and len(user_id) != 36:
+        user_id = str(uuid.uuid4())
+    
+    return supabase.table('users_profile').insert({
+        'id': user_id,
+        'username': username,
+        'level': 1,
+        'total_xp': 0,
+        'balance': 0
+    })
+
+def add_user_xp_call(supabase, user_id: str, xp_to_add: int):
+    # Atomic server-side increment (level is updated by trigger)
+    return supabase.rpc('add_user_xp', {
+        'p_user_id': user_id,
+        'p_xp': xp_to_add
+    })
+
+def balance_update_query(supabase, profile: Dict, amount: int):
+    new_balance = max(0, profile['balance'] + amount)  # Prevent negative balance
+    return supabase.table('users_profile').update({
+        'balance': new_balance
+    }).eq('id', profile['id'])
+
+def submit_answers_call(supabase, user_id: str, graded: List[Dict]):
+    return supabase.rpc('submit_quiz_answers', {
+        'p_user_id': user_id,
+        'p_answers': graded
+    })
+
+def apply_submission(user_id: str, results: List[Dict], rows: List[Dict]) -> Optional[Dict]:
+    """Copy the XP the submit_quiz_answers RPC awarded into the graded results.
+    
+    Returns the profile fields to track in the leaderboard, or None if the
+    RPC did not grade every answer (the user does not exist).
+    """
+    graded_results = [r for r in results if r['success']]
+    if not rows or len(rows) != len(graded_results):
+        return None
+    for graded_result, row in zip(graded_results, sorted(rows, key=lambda r: r['answer_index'])):
+        graded_result['xp_earned'] = row['xp_earned']
+    return {'id': user_id, 'total_xp': rows[0]['total_xp'], 'level': rows[0]['level']}
+
+def batch_result(results: List[Dict]) -> Dict:
+    return {
+        "success": True,
+        "results": results,
+        "xp_earned": sum(r.get('xp_earned', 0) for r in results)
+    }
+
+def single_answer_result(batch: Dict) -> Dict:
+    """Shape a one-answer submit_quiz_answers result like submit_quiz_answer's"""
+    if not batch['success']:
+        return batch
+    result = batch['results'][0]
+    if not result['success']:
+        return {"success": False, "message": result['message']}
+    return {key: value for key, value in result.items() if key != 'quiz_id'}
 
 class QuizSupabaseClient:
     def __init__(self):
-        url: str = os.getenv("SUPABASE_URL")
-        key: str = os.getenv("SUPABASE_ANON_KEY")
+        load_env()
+        # Shared with the other backend client: one keep-alive pool per process
+        self.supabase: "Client" = connection_pool.get_client()
         
-        if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
+        # The quiz catalog is small and rarely changes, so it is served from memory
+        self.catalog = QuizCatalog(
+            self._load_quizzes,
+            ttl=float(os.getenv("QUIZ_CATALOG_TTL", "300")),
+            retry_interval=float(os.getenv("QUIZ_CATALOG_RETRY_SECONDS", "5"))
+        )
         
-        self.supabase: Client = create_client(url, key)
+        # Ranked in-memory leaderboard (same ordering as the leaderboard view)
+        self.leaderboard = new_leaderboard_index(self._load_leaderboard)
+    
+    def _load_leaderboard(self) -> List[Dict]:
+        """Fetch every profile's ranking fields, a page at a time (raises on failure)"""
+        return list(iter_keyset(lambda: leaderboard_rows_query(self.supabase), LEADERBOARD_ROWS_ORDER, page_size=1000))
+    
+    def _track_profile(self, profile: Optional[Dict]) -> Optional[Dict]:
+        """Move a freshly written profile row in the leaderboard index"""
+        if profile:
+            self.leaderboard.update(profile)
+        return profile
+    
+    def _load_quizzes(self) -> List[Dict]:
+        """Fetch the full quiz catalog (raises on failure)"""
+        result = catalog_query(self.supabase).execute()
+        return result.data or []
     
     # Quiz Methods
     def get_all_quizzes(self, difficulty: Optional[str] = None) -> List[Dict]:
         """Get all quizzes, optionally filtered by difficulty"""
         try:
-            query = self.supabase.table('quizzes').select('*')
-            
-            if difficulty:
-                query = query.eq('difficulty', difficulty)
-            
-            result = query.order('id').execute()
-            return result.data or []
+            return self.catalog.all(difficulty)
         except Exception as e:
             print(f"Error getting quizzes: {e}")
             return []
@@ -36,8 +210,7 @@ class QuizSupabaseClient:
     def get_quiz_by_id(self, quiz_id: int) -> Optional[Dict]:
         """Get a specific quiz by ID"""
         try:
-            result = self.supabase.table('quizzes').select('*').eq('id', quiz_id).single().execute()
-            return result.data
+            return self.catalog.get(quiz_id)
         except Exception as e:
             print(f"Error getting quiz {quiz_id}: {e}")
             return None
@@ -46,14 +219,9 @@ class QuizSupabaseClient:
                    xp_reward: int, difficulty: str) -> Optional[Dict]:
         """Create a new quiz"""
         try:
-            result = self.supabase.table('quizzes').insert({
-                'question': question,
-                'choices': choices,
-                'correct_choice': correct_choice,
-                'xp_reward': xp_reward,
-                'difficulty': difficulty
-            }).execute()
+            result = quiz_insert_query(self.supabase, question, choices, correct_choice, xp_reward, difficulty).execute()
             
+            self.catalog.invalidate()
             return result.data[0] if result.data else None
         except Exception as e:
             print(f"Error creating quiz: {e}")
@@ -63,19 +231,9 @@ class QuizSupabaseClient:
     def create_user_profile(self, user_id: str, username: str) -> Optional[Dict]:
         """Create a new user profile"""
         try:
-            # Convert string user_id to UUID if needed
-            if isinstance(user_id, str) and len(user_id) != 36:
-                user_id = str(uuid.uuid4())
+            result = profile_insert_query(self.supabase, user_id, username).execute()
             
-            result = self.supabase.table('users_profile').insert({
-                'id': user_id,
-                'username': username,
-                'level': 1,
-                'total_xp': 0,
-                'balance': 0
-            }).execute()
-            
-            return result.data[0] if result.data else None
+            return self._track_profile(result.data[0] if result.data else None)
         except Exception as e:
             print(f"Error creating user profile: {e}")
             return None
@@ -83,7 +241,7 @@ class QuizSupabaseClient:
     def get_user_profile(self, user_id: str) -> Optional[Dict]:
         """Get user profile by user_id"""
         try:
-            result = self.supabase.table('users_profile').select('*').eq('id', user_id).single().execute()
+            result = profile_query(self.supabase, user_id).execute()
             return result.data
         except Exception as e:
             print(f"Error getting user profile: {e}")
@@ -92,19 +250,9 @@ class QuizSupabaseClient:
     def update_user_xp(self, user_id: str, xp_to_add: int) -> Optional[Dict]:
         """Add XP to user and update level automatically"""
         try:
-            # Get current user data
-            user = self.get_user_profile(user_id)
-            if not user:
-                return None
-            
-            new_total_xp = user['total_xp'] + xp_to_add
+            result = add_user_xp_call(self.supabase, user_id, xp_to_add).execute()
             
-            # Update user profile (level will be updated automatically by trigger)
-            result = self.supabase.table('users_profile').update({
-                'total_xp': new_total_xp
-            }).eq('id', user_id).execute()
-            
-            return result.data[0] if result.data else None
+            return self._track_profile(result.data[0] if result.data else None)
         except Exception as e:
             print(f"Error updating user XP: {e}")
             return None
@@ -116,13 +264,9 @@ class QuizSupabaseClient:
             if not user:
                 return None
             
-            new_balance = max(0, user['balance'] + amount)  # Prevent negative balance
+            result = balance_update_query(self.supabase, user, amount).execute()
             
-            result = self.supabase.table('users_profile').update({
-                'balance': new_balance
-            }).eq('id', user_id).execute()
-            
-            return result.data[0] if result.data else None
+            return self._track_profile(result.data[0] if result.data else None)
         except Exception as e:
             print(f"Error updating user balance: {e}")
             return None
@@ -130,82 +274,50 @@ class QuizSupabaseClient:
     # Quiz Progress Methods
     def submit_quiz_answer(self, user_id: str, quiz_id: int, selected_choice: int) -> Dict:
         """Submit a quiz answer and update progress"""
+        return single_answer_result(
+            self.submit_quiz_answers(user_id, [{'quiz_id': quiz_id, 'selected_choice': selected_choice}])
+        )
+    
+    def submit_quiz_answers(self, user_id: str, answers: List[Dict]) -> Dict:
+        """Submit several quiz answers in one go.
+        
+        Answers are graded in memory, then the progress rows and the XP delta
+        are written by a single submit_quiz_answers RPC (migration 008).
+        """
         try:
-            # Get the quiz to check correct answer
-            quiz = self.get_quiz_by_id(quiz_id)
-            if not quiz:
-                return {"success": False, "message": "Quiz not found"}
-            
-            is_correct = selected_choice == quiz['correct_choice']
-            score = 1 if is_correct else 0
-            xp_earned = quiz['xp_reward'] if is_correct else 0
+            results, graded = grade_answers(self.catalog, answers)
+            if graded:
+                result = submit_answers_call(self.supabase, user_id, graded).execute()
+                profile = apply_submission(user_id, results, result.data or [])
+                if profile is None:
+                    return {"success": False, "message": "User profile not found"}
+                self._track_profile(profile)
             
-            # Get existing progress
-            existing_progress = self.supabase.table('user_quiz_progress').select('*').eq('user_id', user_id).eq('quiz_id', quiz_id).execute()
-            
-            if existing_progress.data:
-                # Update existing progress
-                progress = existing_progress.data[0]
-                new_attempts = progress['attempts'] + 1
-                new_best_score = max(progress['best_score'], score)
-                new_earned_xp = progress['earned_xp']
-                
-                # Only add XP if this is the first correct answer
-                if is_correct and progress['best_score'] == 0:
-                    new_earned_xp += xp_earned
-                    # Update user's total XP
-                    self.update_user_xp(user_id, xp_earned)
-                
-                result = self.supabase.table('user_quiz_progress').update({
-                    'attempts': new_attempts,
-                    'best_score': new_best_score,
-                    'earned_xp': new_earned_xp,
-                    'last_attempted': datetime.now().isoformat()
-                }).eq('id', progress['id']).execute()
-                
-            else:
-                # Create new progress record
-                if is_correct:
-                    # Update user's total XP
-                    self.update_user_xp(user_id, xp_earned)
-                
-                result = self.supabase.table('user_quiz_progress').insert({
-                    'user_id': user_id,
-                    'quiz_id': quiz_id,
-                    'attempts': 1,
-                    'best_score': score,
-                    'earned_xp': xp_earned,
-                    'last_attempted': datetime.now().isoformat()
-                }).execute()
-            
-            return {
-                "success": True,
-                "correct": is_correct,
-                "correct_choice": quiz['correct_choice'],
-                "xp_earned": xp_earned if (not existing_progress.data or existing_progress.data[0]['best_score'] == 0) else 0,
-                "explanation": f"The correct answer is: {quiz['choices'][quiz['correct_choice']]}"
-            }
+            return batch_result(results)
             
         except Exception as e:
-            print(f"Error submitting quiz answer: {e}")
+            print(f"Error submitting quiz answers: {e}")
             return {"success": False, "message": str(e)}
     
     def get_user_quiz_progress(self, user_id: str) -> List[Dict]:
         """Get all quiz progress for a user"""
         try:
-            result = self.supabase.table('user_quiz_progress').select(
-                '*, quizzes(question, difficulty, xp_reward)'
-            ).eq('user_id', user_id).order('last_attempted', desc=True).execute()
+            result = quiz_progress_query(self.supabase, user_id).execute()
             
             return result.data or []
         except Exception as e:
             print(f"Error getting user quiz progress: {e}")
             return []
     
+    def iter_user_quiz_progress(self, user_id: str) -> Iterator[Dict]:
+        """Stream all quiz progress for a user, newest first, fetching page by page"""
+        # Keyed on id rather than last_attempted, which moves as the user answers
+        return iter_keyset(lambda: quiz_progress_rows_query(self.supabase, user_id), [('id', True)])
+
     def get_quiz_progress(self, user_id: str, quiz_id: int) -> Optional[Dict]:
         """Get progress for a specific quiz"""
         try:
-            result = self.supabase.table('user_quiz_progress').select('*').eq('user_id', user_id).eq('quiz_id', quiz_id).single().execute()
+            result = single_quiz_progress_query(self.supabase, user_id, quiz_id).execute()
             return result.data
         except Exception as e:
             print(f"Error getting quiz progress: {e}")
@@ -215,29 +327,64 @@ class QuizSupabaseClient:
     def get_leaderboard(self, limit: int = 50) -> List[Dict]:
         """Get leaderboard data"""
         try:
+            if self.leaderboard.ensure_seeded():
+                return self.leaderboard.top(limit)
+            
             result = self.supabase.table('leaderboard').select('*').limit(limit).execute()
             return result.data or []
         except Exception as e:
             print(f"Error getting leaderboard: {e}")
             return []
     
+    def get_leaderboard_page(self, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Get one keyset page of the leaderboard and the cursor for the next page"""
+        # A malformed cursor is the caller's error, so let ValueError through
+        after = decode_cursor(cursor, CURSOR_FIELDS) if cursor else None
+        try:
+            if self.leaderboard.ensure_seeded():
+                return self.leaderboard.cursor_page(after, limit)
+            
+            result = leaderboard_page_query(self.supabase, after, limit).execute()
+            return self.leaderboard.rows_page(*split_page(result.data, limit))
+        except Exception as e:
+            print(f"Error getting leaderboard page: {e}")
+            return {'entries': [], 'next_cursor': None}
+    
+    def get_leaderboard_rank(self, user_id: str, radius: int = 0) -> Optional[Dict]:
+        """Get a user's leaderboard rank and the users ranked around them"""
+        try:
+            if not self.leaderboard.ensure_seeded():
+                return None
+            return self.leaderboard.ranking(user_id, radius)
+        except Exception as e:
+            print(f"Error getting leaderboard rank: {e}")
+            return None
+    
     def get_user_stats(self, user_id: str) -> Optional[Dict]:
         """Get comprehensive user statistics"""
         try:
-            result = self.supabase.table('user_progress_summary').select('*').eq('id', user_id).single().execute()
+            result = user_stats_query(self.supabase, user_id).execute()
             return result.data
         except Exception as e:
             print(f"Error getting user stats: {e}")
             return None
     
+    def get_cache_stats(self) -> Dict:
+        """Get quiz catalog cache counters"""
+        return {'quiz_catalog': self.catalog.stats()}
+    
     def get_quiz_statistics(self) -> List[Dict]:
         """Get statistics for all quizzes"""
         try:
-            result = self.supabase.table('quiz_statistics').select('*').execute()
+            result = quiz_statistics_query(self.supabase).execute()
             return result.data or []
         except Exception as e:
             print(f"Error getting quiz statistics: {e}")
             return []
+    
+    def iter_quiz_statistics(self) -> Iterator[Dict]:
+        """Stream statistics for all quizzes, fetching page by page"""
+        return iter_keyset(lambda: quiz_statistics_query(self.supabase), [('id', False)])
 
-# Global instance
-quiz_client = QuizSupabaseClient()
+# Global instance, built on first use so importing this module is cheap
+quiz_client = LazyProxy(QuizSupabaseClient)
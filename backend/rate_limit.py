@@ -0,0 +1,270 @@
+# rate_limit.py - Per-user token-bucket admission control for write endpoints
+#
+# Each (route class, user) pair gets a token bucket: `burst` tokens that refill
+# at `rate` tokens per second, one token per request (or per item of a batch
+# request). Requests that find the bucket empty are answered with 429 and a
+# Retry-After telling the client when the next token is due, before any
+# Supabase write is made.
+#
+# Buckets live in process memory by default. With RATE_LIMIT_SHM_PATH set
+# (e.g. /dev/shm/nku-rate-limit) they live in a memory-mapped file instead, so
+# every gunicorn worker on the host enforces one shared limit. The file is a
+# fixed-size open-addressing table guarded by fcntl locks; when it is full the
+# least recently touched bucket in the probe window is recycled, which at
+# worst hands that user a fresh burst.
+import functools
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import LazyProxy, load_env
+from metrics import registry
+
+# Route classes and their default (rate per second, burst); override with
+# RATE_LIMIT_<CLASS>_RATE / RATE_LIMIT_<CLASS>_BURST
+DEFAULT_LIMITS = {
+    'experience': (1.0, 10),
+    'balance': (1.0, 5),
+    'answer': (2.0, 20),
+}
+
+rate_limited_requests = registry.counter(
+    'rate_limited_requests_total', 'Requests rejected with 429 by the token-bucket limiter',
+    ('route_class',))
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(now - updated, 0.0) * rate)
+
+
+def _spend(tokens: float, rate: float, burst: float, cost: float) -> Tuple[float, float]:
+    """(tokens left, 0) if `cost` is admitted, else (tokens, seconds to wait).
+
+    A request costing more than the burst could never be admitted, so it is
+    let through from a full bucket and leaves the bucket in debt instead.
+    """
+    needed = min(cost, burst)
+    if tokens >= needed:
+        return tokens - cost, 0.0
+    return tokens, (needed - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Token buckets for this process only, in an LRU-bounded dict"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens; returns 0 if admitted, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            tokens, wait = _spend(tokens, rate, burst, cost)
+            self._buckets[key] = (tokens, now)
+            # A dropped bucket is equivalent to a full one, so evicting the
+            # least recently used key only ever errs on the generous side
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> Dict:
+        return {'mode': 'memory', 'keys': len(self._buckets), 'max_keys': self.max_keys}
+
+
+class SharedBucketStore:
+    """Token buckets in a memory-mapped file shared by all processes on the host.
+
+    Each slot holds (key hash, tokens, last update) where the time is
+    CLOCK_MONOTONIC, which all processes on a Linux host share.
+    """
+
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self) -> mmap.mmap:
+        # fcntl locks belong to the open file description, which a forked
+        # child shares with its parent, so every process opens its own
+        if self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = self.slots * self.SLOT.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd = fd
+            self._map = mmap.mmap(fd, size)
+            self._pid = os.getpid()
+        return self._map
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Stable across processes (unlike hash()); 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def _find(self, table: mmap.mmap, key_hash: int) -> Tuple[int, bool]:
+        """Slot offset for key_hash and whether it already holds that bucket"""
+        start = key_hash % self.slots
+        victim, victim_updated = None, math.inf
+        for probe in range(self.PROBES):
+            offset = ((start + probe) % self.slots) * self.SLOT.size
+            slot_hash, _, updated = self.SLOT.unpack_from(table, offset)
+            if slot_hash == key_hash:
+                return offset, True
+            if slot_hash == 0:
+                return offset, False
+            if updated < victim_updated:
+                victim, victim_updated = offset, updated
+        return victim, False
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens; returns 0 if admitted, else seconds until it would be"""
+        import fcntl
+
+        key_hash = self._hash(key)
+        with self._lock:
+            table = self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.monotonic()
+                offset, found = self._find(table, key_hash)
+                if found:
+                    _, tokens, updated = self.SLOT.unpack_from(table, offset)
+                    tokens = _refill(tokens, updated, now, rate, burst)
+                else:
+                    tokens = burst
+                tokens, wait = _spend(tokens, rate, burst, cost)
+                self.SLOT.pack_into(table, offset, key_hash, tokens, now)
+                return wait
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict:
+        return {'mode': 'shared', 'path': self.path, 'slots': self.slots}
+
+
+class RateLimiter:
+    """Token-bucket limits per route class, keyed by user"""
+
+    def __init__(self, store, limits: Dict[str, Tuple[float, float]], enabled: bool = True):
+        self.store = store
+        self.limits = limits
+        self.enabled = enabled
+
+    def check(self, route_class: str, key: str, cost: float = 1.0) -> float:
+        """0 if the request may proceed, else the seconds to wait before retrying"""
+        if not self.enabled or route_class not in self.limits:
+            return 0.0
+        rate, burst = self.limits[route_class]
+        return self.store.take(f"{route_class}:{key}", rate, burst, cost)
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'limits': {name: {'rate': rate, 'burst': burst} for name, (rate, burst) in self.limits.items()},
+            'store': self.store.stats()
+        }
+
+
+def _create_limiter() -> RateLimiter:
+    load_env()
+    limits = {}
+    for name, (rate, burst) in DEFAULT_LIMITS.items():
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        limits[name] = (float(os.getenv(f"{prefix}_RATE", str(rate))),
+                        float(os.getenv(f"{prefix}_BURST", str(burst))))
+
+    shm_path = os.getenv("RATE_LIMIT_SHM_PATH")
+    if shm_path:
+        store = SharedBucketStore(shm_path, int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536")))
+    else:
+        store = MemoryBucketStore(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    return RateLimiter(store, limits, enabled)
+
+
+# Global instance, configured from the environment on first use
+rate_limiter = LazyProxy(_create_limiter)
+
+
+def _admit(route_class: str, key, remote_addr: Optional[str], body: Any,
+           cost: Optional[Callable[[Any], float]]) -> float:
+    """Shared check of the view decorators; returns the seconds to wait, or 0"""
+    retry_after = rate_limiter.check(route_class, str(key or remote_addr), cost(body) if cost else 1.0)
+    if retry_after > 0:
+        rate_limited_requests.inc(route_class)
+    return retry_after
+
+
+def _too_many_requests(jsonify, retry_after: float):
+    response = jsonify({
+        "success": False,
+        "message": "Too many requests, please retry later"
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+def rate_limited(route_class: str, user_arg: str = 'user_id',
+                 cost: Optional[Callable[[Any], float]] = None) -> Callable:
+    """Flask view decorator admitting at most the configured rate per user.
+
+    The user comes from the `user_arg` URL parameter, else the same field of
+    the JSON body, else the client address. Each request spends one token,
+    or `cost(body)` tokens when given (e.g. one per item of a batch).
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify, request
+
+            body = request.get_json(silent=True)
+            key = kwargs.get(user_arg)
+            if key is None and isinstance(body, dict):
+                key = body.get(user_arg)
+            retry_after = _admit(route_class, key, request.remote_addr, body, cost)
+            if retry_after > 0:
+                return _too_many_requests(jsonify, retry_after)
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def rate_limited_quart(route_class: str, user_arg: str = 'user_id',
+                       cost: Optional[Callable[[Any], float]] = None) -> Callable:
+    """rate_limited for the Quart views in asgi.py"""
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            from quart import jsonify, request
+
+            body = await request.get_json(silent=True)
+            key = kwargs.get(user_arg)
+            if key is None and isinstance(body, dict):
+                key = body.get(user_arg)
+            retry_after = _admit(route_class, key, request.remote_addr, body, cost)
+            if retry_after > 0:
+                return _too_many_requests(jsonify, retry_after)
+            return await view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
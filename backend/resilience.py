@@ -0,0 +1,372 @@
+# resilience.py - Deadlines, retries and a circuit breaker for upstream calls
+#
+# Every storage round trip goes through UpstreamGuard (wired in by
+# upstream.InstrumentedQuery), so both backend clients get the same policy:
+#
+#   * each call has a deadline (reads and writes configured separately),
+#     enforced per attempt through connection.call_timeout;
+#   * idempotent reads are retried on transient errors with full-jitter
+#     exponential backoff, never past the deadline; writes are not retried;
+#   * a circuit breaker opens after consecutive transient failures and fails
+#     calls fast with UpstreamUnavailable until a probe call succeeds.
+#
+# Client methods still catch exceptions and return None or empty lists, so
+# the guard also marks the current request as having hit an unavailable
+# upstream; the hook from protect_flask (protect_quart for asgi.py) turns
+# that request's response into a 503 with Retry-After instead of a
+# misleading 400/404 or an empty 200, unless it was answered from stale
+# data (note_served_stale) or a write had already been committed.
+import contextvars
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import load_env
+from metrics import registry
+
+# RPCs that only read and are therefore safe to retry
+READ_ONLY_RPCS = frozenset({'user_activity_counts'})
+
+# Postgres/PostgREST error codes worth retrying: connection failures,
+# resource exhaustion, server shutdown, statement timeout, serialization
+# failures, PostgREST unable to reach the database, and gateway errors
+_TRANSIENT_CODE_PREFIXES = ('08', '53', '57P')
+_TRANSIENT_CODES = frozenset({'57014', '40001', '40P01', 'PGRST000', 'PGRST001', 'PGRST002',
+                              'PGRST003', '502', '503', '504'})
+
+upstream_retries = registry.counter(
+    'upstream_retries_total', 'Supabase calls retried after a transient error',
+    ('table', 'operation'))
+upstream_rejected = registry.counter(
+    'upstream_rejected_total', 'Supabase calls failed fast by the open circuit breaker',
+    ('table', 'operation'))
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream storage is down, timing out or shed by the circuit breaker"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an upstream error is likely to go away if the call is repeated"""
+    if isinstance(error, UpstreamUnavailable):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # httpx/httpcore transport errors (timeouts, resets, refused connections),
+    # checked by module so httpx is not imported for the SQLite backend
+    if type(error).__module__.split('.')[0] in ('httpx', 'httpcore', 'h2'):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, str) and (code in _TRANSIENT_CODES or code.startswith(_TRANSIENT_CODE_PREFIXES)):
+        return True
+    # SQLite writers contending for the database lock
+    return type(error).__name__ == 'OperationalError' and 'locked' in str(error)
+
+
+class ResilienceConfig:
+    """Deadline, retry and breaker settings, read from the environment"""
+
+    def __init__(self):
+        load_env()
+        self.read_deadline = float(os.getenv("UPSTREAM_READ_DEADLINE", "3"))
+        self.write_deadline = float(os.getenv("UPSTREAM_WRITE_DEADLINE", "5"))
+        self.max_retries = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+        self.backoff_base = float(os.getenv("UPSTREAM_BACKOFF_BASE_MS", "50")) / 1000
+        self.backoff_max = float(os.getenv("UPSTREAM_BACKOFF_MAX_MS", "1000")) / 1000
+        self.breaker_threshold = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+        self.breaker_reset = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "15"))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+
+    closed: calls pass; `threshold` transient failures in a row open it.
+    open: calls are rejected until `reset_timeout` has passed.
+    half_open: one probe call is let through; success closes the breaker,
+    failure opens it again for another `reset_timeout`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 15.0):
+        self.threshold = max(threshold, 1)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a probe through (0 when closed)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; claims the probe slot when half-open"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'threshold': self.threshold,
+                'reset_timeout': self.reset_timeout
+            }
+
+
+class RequestUpstreamHealth:
+    """Whether the current HTTP request ran into an unavailable upstream,
+    whether it was answered from stale data instead, and whether a write
+    had already been committed"""
+
+    __slots__ = ('retry_after', 'served_stale', 'committed_write')
+
+    def __init__(self):
+        self.retry_after: Optional[float] = None
+        self.served_stale = False
+        self.committed_write = False
+
+
+current_health: contextvars.ContextVar[Optional[RequestUpstreamHealth]] = contextvars.ContextVar(
+    'current_upstream_health', default=None
+)
+
+
+def note_unavailable(retry_after: float) -> None:
+    """Mark the current request as having hit an unavailable upstream"""
+    health = current_health.get()
+    if health is not None:
+        health.retry_after = max(health.retry_after or 0.0, retry_after)
+
+
+def note_served_stale() -> None:
+    """Mark the current request as answered from stale data despite the outage"""
+    health = current_health.get()
+    if health is not None:
+        health.served_stale = True
+
+
+def note_committed_write() -> None:
+    """Mark the current request as having changed upstream state"""
+    health = current_health.get()
+    if health is not None:
+        health.committed_write = True
+
+
+class UpstreamGuard:
+    """Runs single upstream attempts under the deadline/retry/breaker policy"""
+
+    def __init__(self, config: Optional[ResilienceConfig] = None, enforce_timeouts: bool = True):
+        self.config = config or ResilienceConfig()
+        self.breaker = CircuitBreaker(self.config.breaker_threshold, self.config.breaker_reset)
+        # HTTP deadlines only apply to Supabase; the SQLite backend is local
+        self.enforce_timeouts = enforce_timeouts
+
+    @staticmethod
+    def is_idempotent(table: str, operation: str) -> bool:
+        return operation == 'select' or (operation == 'rpc' and table in READ_ONLY_RPCS)
+
+    def _plan(self, table: str, operation: str):
+        idempotent = self.is_idempotent(table, operation)
+        budget = self.config.read_deadline if idempotent else self.config.write_deadline
+        attempts = self.config.max_retries + 1 if idempotent else 1
+        return time.monotonic() + budget, attempts
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many workers over the whole window
+        return random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt)))
+
+    def _admit(self, table: str, operation: str, deadline: float) -> float:
+        """Check the breaker and deadline before an attempt; returns the time left"""
+        if not self.breaker.allow():
+            upstream_rejected.inc(table, operation)
+            raise self._unavailable(f"Circuit open, not calling {table} {operation}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.breaker.record_failure()
+            raise self._unavailable(f"Deadline exceeded for {table} {operation}")
+        return remaining
+
+    def _failed(self, error: Exception, table: str, operation: str, attempt: int,
+                attempts: int, deadline: float) -> float:
+        """Account for a failed attempt; returns the backoff delay or raises"""
+        if not is_transient(error):
+            # Upstream answered (e.g. a constraint violation), so it is healthy
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        delay = self._backoff(attempt)
+        if attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+            raise self._unavailable(f"{table} {operation} failed: {error}") from error
+        upstream_retries.inc(table, operation)
+        return delay
+
+    def _unavailable(self, message: str) -> UpstreamUnavailable:
+        retry_after = self.breaker.retry_after() or 1.0
+        note_unavailable(retry_after)
+        return UpstreamUnavailable(message, retry_after)
+
+    @contextmanager
+    def _timeout(self, remaining: float):
+        if not self.enforce_timeouts:
+            yield
+            return
+        from connection import call_timeout
+        with call_timeout(remaining):
+            yield
+
+    def call(self, attempt: Callable[[], Any], table: str, operation: str) -> Any:
+        """Run `attempt` (one upstream round trip) under the policy"""
+        deadline, attempts = self._plan(table, operation)
+        for n in range(attempts):
+            remaining = self._admit(table, operation, deadline)
+            try:
+                with self._timeout(remaining):
+                    result = attempt()
+            except Exception as e:
+                time.sleep(self._failed(e, table, operation, n, attempts, deadline))
+                continue
+            self.breaker.record_success()
+            if not self.is_idempotent(table, operation):
+                note_committed_write()
+            return result
+
+    async def call_async(self, attempt: Callable[[], Awaitable[Any]], table: str, operation: str) -> Any:
+        """Async counterpart of call()"""
+        # Imported here: asyncio costs ~45 ms and only the ASGI clients need it
+        import asyncio
+
+        deadline, attempts = self._plan(table, operation)
+        for n in range(attempts):
+            remaining = self._admit(table, operation, deadline)
+            try:
+                with self._timeout(remaining):
+                    result = await attempt()
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, table, operation, n, attempts, deadline))
+                continue
+            self.breaker.record_success()
+            if not self.is_idempotent(table, operation):
+                note_committed_write()
+            return result
+
+    def collect(self) -> List[str]:
+        """Breaker state as exposition lines for the metrics registry"""
+        stats = self.breaker.stats()
+        lines = ['# TYPE upstream_circuit_state gauge']
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+            lines.append(f'upstream_circuit_state{{state="{state}"}} {int(stats["state"] == state)}')
+        lines += ['# TYPE upstream_circuit_opened_total counter',
+                  f"upstream_circuit_opened_total {stats['opened']}"]
+        return lines
+
+
+def _unavailable_response(jsonify, response, health: Optional[RequestUpstreamHealth]):
+    """`response`, or a 503 + Retry-After built with `jsonify` if the request
+    hit an unavailable upstream and was not answered from stale data"""
+    # Client methods swallow upstream errors and return empty results, so
+    # a 200 here may be a placeholder; only stale-served data is kept
+    if health is None or health.retry_after is None or health.served_stale:
+        return response
+    # Once a write went through, a 503 would invite a retry that repeats it;
+    # the endpoint reports the partial outcome itself
+    if health.committed_write:
+        return response
+
+    unavailable = jsonify({
+        "success": False,
+        "message": "Storage is temporarily unavailable, please retry later"
+    })
+    unavailable.status_code = 503
+    unavailable.headers['Retry-After'] = str(max(math.ceil(health.retry_after), 1))
+    return unavailable
+
+
+def protect_flask(app) -> None:
+    """Answer 503 + Retry-After when a request failed because upstream was unavailable.
+
+    Register after metrics.instrument_flask so the metrics hook (which runs
+    later, after_request hooks run in reverse) records the final status.
+    """
+    from flask import g, jsonify
+
+    @app.before_request
+    def _track_upstream_health():
+        g._upstream_health = RequestUpstreamHealth()
+        g._upstream_health_token = current_health.set(g._upstream_health)
+
+    @app.after_request
+    def _replace_upstream_errors(response):
+        health = g.pop('_upstream_health', None)
+        if health is not None:
+            current_health.reset(g.pop('_upstream_health_token'))
+        return _unavailable_response(jsonify, response, health)
+
+
+def protect_quart(app) -> None:
+    """protect_flask for the Quart apps in asgi.py (register after metrics.instrument_quart)"""
+    from quart import g, jsonify
+
+    # Coroutines, so the context variable is set in the request's own task
+    @app.before_request
+    async def _track_upstream_health():
+        g._upstream_health = RequestUpstreamHealth()
+        g._upstream_health_token = current_health.set(g._upstream_health)
+
+    @app.after_request
+    async def _replace_upstream_errors(response):
+        health = g.pop('_upstream_health', None)
+        if health is not None:
+            current_health.reset(g.pop('_upstream_health_token'))
+        return _unavailable_response(jsonify, response, health)
@@ -0,0 +1,169 @@
+# risk.py - Vectorized position sizing and portfolio risk
+#
+# NumPy versions of the RiskCalculator in frontend/services/riskCalculator.ts.
+# Every input may be a scalar or an array and they broadcast against each
+# other, so one call evaluates a whole sensitivity table (e.g. risk per trade
+# x stop distance for every symbol on a watchlist). Results are dicts of
+# equally shaped arrays; the frontend's warning strings become boolean flag
+# columns. risk_per_trade and stop_loss_pct are percentages, as in the UI.
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+CONTRACT_MULTIPLIER = 100
+MAX_POSITION_SHARE = 0.30
+RECOMMENDED_RISK_PER_TRADE = 2.0
+MAX_RISK_PER_TRADE = 10.0
+PROFIT_TARGET = 0.10
+DEFAULT_STOP = 0.05
+KELLY_CAP = 0.25
+RISK_LEVELS = ('low', 'medium', 'high', 'extreme')
+RISK_LEVEL_BOUNDS = (5.0, 15.0, 25.0)
+
+Axis = Union[str, Sequence[str]]
+
+
+def grid_columns(columns: Dict, axes: Sequence[Axis]) -> Dict[str, np.ndarray]:
+    """Outer product of the listed fields, for sweeps.
+
+    Each entry of `axes` is a field name, or several names that share one
+    axis (e.g. ['entry_price', 'stop_loss_price'] for a watchlist); axis i of
+    the result runs over those fields' values. Fields not on an axis are
+    broadcast as usual.
+    """
+    ndim = len(axes)
+    result = {name: np.asarray(value) for name, value in columns.items()}
+    for axis, names in enumerate(axes):
+        for name in ([names] if isinstance(names, str) else names):
+            if name not in result:
+                raise ValueError(f"Unknown grid field: {name}")
+            values = np.ravel(result[name])
+            shape = [1] * ndim
+            shape[axis] = values.size
+            result[name] = values.reshape(shape)
+    return result
+
+
+def _is_short(position_type) -> np.ndarray:
+    types = np.char.lower(np.asarray(position_type, dtype=str))
+    invalid = ~np.isin(types, ('long', 'short'))
+    if invalid.any():
+        raise ValueError(f"Position type must be 'long' or 'short', got '{types[invalid].flat[0]}'")
+    return types == 'short'
+
+
+def position_size(account_value, risk_per_trade, entry_price, stop_loss_price=None, stop_loss_pct=None,
+                  position_type='long', option_premium=None) -> Dict[str, np.ndarray]:
+    """calculatePositionSize over broadcast inputs.
+
+    Stops are given as prices or as a percentage away from entry. Lanes with
+    an option premium (NaN for none) are sized in contracts whose premium is
+    the whole risk; the others in shares (calculatePositionSizing).
+    """
+    is_short = _is_short(position_type)
+    account_value = np.asarray(account_value, dtype=float)
+    risk_per_trade = np.asarray(risk_per_trade, dtype=float)
+    entry_price = np.asarray(entry_price, dtype=float)
+    if stop_loss_price is None:
+        if stop_loss_pct is None:
+            raise ValueError("Provide stop_loss_price or stop_loss_pct")
+        stop_loss_price = entry_price * (1.0 + np.where(is_short, 1.0, -1.0) * np.asarray(stop_loss_pct, dtype=float) / 100.0)
+    stop_loss_price = np.asarray(stop_loss_price, dtype=float)
+    premium = np.asarray(np.nan if option_premium is None else option_premium, dtype=float)
+
+    risk_amount = account_value * risk_per_trade / 100.0
+    distance = np.abs(entry_price - stop_loss_price)
+    is_option = np.isfinite(premium) & (premium > 0)
+    zero_stop = distance == 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contracts = np.floor(risk_amount / (premium * CONTRACT_MULTIPLIER))
+        shares = np.floor(risk_amount / distance)
+    units = np.where(zero_stop, 0.0, np.where(is_option, contracts, shares))
+    position_value = np.where(is_option, units * premium * CONTRACT_MULTIPLIER, units * entry_price)
+    # A long option can lose at most its premium
+    max_loss = np.where(is_option, position_value, units * distance)
+
+    # Reward side of the frontend's simplified ratio: a 10% move on the units
+    potential_profit = entry_price * PROFIT_TARGET * units
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_reward = np.where(max_loss > 0, potential_profit / max_loss, 0.0)
+
+    valid = ((account_value > 0) & (risk_per_trade > 0) & (risk_per_trade <= MAX_RISK_PER_TRADE)
+             & (entry_price > 0) & (stop_loss_price > 0)
+             & np.where(is_short, stop_loss_price > entry_price, stop_loss_price < entry_price))
+
+    columns = {
+        'risk_amount': risk_amount,
+        'shares_or_contracts': units,
+        'position_value': position_value,
+        'max_loss': max_loss,
+        'risk_reward_ratio': np.round(risk_reward, 2),
+        'stop_loss_price': stop_loss_price,
+        'recommended_stop_loss': entry_price * np.where(is_short, 1.0 + DEFAULT_STOP, 1.0 - DEFAULT_STOP),
+        'is_option': is_option,
+        'valid': valid,
+        'zero_stop': zero_stop,
+        'exceeds_target_risk': max_loss > risk_amount * 1.1,
+        'exceeds_account_share': position_value > account_value * MAX_POSITION_SHARE,
+        'risk_above_recommended': risk_per_trade > RECOMMENDED_RISK_PER_TRADE,
+        'poor_risk_reward': risk_reward < 1
+    }
+    shape = np.broadcast_shapes(*(np.shape(value) for value in columns.values()))
+    return {name: np.broadcast_to(value, shape) for name, value in columns.items()}
+
+
+def kelly_criterion(win_rate, avg_win, avg_loss, cap: float = KELLY_CAP) -> Dict[str, np.ndarray]:
+    """calculateKellyCriterion over broadcast inputs; win_rate is a fraction"""
+    win_rate = np.asarray(win_rate, dtype=float)
+    avg_win = np.asarray(avg_win, dtype=float)
+    avg_loss = np.asarray(avg_loss, dtype=float)
+    if ((win_rate < 0) | (win_rate > 1)).any():
+        raise ValueError("win_rate must be between 0 and 1")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payoff = avg_win / avg_loss
+        kelly = (payoff * win_rate - (1.0 - win_rate)) / payoff
+    kelly = np.where((avg_loss == 0) | ~np.isfinite(kelly), 0.0, kelly)
+    return {
+        'full_kelly': kelly,
+        'kelly_fraction': np.clip(kelly, 0.0, cap)
+    }
+
+
+def portfolio_risk(values: Sequence[float], risks: Sequence[float], account_value,
+                   symbols: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    """calculatePortfolioRisk of one position list, for one or many account values"""
+    values = np.asarray(values, dtype=float)
+    risks = np.asarray(risks, dtype=float)
+    account_value = np.asarray(account_value, dtype=float)
+    if values.shape != risks.shape or values.ndim != 1:
+        raise ValueError("value and risk must be lists of the same length")
+    if (account_value <= 0).any():
+        raise ValueError("account_value must be positive")
+
+    total_value = values.sum()
+    total_risk = risks.sum()
+    risk_percentage = total_risk / account_value * 100.0
+    unique_symbols = len(set(symbols)) if symbols is not None else values.size
+    diversification = min(100.0, unique_symbols / 10 * 100.0)
+    level = np.searchsorted(RISK_LEVEL_BOUNDS, risk_percentage, side='right')
+
+    columns = {
+        'account_value': account_value,
+        'total_portfolio_value': total_value,
+        'total_risk': total_risk,
+        'risk_percentage': np.round(risk_percentage, 2),
+        'max_drawdown': np.round(np.minimum(100.0, risk_percentage), 2),
+        'risk_level': np.asarray(RISK_LEVELS)[level],
+        'diversification_score': round(diversification),
+        'too_much_risk': risk_percentage > 20,
+        'under_diversified': diversification < 50,
+        'too_many_positions': values.size > 20
+    }
+    shape = np.shape(account_value)
+    result = {name: np.broadcast_to(value, shape) for name, value in columns.items()}
+    # Per position rather than per account value
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['risk_share'] = np.where(total_risk > 0, risks / total_risk, 0.0)
+    return result
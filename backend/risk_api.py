@@ -0,0 +1,174 @@
+# risk_api.py - Batch position sizing and portfolio risk endpoints
+#
+# Request fields are scalars or lists that broadcast against each other, and
+# an optional "grid" turns listed fields into the axes of a sweep, e.g.
+#   {"account_value": 25000, "entry_price": [50, 120, 310],
+#    "risk_per_trade": [0.5, 1, 2], "stop_loss_pct": [2, 5, 8],
+#    "grid": ["entry_price", "risk_per_trade", "stop_loss_pct"]}
+# gives a 3 x 3 x 3 table. Responses are columnar: one flat list per output
+# plus the table's shape.
+from typing import Dict, Sequence
+
+import numpy as np
+from flask import Blueprint, Flask, jsonify, request
+from flask_cors import CORS
+
+from config import load_env
+from json_provider import install_json_provider
+from metrics import instrument_flask
+from risk import KELLY_CAP, grid_columns, kelly_criterion, portfolio_risk, position_size
+
+risk_api = Blueprint('risk', __name__)
+
+MAX_RISK_CELLS = 100000
+MAX_PORTFOLIO_POSITIONS = 10000
+POSITION_SIZE_FIELDS = ('account_value', 'risk_per_trade', 'entry_price', 'stop_loss_price',
+                        'stop_loss_pct', 'position_type', 'option_premium')
+KELLY_FIELDS = ('win_rate', 'avg_win', 'avg_loss')
+
+
+def request_columns(data: Dict, fields: Sequence[str], required: Sequence[str]) -> Dict:
+    """The given fields of a JSON body, expanded by its optional "grid"; checks the table size"""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    missing = [field for field in required if data.get(field) is None]
+    if missing:
+        raise ValueError(f"Missing required field: {', '.join(missing)}")
+    columns = {field: data[field] for field in fields if data.get(field) is not None}
+
+    grid = data.get('grid')
+    if grid is not None:
+        if not isinstance(grid, list) or not grid:
+            raise ValueError("grid must be a non-empty list of field names")
+        columns = grid_columns(columns, grid)
+    size = int(np.prod(np.broadcast_shapes(*(np.shape(value) for value in columns.values()))))
+    if size > MAX_RISK_CELLS:
+        raise ValueError(f"Table too large: at most {MAX_RISK_CELLS} cells per request")
+    return columns
+
+
+def is_number(value) -> bool:
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def columnar(result: Dict[str, np.ndarray]) -> Dict:
+    """Flat lists per column (label columns as plain lists of strings)"""
+    return {name: values.ravel() if values.dtype.kind in 'biuf' else values.ravel().tolist()
+            for name, values in result.items()}
+
+
+@risk_api.route('/api/risk/position-size', methods=['POST'])
+def batch_position_size():
+    """Position size, max loss and risk flags for every combination of inputs"""
+    try:
+        data = request.get_json(silent=True)
+        columns = request_columns(data, POSITION_SIZE_FIELDS, ('account_value', 'risk_per_trade', 'entry_price'))
+        result = position_size(**columns)
+        shape = result['risk_amount'].shape
+
+        return jsonify({
+            "success": True,
+            "data": columnar(result),
+            "shape": list(shape),
+            "count": int(np.prod(shape))
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error calculating position sizes: {str(e)}"
+        }), 500
+
+
+@risk_api.route('/api/risk/kelly', methods=['POST'])
+def batch_kelly():
+    """Kelly fraction (capped at 25% unless "cap" is given) over win rate / payoff inputs"""
+    try:
+        data = request.get_json(silent=True)
+        columns = request_columns(data, KELLY_FIELDS, KELLY_FIELDS)
+        result = kelly_criterion(**columns, cap=float(data.get('cap', KELLY_CAP)))
+        shape = result['kelly_fraction'].shape
+
+        return jsonify({
+            "success": True,
+            "data": columnar(result),
+            "shape": list(shape),
+            "count": int(np.prod(shape))
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error calculating Kelly fractions: {str(e)}"
+        }), 500
+
+
+@risk_api.route('/api/risk/portfolio', methods=['POST'])
+def batch_portfolio_risk():
+    """Portfolio risk of one position list, for one or a list of account values"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        positions = data.get('positions')
+        if not isinstance(positions, dict):
+            raise ValueError("positions must be an object with value and risk lists")
+        for field in ('value', 'risk'):
+            column = positions.get(field)
+            if not isinstance(column, list) or not all(is_number(item) for item in column):
+                raise ValueError(f"positions.{field} must be a list of numbers")
+        if positions.get('symbol') is not None and not isinstance(positions['symbol'], list):
+            raise ValueError("positions.symbol must be a list")
+        if len(positions['value']) > MAX_PORTFOLIO_POSITIONS:
+            raise ValueError(f"At most {MAX_PORTFOLIO_POSITIONS} positions per request")
+        if data.get('account_value') is None:
+            raise ValueError("Missing required field: account_value")
+
+        result = portfolio_risk(positions['value'], positions['risk'], data['account_value'],
+                                positions.get('symbol'))
+        risk_share = result.pop('risk_share')
+
+        return jsonify({
+            "success": True,
+            "data": columnar(result),
+            "positions": {"risk_share": risk_share},
+            "count": int(result['total_risk'].size)
+        }), 200
+
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error calculating portfolio risk: {str(e)}"
+        }), 500
+
+
+def create_app() -> Flask:
+    """Build the Flask app serving only the risk endpoints"""
+    load_env()
+    app = Flask(__name__)
+    CORS(app)
+    install_json_provider(app)
+    app.register_blueprint(risk_api)
+    instrument_flask(app, 'risk')
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5004, debug=True)
@@ -0,0 +1,129 @@
+# server.py - Single-process backend serving the education and quiz APIs
+#
+# Run with:
+#   python server.py                     (development server on port 5000)
+#
+# The education API (app.py) is mounted under /edu and the quiz API
+# (quiz_app.py) under /quiz, e.g. /edu/api/leaderboard and
+# /quiz/api/leaderboard; the stateless pricing (pricing_api.py) and risk
+# (risk_api.py) APIs are at /api/pricing and /api/risk. All blueprints run in
+# one process, so they share the connection pool, the in-process caches, the
+# circuit breaker and the metrics registry (one /metrics for all). Each API
+# module can still be run on its own.
+#
+# In production run it under gunicorn (see gunicorn.conf.py), which preloads
+# this module and calls warm_caches() before forking the workers:
+#   gunicorn -c gunicorn.conf.py server:app
+import os
+import threading
+from typing import Dict
+
+from flask import Flask, jsonify
+from flask_cors import CORS
+
+from app import education_api
+from config import load_env
+from json_provider import install_json_provider
+from metrics import instrument_flask
+from pricing_api import pricing_api
+from quiz_app import quiz_api
+from quiz_client import quiz_client
+from resilience import protect_flask
+from risk_api import risk_api
+from supabase_client import supabase_client
+
+EDUCATION_PREFIX = '/edu'
+QUIZ_PREFIX = '/quiz'
+
+
+def warm_caches(force: bool = False) -> Dict[str, bool]:
+    """Load the quiz catalog and both leaderboard indexes; returns which are warm.
+
+    Run in the gunicorn master before forking, so every worker starts with
+    the same copy-on-write snapshot instead of loading its own.
+    """
+    catalog = quiz_client.catalog
+    return {
+        'quiz_catalog': catalog.refresh() if force or not catalog.loaded else True,
+        'quiz_leaderboard': quiz_client.leaderboard.seed() if force else quiz_client.leaderboard.ensure_seeded(),
+        'education_leaderboard': supabase_client.leaderboard.seed() if force else supabase_client.leaderboard.ensure_seeded()
+    }
+
+
+_warming = threading.Lock()
+
+
+def warm_in_background() -> bool:
+    """Run warm_caches() on a daemon thread unless one is already running"""
+    if not _warming.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            warm_caches()
+        except Exception as e:
+            print(f"Error warming caches: {e}")
+        finally:
+            _warming.release()
+
+    threading.Thread(target=run, name='cache-warmer', daemon=True).start()
+    return True
+
+
+def cache_status() -> Dict[str, bool]:
+    """Which caches are warm, without loading anything"""
+    return {
+        'quiz_catalog': quiz_client.initialized and quiz_client.catalog.loaded,
+        'quiz_leaderboard': quiz_client.initialized and quiz_client.leaderboard.seeded,
+        'education_leaderboard': supabase_client.initialized and supabase_client.leaderboard.seeded
+    }
+
+
+def create_app() -> Flask:
+    """Build the combined Flask app; Supabase clients are created lazily on first use"""
+    load_env()
+    app = Flask(__name__)
+    CORS(app)
+    install_json_provider(app)
+    app.register_blueprint(education_api, url_prefix=EDUCATION_PREFIX)
+    app.register_blueprint(quiz_api, url_prefix=QUIZ_PREFIX)
+    # Stateless, so mounted as-is at /api/pricing/... and /api/risk/...
+    app.register_blueprint(pricing_api)
+    app.register_blueprint(risk_api)
+    instrument_flask(app, 'backend')
+    protect_flask(app)
+
+    @app.route('/healthz')
+    def healthz():
+        """Liveness: the worker is serving requests"""
+        return jsonify({"success": True}), 200
+
+    @app.route('/readyz')
+    def readyz():
+        """Readiness: passes only once the shared caches are warm"""
+        status = cache_status()
+        ready = all(status.values())
+        if not ready:
+            # Not preloaded (e.g. a single dev process): warm up off the probe,
+            # which keeps answering 503 until the loads finish
+            warm_in_background()
+        return jsonify({"success": ready, "data": status}), 200 if ready else 503
+
+    @app.route('/')
+    def home():
+        return jsonify({
+            "success": True,
+            "data": {
+                "education": EDUCATION_PREFIX,
+                "quiz": QUIZ_PREFIX,
+                "pricing": "/api/pricing",
+                "risk": "/api/risk"
+            }
+        }), 200
+
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=True)
@@ -0,0 +1,896 @@
+# sqlite_backend.py - Embedded SQLite storage behind the supabase client API
+#
+# SqliteBackend implements the slice of the supabase-py interface the backend
+# clients use (table(...) query builders with filters, ordering, ranges,
+# insert/update/upsert, single(), and rpc(...) for our database functions), on
+# top of one SQLite database that mirrors supabase_schema.sql and
+# trading_quiz_schema.sql, views and level triggers included.
+#
+# Select it with STORAGE_BACKEND=sqlite (SQLITE_PATH defaults to an in-memory
+# database). Everything above the storage calls -- caches, the leaderboard
+# index, write-behind buffers -- is shared with the Supabase backend, so the
+# API can be run, benchmarked and load-tested offline and deterministically.
+#
+# Both schemas define a `leaderboard` view; here the quiz app's keeps that
+# name and the education one is `education_leaderboard`. Row level security,
+# grants and extensions have no SQLite equivalent and are left out.
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Columns stored as JSON text (jsonb / text[] in Postgres) and booleans
+JSON_COLUMNS = {'badges', 'completed_quizzes', 'answers', 'metadata', 'choices'}
+BOOL_COLUMNS = {'passed'}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+EDUCATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_profiles (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT UNIQUE NOT NULL,
+    username TEXT NOT NULL,
+    email TEXT,
+    total_exp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    badges TEXT DEFAULT '[]',
+    completed_quizzes TEXT DEFAULT '[]',
+    learning_streak INTEGER DEFAULT 0,
+    last_active TEXT DEFAULT (now()),
+    created_at TEXT DEFAULT (now()),
+    updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS experience_logs (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL REFERENCES user_profiles(user_id) ON DELETE CASCADE,
+    exp_gained INTEGER NOT NULL,
+    activity_type TEXT NOT NULL,
+    total_exp_after INTEGER NOT NULL,
+    timestamp TEXT DEFAULT (now()),
+    metadata TEXT DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS quiz_attempts (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL REFERENCES user_profiles(user_id) ON DELETE CASCADE,
+    quiz_id TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    max_score INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    time_taken INTEGER,
+    answers TEXT NOT NULL,
+    passed INTEGER DEFAULT 0,
+    attempt_number INTEGER DEFAULT 1,
+    completed_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS learning_progress (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL REFERENCES user_profiles(user_id) ON DELETE CASCADE,
+    content_id TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    status TEXT DEFAULT 'not_started',
+    progress_percentage INTEGER DEFAULT 0,
+    time_spent INTEGER DEFAULT 0,
+    last_accessed TEXT DEFAULT (now()),
+    completed_at TEXT,
+    UNIQUE(user_id, content_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_achievements (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL REFERENCES user_profiles(user_id) ON DELETE CASCADE,
+    achievement_id TEXT NOT NULL,
+    achievement_name TEXT NOT NULL,
+    achievement_description TEXT,
+    earned_at TEXT DEFAULT (now()),
+    UNIQUE(user_id, achievement_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_streaks (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL REFERENCES user_profiles(user_id) ON DELETE CASCADE,
+    streak_date TEXT NOT NULL,
+    activity_count INTEGER DEFAULT 1,
+    exp_earned INTEGER DEFAULT 0,
+    UNIQUE(user_id, streak_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_profiles_total_exp ON user_profiles(total_exp DESC);
+CREATE INDEX IF NOT EXISTS idx_user_profiles_leaderboard ON user_profiles(total_exp DESC, created_at ASC, user_id ASC);
+CREATE INDEX IF NOT EXISTS idx_experience_logs_user_id ON experience_logs(user_id);
+CREATE INDEX IF NOT EXISTS idx_experience_logs_timestamp ON experience_logs(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_id ON quiz_attempts(user_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_quiz_id ON quiz_attempts(quiz_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_quiz ON quiz_attempts(user_id, quiz_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_completed_at ON quiz_attempts(completed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_history ON quiz_attempts(user_id, completed_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_learning_progress_user_id ON learning_progress(user_id);
+CREATE INDEX IF NOT EXISTS idx_learning_progress_content ON learning_progress(content_id, content_type);
+CREATE INDEX IF NOT EXISTS idx_user_achievements_user_id ON user_achievements(user_id);
+CREATE INDEX IF NOT EXISTS idx_daily_streaks_user_date ON daily_streaks(user_id, streak_date DESC);
+
+-- SQLite triggers cannot assign NEW, so these re-update the row afterwards
+CREATE TRIGGER IF NOT EXISTS update_user_profiles_updated_at
+    AFTER UPDATE ON user_profiles
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE user_profiles SET updated_at = now() WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_level_on_exp_change
+    AFTER UPDATE OF total_exp ON user_profiles
+    FOR EACH ROW WHEN NEW.total_exp != OLD.total_exp
+BEGIN
+    UPDATE user_profiles SET level = calculate_exp_level(NEW.total_exp) WHERE id = NEW.id;
+END;
+
+CREATE VIEW IF NOT EXISTS education_leaderboard AS
+SELECT
+    user_id,
+    username,
+    total_exp,
+    level,
+    badges,
+    learning_streak,
+    last_active,
+    RANK() OVER (ORDER BY total_exp DESC) as rank
+FROM user_profiles
+ORDER BY total_exp DESC;
+
+CREATE VIEW IF NOT EXISTS user_statistics AS
+SELECT
+    up.user_id,
+    up.username,
+    up.total_exp,
+    up.level,
+    COALESCE(json_array_length(up.badges), 0) as badges_count,
+    COALESCE(json_array_length(up.completed_quizzes), 0) as completed_quizzes_count,
+    up.learning_streak,
+    COUNT(DISTINCT qa.quiz_id) as total_quizzes_attempted,
+    COUNT(qa.id) as total_quiz_attempts,
+    COUNT(CASE WHEN qa.passed THEN 1 END) as passed_quiz_attempts,
+    CASE
+        WHEN COUNT(DISTINCT qa.quiz_id) > 0
+        THEN ROUND((COUNT(CASE WHEN qa.passed THEN 1 END) * 1.0 / COUNT(DISTINCT qa.quiz_id)) * 100, 2)
+        ELSE 0
+    END as quiz_success_rate,
+    COUNT(el.id) as total_activities,
+    up.last_active
+FROM user_profiles up
+LEFT JOIN quiz_attempts qa ON up.user_id = qa.user_id
+LEFT JOIN experience_logs el ON up.user_id = el.user_id
+GROUP BY up.user_id, up.username, up.total_exp, up.level, up.badges, up.completed_quizzes, up.learning_streak, up.last_active;
+"""
+
+QUIZ_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL,
+    choices TEXT NOT NULL,
+    correct_choice INTEGER NOT NULL CHECK (correct_choice >= 0),
+    xp_reward INTEGER NOT NULL DEFAULT 10 CHECK (xp_reward > 0),
+    difficulty TEXT NOT NULL CHECK (difficulty IN ('easy', 'medium', 'hard')),
+    created_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS users_profile (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    username TEXT UNIQUE NOT NULL,
+    level INTEGER DEFAULT 1 CHECK (level > 0),
+    total_xp INTEGER DEFAULT 0 CHECK (total_xp >= 0),
+    balance INTEGER DEFAULT 0 CHECK (balance >= 0),
+    created_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS user_quiz_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL REFERENCES users_profile(id) ON DELETE CASCADE,
+    quiz_id INTEGER NOT NULL REFERENCES quizzes(id) ON DELETE CASCADE,
+    attempts INTEGER DEFAULT 0 CHECK (attempts >= 0),
+    best_score INTEGER DEFAULT 0 CHECK (best_score >= 0),
+    earned_xp INTEGER DEFAULT 0 CHECK (earned_xp >= 0),
+    last_attempted TEXT DEFAULT (now()),
+    UNIQUE(user_id, quiz_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_quizzes_difficulty ON quizzes(difficulty);
+CREATE INDEX IF NOT EXISTS idx_quizzes_created_at ON quizzes(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_users_profile_username ON users_profile(username);
+CREATE INDEX IF NOT EXISTS idx_users_profile_total_xp ON users_profile(total_xp DESC);
+CREATE INDEX IF NOT EXISTS idx_users_profile_leaderboard ON users_profile(total_xp DESC, created_at ASC, id ASC);
+CREATE INDEX IF NOT EXISTS idx_users_profile_level ON users_profile(level DESC);
+CREATE INDEX IF NOT EXISTS idx_user_quiz_progress_user_id ON user_quiz_progress(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_quiz_progress_quiz_id ON user_quiz_progress(quiz_id);
+CREATE INDEX IF NOT EXISTS idx_user_quiz_progress_last_attempted ON user_quiz_progress(last_attempted DESC);
+
+CREATE TRIGGER IF NOT EXISTS trigger_update_user_level
+    AFTER UPDATE OF total_xp ON users_profile
+    FOR EACH ROW WHEN OLD.total_xp IS NOT NEW.total_xp
+BEGIN
+    UPDATE users_profile SET level = calculate_xp_level(NEW.total_xp) WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_insert_user_level
+    AFTER INSERT ON users_profile
+    FOR EACH ROW
+BEGIN
+    UPDATE users_profile SET level = calculate_xp_level(NEW.total_xp) WHERE id = NEW.id;
+END;
+
+CREATE VIEW IF NOT EXISTS leaderboard AS
+SELECT
+    username,
+    level,
+    total_xp,
+    balance,
+    created_at,
+    ROW_NUMBER() OVER (ORDER BY total_xp DESC, created_at ASC) as rank
+FROM users_profile
+ORDER BY total_xp DESC, created_at ASC;
+
+CREATE VIEW IF NOT EXISTS quiz_statistics AS
+SELECT
+    q.id,
+    q.question,
+    q.difficulty,
+    q.xp_reward,
+    COUNT(uqp.id) as total_attempts,
+    COUNT(CASE WHEN uqp.best_score > 0 THEN 1 END) as successful_attempts,
+    CASE
+        WHEN COUNT(uqp.id) > 0
+        THEN ROUND((COUNT(CASE WHEN uqp.best_score > 0 THEN 1 END) * 1.0 / COUNT(uqp.id)) * 100, 2)
+        ELSE 0
+    END as success_rate,
+    AVG(uqp.attempts) as avg_attempts_per_user
+FROM quizzes q
+LEFT JOIN user_quiz_progress uqp ON q.id = uqp.quiz_id
+GROUP BY q.id, q.question, q.difficulty, q.xp_reward
+ORDER BY q.id;
+
+CREATE VIEW IF NOT EXISTS user_progress_summary AS
+SELECT
+    up.id,
+    up.username,
+    up.level,
+    up.total_xp,
+    up.balance,
+    COUNT(uqp.id) as quizzes_attempted,
+    COUNT(CASE WHEN uqp.best_score > 0 THEN 1 END) as quizzes_completed,
+    SUM(uqp.earned_xp) as xp_from_quizzes,
+    AVG(uqp.best_score) as avg_score,
+    MAX(uqp.last_attempted) as last_quiz_attempt
+FROM users_profile up
+LEFT JOIN user_quiz_progress uqp ON up.id = uqp.user_id
+GROUP BY up.id, up.username, up.level, up.total_xp, up.balance
+ORDER BY up.total_xp DESC;
+"""
+
+
+class SqliteBackendError(Exception):
+    """Query failed (mirrors postgrest's APIError for the calls we make)"""
+
+
+class SqliteResponse:
+    """Result of an executed query: `.data` and (if requested) `.count`"""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _exp_level(total_exp: Optional[int]) -> int:
+    # supabase_schema.sql: floor(sqrt(total_exp / 100)) + 1
+    return int(((total_exp or 0) / 100) ** 0.5) + 1
+
+
+def _xp_level(total_xp: Optional[int]) -> int:
+    # trading_quiz_schema.sql: greatest(1, floor(xp / 100) + 1)
+    return max(1, (total_xp or 0) // 100 + 1)
+
+
+def _identifier(name: str) -> str:
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise SqliteBackendError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+def _encode(column: str, value: Any) -> Any:
+    if column in JSON_COLUMNS and value is not None and not isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _decode_row(row: sqlite3.Row) -> Dict:
+    decoded = {}
+    for column in row.keys():
+        value = row[column]
+        if column in JSON_COLUMNS and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        elif column in BOOL_COLUMNS and value is not None:
+            value = bool(value)
+        decoded[column] = value
+    return decoded
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a PostgREST logic expression on commas outside parentheses/quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quoted and char == '\\' and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+_OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+              'like': 'LIKE', 'ilike': 'LIKE'}
+
+
+def _condition(column: str, operator: str, value: Any) -> Tuple[str, List[Any]]:
+    """SQL for one PostgREST-style filter"""
+    target = _identifier(column)
+    if operator in _OPERATORS:
+        if operator in ('like', 'ilike') and isinstance(value, str):
+            value = value.replace('*', '%')
+        return f"{target} {_OPERATORS[operator]} ?", [_encode(column, value)]
+    if operator == 'in':
+        values = list(value)
+        if not values:
+            return "0", []
+        return f"{target} IN ({', '.join('?' * len(values))})", [_encode(column, v) for v in values]
+    if operator == 'is':
+        keyword = {'null': 'NULL', 'true': '1', 'false': '0', None: 'NULL', True: '1', False: '0'}[value]
+        return f"{target} IS {keyword}", []
+    raise SqliteBackendError(f"Unsupported filter operator: {operator}")
+
+
+def _logic_expression(expression: str, joiner: str) -> Tuple[str, List[Any]]:
+    """SQL for a PostgREST `or=(...)` / `and(...)` expression"""
+    clauses, params = [], []
+    for part in _split_top_level(expression):
+        part = part.strip()
+        nested = re.match(r'^(and|or)\((.*)\)$', part, re.S)
+        if nested:
+            sql, nested_params = _logic_expression(nested.group(2), nested.group(1).upper())
+        else:
+            column, operator, raw = part.split('.', 2)
+            if operator == 'in':
+                value = [_unquote(v.strip()) for v in _split_top_level(raw.strip()[1:-1])]
+            else:
+                value = _unquote(raw)
+            sql, nested_params = _condition(column, operator, value)
+        clauses.append(f"({sql})")
+        params.extend(nested_params)
+    return f" {joiner} ".join(clauses), params
+
+
+class _Query:
+    """Chainable query builder with the supabase-py method names we use"""
+
+    def __init__(self, backend: "SqliteBackend", table: str, asynchronous: bool = False):
+        self._backend = backend
+        self._table = _identifier(table)
+        self._asynchronous = asynchronous
+        self._action = 'select'
+        self._columns = '*'
+        self._embeds: List[Tuple[str, str]] = []
+        self._count = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._returning = 'representation'
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._single = False
+        self._maybe_single = False
+
+    # Actions
+    def select(self, *columns: str, count: Optional[str] = None) -> "_Query":
+        names = []
+        for column in columns or ('*',):
+            for name in _split_top_level(column):
+                name = name.strip()
+                embed = re.match(r'^(\w+)\((.*)\)$', name, re.S)
+                if embed:
+                    # Many-to-one embed such as `quizzes(question, xp_reward)`
+                    self._embeds.append((embed.group(1), embed.group(2)))
+                elif name:
+                    names.append(name)
+        if names and names != ['*']:
+            self._columns = ', '.join('*' if name == '*' else _identifier(name) for name in names)
+        self._count = count
+        return self
+
+    def insert(self, rows: Any, returning: str = 'representation', **kwargs) -> "_Query":
+        self._action, self._payload, self._returning = 'insert', rows, str(returning)
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = '', returning: str = 'representation',
+               ignore_duplicates: bool = False, **kwargs) -> "_Query":
+        self._action, self._payload, self._returning = 'upsert', rows, str(returning)
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict, **kwargs) -> "_Query":
+        self._action, self._payload = 'update', values
+        return self
+
+    def delete(self, **kwargs) -> "_Query":
+        self._action = 'delete'
+        return self
+
+    # Filters
+    def _filter(self, column: str, operator: str, value: Any) -> "_Query":
+        sql, params = _condition(column, operator, value)
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'lte', value)
+
+    def like(self, column: str, pattern: str) -> "_Query":
+        return self._filter(column, 'like', pattern)
+
+    def ilike(self, column: str, pattern: str) -> "_Query":
+        return self._filter(column, 'ilike', pattern)
+
+    def is_(self, column: str, value: Any) -> "_Query":
+        return self._filter(column, 'is', value)
+
+    def in_(self, column: str, values: Sequence[Any]) -> "_Query":
+        return self._filter(column, 'in', values)
+
+    def or_(self, filters: str, **kwargs) -> "_Query":
+        sql, params = _logic_expression(filters, 'OR')
+        self._where.append(f"({sql})")
+        self._params.extend(params)
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs) -> "_Query":
+        # Postgres puts NULLs last ascending and first descending
+        if nullsfirst is None:
+            nullsfirst = desc
+        direction = 'DESC' if desc else 'ASC'
+        nulls = 'NULLS FIRST' if nullsfirst else 'NULLS LAST'
+        self._order.append(f"{_identifier(column)} {direction} {nulls}")
+        return self
+
+    def limit(self, size: int, **kwargs) -> "_Query":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "_Query":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self) -> "_Query":
+        self._single = True
+        return self
+
+    def maybe_single(self) -> "_Query":
+        self._maybe_single = True
+        return self
+
+    # Execution
+    def execute(self):
+        if self._asynchronous:
+            return self._execute_async()
+        return self._execute()
+
+    async def _execute_async(self) -> SqliteResponse:
+        return self._execute()
+
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ''
+
+    def _execute(self) -> SqliteResponse:
+        with self._backend.transaction() as db:
+            if self._action == 'select':
+                response = self._run_select(db)
+            else:
+                response = self._run_write(db)
+
+        if self._single or self._maybe_single:
+            rows = response.data
+            if len(rows) == 1:
+                response.data = rows[0]
+            elif self._maybe_single and not rows:
+                response.data = None
+            else:
+                raise SqliteBackendError(
+                    f"JSON object requested, multiple (or no) rows returned ({len(rows)} rows)"
+                )
+        return response
+
+    def _run_select(self, db: sqlite3.Connection) -> SqliteResponse:
+        columns = self._columns
+        if self._embeds and columns != '*':
+            # Embeds need their foreign key columns; they are dropped again below
+            columns = f"{columns}, *"
+        sql = f"SELECT {columns} FROM {self._table}{self._where_sql()}"
+        if self._order:
+            sql += f" ORDER BY {', '.join(self._order)}"
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {int(self._limit if self._limit is not None else -1)}"
+            sql += f" OFFSET {int(self._offset or 0)}"
+        rows = [_decode_row(row) for row in db.execute(sql, self._params)]
+        if self._embeds:
+            rows = self._embed(db, rows)
+
+        count = None
+        if self._count:
+            count = db.execute(
+                f"SELECT COUNT(*) FROM {self._table}{self._where_sql()}", self._params
+            ).fetchone()[0]
+        return SqliteResponse(rows, count)
+
+    def _embed(self, db: sqlite3.Connection, rows: List[Dict]) -> List[Dict]:
+        table = self._table.strip('"')
+        keep = None
+        if self._columns != '*':
+            keep = [name.strip().strip('"') for name in self._columns.split(',')]
+        for target, target_columns in self._embeds:
+            links = [
+                (link['from'], link['to'])
+                for link in db.execute(f"PRAGMA foreign_key_list({_identifier(table)})")
+                if link['table'] == target
+            ]
+            if not links:
+                raise SqliteBackendError(f"Could not find a relationship between '{table}' and '{target}'")
+            local, remote = links[0]
+            names = [name.strip() for name in target_columns.split(',') if name.strip()]
+            selected = '*' if names in ([], ['*']) else ', '.join(_identifier(n) for n in names)
+            keys = list({row[local] for row in rows if row.get(local) is not None})
+            related = {}
+            if keys:
+                placeholders = ', '.join('?' * len(keys))
+                for match in db.execute(
+                    f"SELECT {_identifier(remote)} AS _key, {selected} FROM {_identifier(target)} "
+                    f"WHERE {_identifier(remote)} IN ({placeholders})", keys
+                ):
+                    embedded = _decode_row(match)
+                    related[embedded.pop('_key')] = embedded
+            for row in rows:
+                row[target] = related.get(row.get(local))
+        if keep is not None:
+            wanted = set(keep) | {target for target, _ in self._embeds}
+            rows = [{key: value for key, value in row.items() if key in wanted} for row in rows]
+        return rows
+
+    def _run_write(self, db: sqlite3.Connection) -> SqliteResponse:
+        if self._action in ('insert', 'upsert'):
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            rowids = [self._insert_row(db, row) for row in rows]
+        elif self._action == 'update':
+            columns = list(self._payload)
+            assignments = ', '.join(f"{_identifier(column)} = ?" for column in columns)
+            values = [_encode(column, self._payload[column]) for column in columns]
+            rowids = [row[0] for row in db.execute(
+                f"UPDATE {self._table} SET {assignments}{self._where_sql()} RETURNING rowid",
+                values + self._params
+            ).fetchall()]
+        else:
+            deleted = [_decode_row(row) for row in db.execute(
+                f"DELETE FROM {self._table}{self._where_sql()} RETURNING *", self._params
+            ).fetchall()]
+            return SqliteResponse(deleted if self._returning != 'minimal' else [])
+
+        if self._returning == 'minimal' or not rowids:
+            return SqliteResponse([])
+        # Re-read so values set by triggers (level, updated_at) are included
+        placeholders = ', '.join('?' * len(rowids))
+        by_rowid = {
+            row['_rowid']: row
+            for row in db.execute(
+                f"SELECT rowid AS _rowid, * FROM {self._table} WHERE rowid IN ({placeholders})", rowids
+            )
+        }
+        data = []
+        for rowid in rowids:
+            row = _decode_row(by_rowid[rowid])
+            row.pop('_rowid', None)
+            data.append(row)
+        return SqliteResponse(data)
+
+    def _insert_row(self, db: sqlite3.Connection, row: Dict) -> int:
+        columns = list(row)
+        names = ', '.join(_identifier(column) for column in columns)
+        placeholders = ', '.join('?' * len(columns))
+        sql = f"INSERT INTO {self._table} ({names}) VALUES ({placeholders})"
+        if self._action == 'upsert':
+            conflict = [name for name in (self._on_conflict or '').split(',') if name.strip()]
+            if not conflict:
+                conflict = ['id']
+            updates = [column for column in columns if column not in conflict]
+            target = ', '.join(_identifier(name) for name in conflict)
+            if updates:
+                assignments = ', '.join(f"{_identifier(c)} = excluded.{_identifier(c)}" for c in updates)
+                sql += f" ON CONFLICT ({target}) DO UPDATE SET {assignments}"
+            else:
+                sql += f" ON CONFLICT ({target}) DO NOTHING"
+        result = db.execute(sql + " RETURNING rowid", [_encode(c, row[c]) for c in columns]).fetchone()
+        if result is None:
+            # DO NOTHING on an existing row: report that row
+            where = ' AND '.join(f"{_identifier(name)} = ?" for name in conflict)
+            result = db.execute(
+                f"SELECT rowid FROM {self._table} WHERE {where}",
+                [_encode(name.strip(), row.get(name.strip())) for name in conflict]
+            ).fetchone()
+        return result[0]
+
+
+class _RpcCall:
+    """Deferred call of one of the database functions in SqliteBackend.FUNCTIONS"""
+
+    def __init__(self, backend: "SqliteBackend", name: str, params: Dict, asynchronous: bool):
+        self._backend = backend
+        self._name = name
+        self._params = params or {}
+        self._asynchronous = asynchronous
+
+    def execute(self):
+        if self._asynchronous:
+            return self._execute_async()
+        return self._execute()
+
+    async def _execute_async(self) -> SqliteResponse:
+        return self._execute()
+
+    def _execute(self) -> SqliteResponse:
+        function = self._backend.FUNCTIONS.get(self._name)
+        if function is None:
+            raise SqliteBackendError(f"Could not find the function public.{self._name}")
+        with self._backend.transaction() as db:
+            return SqliteResponse(function(db, **self._params))
+
+
+def _award_experience(db: sqlite3.Connection, p_user_id: str, p_exp_gained: int,
+                      p_activity_type: str, p_completed_quiz_id: Optional[str] = None,
+                      p_metadata: Optional[Dict] = None, p_log: bool = True) -> List[Dict]:
+    row = db.execute("SELECT * FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone()
+    if row is None:
+        return []
+    completed = json.loads(row['completed_quizzes'] or '[]')
+    if p_completed_quiz_id is not None and p_completed_quiz_id not in completed:
+        completed.append(p_completed_quiz_id)
+    total_exp = row['total_exp'] + p_exp_gained
+    db.execute(
+        "UPDATE user_profiles SET total_exp = ?, level = ?, last_active = now(), completed_quizzes = ? "
+        "WHERE user_id = ?",
+        (total_exp, _exp_level(total_exp), json.dumps(completed), p_user_id)
+    )
+    if p_log:
+        db.execute(
+            "INSERT INTO experience_logs (user_id, exp_gained, activity_type, total_exp_after, metadata) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (p_user_id, p_exp_gained, p_activity_type, total_exp, json.dumps(p_metadata or {}))
+        )
+    return [_decode_row(db.execute("SELECT * FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone())]
+
+
+def _add_completed_quiz(db: sqlite3.Connection, p_user_id: str, p_quiz_id: str) -> List[Dict]:
+    row = db.execute("SELECT completed_quizzes FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone()
+    completed = json.loads(row['completed_quizzes'] or '[]') if row else None
+    if completed is None or p_quiz_id in completed:
+        return []
+    completed.append(p_quiz_id)
+    db.execute("UPDATE user_profiles SET completed_quizzes = ? WHERE user_id = ?", (json.dumps(completed), p_user_id))
+    return [_decode_row(db.execute("SELECT * FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone())]
+
+
+def _add_user_badge(db: sqlite3.Connection, p_user_id: str, p_badge: Dict) -> List[Dict]:
+    row = db.execute("SELECT badges FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone()
+    badges = json.loads(row['badges'] or '[]') if row else None
+    if badges is None or any(badge.get('id') == p_badge.get('id') for badge in badges):
+        return []
+    badges.append(p_badge)
+    db.execute("UPDATE user_profiles SET badges = ? WHERE user_id = ?", (json.dumps(badges), p_user_id))
+    return [_decode_row(db.execute("SELECT * FROM user_profiles WHERE user_id = ?", (p_user_id,)).fetchone())]
+
+
+def _add_user_xp(db: sqlite3.Connection, p_user_id: str, p_xp: int) -> List[Dict]:
+    db.execute("UPDATE users_profile SET total_xp = total_xp + ? WHERE id = ?", (p_xp, p_user_id))
+    return [_decode_row(row) for row in db.execute("SELECT * FROM users_profile WHERE id = ?", (p_user_id,))]
+
+
+def _submit_quiz_answers(db: sqlite3.Connection, p_user_id: str, p_answers: List[Dict]) -> List[Dict]:
+    if db.execute("SELECT 1 FROM users_profile WHERE id = ?", (p_user_id,)).fetchone() is None:
+        return []
+    earned = []
+    for answer in p_answers:
+        db.execute(
+            "INSERT INTO user_quiz_progress (user_id, quiz_id, attempts, best_score, earned_xp) "
+            "VALUES (?, ?, 0, 0, 0) ON CONFLICT (user_id, quiz_id) DO NOTHING",
+            (p_user_id, answer['quiz_id'])
+        )
+        best_score = db.execute(
+            "SELECT best_score FROM user_quiz_progress WHERE user_id = ? AND quiz_id = ?",
+            (p_user_id, answer['quiz_id'])
+        ).fetchone()['best_score']
+        xp = answer['xp_reward'] if answer['correct'] and best_score == 0 else 0
+        earned.append(xp)
+        db.execute(
+            "UPDATE user_quiz_progress SET attempts = attempts + 1, best_score = MAX(best_score, ?), "
+            "earned_xp = earned_xp + ?, last_attempted = now() WHERE user_id = ? AND quiz_id = ?",
+            (1 if answer['correct'] else 0, xp, p_user_id, answer['quiz_id'])
+        )
+    db.execute("UPDATE users_profile SET total_xp = total_xp + ? WHERE id = ?", (sum(earned), p_user_id))
+    profile = db.execute("SELECT total_xp, level FROM users_profile WHERE id = ?", (p_user_id,)).fetchone()
+    return [
+        {'answer_index': index, 'quiz_id': answer['quiz_id'], 'xp_earned': xp,
+         'total_xp': profile['total_xp'], 'level': profile['level']}
+        for index, (answer, xp) in enumerate(zip(p_answers, earned))
+    ]
+
+
+def _user_activity_counts(db: sqlite3.Connection, p_user_id: str) -> List[Dict]:
+    row = db.execute(
+        "SELECT "
+        "(SELECT COUNT(*) FROM quiz_attempts WHERE user_id = ?) AS total_quiz_attempts, "
+        "(SELECT COUNT(DISTINCT quiz_id) FROM quiz_attempts WHERE user_id = ?) AS distinct_quizzes, "
+        "(SELECT COUNT(*) FROM experience_logs WHERE user_id = ?) AS total_activities",
+        (p_user_id, p_user_id, p_user_id)
+    ).fetchone()
+    return [dict(row)]
+
+
+def _sample_quizzes_sql() -> Optional[str]:
+    """The sample-quiz INSERT from trading_quiz_schema.sql, in SQLite syntax"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading_quiz_schema.sql')
+    try:
+        with open(path) as f:
+            schema = f.read()
+    except OSError:
+        return None
+    match = re.search(r"INSERT INTO quizzes .*?;\n", schema, re.S)
+    return match.group(0).replace("'::jsonb", "'") if match else None
+
+
+class SqliteBackend:
+    """Embedded database exposing `table()` and `rpc()` like a supabase Client"""
+
+    FUNCTIONS = {
+        'award_experience': _award_experience,
+        'add_completed_quiz': _add_completed_quiz,
+        'add_user_badge': _add_user_badge,
+        'add_user_xp': _add_user_xp,
+        'submit_quiz_answers': _submit_quiz_answers,
+        'user_activity_counts': _user_activity_counts,
+    }
+
+    def __init__(self, path: str = ':memory:', seed_quizzes: bool = True, asynchronous: bool = False):
+        self.path = path
+        self.asynchronous = asynchronous
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.create_function('now', 0, _now)
+        self._db.create_function('gen_random_uuid', 0, lambda: str(uuid.uuid4()))
+        self._db.create_function('calculate_exp_level', 1, _exp_level, deterministic=True)
+        self._db.create_function('calculate_xp_level', 1, _xp_level, deterministic=True)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema(seed_quizzes)
+
+    def _create_schema(self, seed_quizzes: bool) -> None:
+        with self.transaction() as db:
+            for statement in self._statements(EDUCATION_SCHEMA + QUIZ_SCHEMA):
+                db.execute(statement)
+            if seed_quizzes and db.execute("SELECT COUNT(*) FROM quizzes").fetchone()[0] == 0:
+                sample = _sample_quizzes_sql()
+                if sample:
+                    db.execute(sample)
+
+    @staticmethod
+    def _statements(script: str) -> List[str]:
+        # Split on ';' at line ends, keeping trigger bodies (which end in END;) whole
+        statements, current = [], []
+        for line in script.splitlines():
+            if line.strip().startswith('--') or not line.strip():
+                continue
+            current.append(line)
+            if line.rstrip().endswith(';'):
+                text = '\n'.join(current)
+                if text.lstrip().upper().startswith('CREATE TRIGGER') and not line.strip().upper() == 'END;':
+                    continue
+                statements.append(text)
+                current = []
+        return statements
+
+    @contextmanager
+    def transaction(self):
+        """Serialize access to the shared connection and commit/rollback as a unit"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            else:
+                self._db.execute("COMMIT")
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name, self.asynchronous)
+
+    def from_(self, name: str) -> _Query:
+        return self.table(name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> _RpcCall:
+        return _RpcCall(self, fn, params, self.asynchronous)
+
+    def as_async(self) -> "SqliteBackend":
+        """A view of the same database whose `execute()` calls are awaitable"""
+        clone = object.__new__(SqliteBackend)
+        clone.__dict__.update(self.__dict__)
+        clone.asynchronous = True
+        return clone
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
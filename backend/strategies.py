@@ -0,0 +1,232 @@
+# strategies.py - P&L surfaces for multi-leg option strategies
+#
+# The strategy templates mirror OPTIONS_STRATEGIES in
+# frontend/services/optionsStrategies.ts (the frontend writes 100 shares of
+# stock as a call struck at 0; here that is a 'stock' leg). Entry premiums are
+# Black-Scholes prices at the entry spot unless a leg supplies its own.
+#
+# A surface values every leg over a spot x days-elapsed grid in one
+# vectorized pricing call. Breakevens and max profit/loss come from the
+# expiry payoff, which is piecewise linear between strikes, so they are
+# exact: the payoff is evaluated at 0 and at every strike, and the slope past
+# the highest strike tells whether profit or loss is unlimited. Surfaces are
+# memoized on the normalized leg set and grid parameters.
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pricing import black_scholes
+
+CONTRACT_MULTIPLIER = 100
+DAYS_PER_YEAR = 365.0
+SURFACE_CACHE_SIZE = 256
+MAX_PRICE_STEPS = 1001
+MAX_TIME_STEPS = 101
+
+# (type, action, strike, quantity); stock quantities are shares
+STRATEGY_TEMPLATES: Dict[str, Dict] = {
+    'covered_call': {'name': 'Covered Call', 'legs': [
+        ('call', 'sell', 105, 1), ('stock', 'buy', 0, 100)]},
+    'cash_secured_put': {'name': 'Cash-Secured Put', 'legs': [
+        ('put', 'sell', 100, 1)]},
+    'long_straddle': {'name': 'Long Straddle', 'legs': [
+        ('call', 'buy', 100, 1), ('put', 'buy', 100, 1)]},
+    'short_straddle': {'name': 'Short Straddle', 'legs': [
+        ('call', 'sell', 100, 1), ('put', 'sell', 100, 1)]},
+    'bull_call_spread': {'name': 'Bull Call Spread', 'legs': [
+        ('call', 'buy', 100, 1), ('call', 'sell', 110, 1)]},
+    'bear_put_spread': {'name': 'Bear Put Spread', 'legs': [
+        ('put', 'buy', 100, 1), ('put', 'sell', 90, 1)]},
+    'iron_condor': {'name': 'Iron Condor', 'legs': [
+        ('put', 'sell', 95, 1), ('put', 'buy', 90, 1), ('call', 'sell', 105, 1), ('call', 'buy', 110, 1)]},
+    'protective_put': {'name': 'Protective Put', 'legs': [
+        ('put', 'buy', 100, 1), ('stock', 'buy', 0, 100)]},
+}
+
+# Normalized leg: (type, signed quantity, strike, premium or None)
+Leg = Tuple[str, float, float, Optional[float]]
+
+
+def _round(value: float) -> float:
+    # Collapse float noise so equivalent requests share a cache entry
+    return round(float(value), 6)
+
+
+def normalize_legs(legs: Sequence) -> Tuple[Leg, ...]:
+    """Canonical, hashable leg set: validated, same legs merged, sorted.
+
+    Accepts template tuples or dicts with type/action/strike/quantity and an
+    optional per-unit premium.
+    """
+    merged: Dict[Tuple[str, float, Optional[float]], float] = {}
+    for leg in legs:
+        if isinstance(leg, dict):
+            leg_type, action = leg.get('type'), leg.get('action', 'buy')
+            strike, quantity, premium = leg.get('strike', 0), leg.get('quantity', 1), leg.get('premium')
+        else:
+            leg_type, action, strike, quantity = leg
+            premium = None
+        leg_type = str(leg_type).lower()
+        strike, quantity = float(strike), float(quantity)
+        premium = None if premium is None else float(premium)
+        # NaN passes every comparison below, and inf would poison the surface
+        if not all(math.isfinite(value) for value in (strike, quantity, premium) if value is not None):
+            raise ValueError("Leg strike, quantity and premium must be finite numbers")
+        # The frontend's convention for shares: a call struck at 0
+        if leg_type == 'call' and strike == 0:
+            leg_type = 'stock'
+        if leg_type not in ('call', 'put', 'stock'):
+            raise ValueError(f"Leg type must be 'call', 'put' or 'stock', got {leg_type!r}")
+        if action not in ('buy', 'sell'):
+            raise ValueError(f"Leg action must be 'buy' or 'sell', got {action!r}")
+        if quantity <= 0:
+            raise ValueError("Leg quantity must be positive")
+        if leg_type != 'stock' and strike <= 0:
+            raise ValueError("Option strikes must be positive")
+
+        strike = 0.0 if leg_type == 'stock' else _round(strike)
+        premium = None if premium is None else _round(premium)
+        key = (leg_type, strike, premium)
+        merged[key] = merged.get(key, 0.0) + (1 if action == 'buy' else -1) * quantity
+
+    normalized = tuple(sorted(
+        (leg_type, _round(quantity), strike, premium)
+        for (leg_type, strike, premium), quantity in merged.items() if quantity != 0
+    ))
+    if not normalized:
+        raise ValueError("Strategy has no legs")
+    return normalized
+
+
+def _leg_arrays(legs: Tuple[Leg, ...]):
+    types = np.array([leg[0] for leg in legs])
+    units = np.array([leg[1] * (1 if leg[0] == 'stock' else CONTRACT_MULTIPLIER) for leg in legs])
+    strikes = np.array([leg[2] for leg in legs], dtype=float)
+    return types, units, strikes
+
+
+def _leg_values(types, strikes, spot, years, vol, rate) -> np.ndarray:
+    """Per-unit value of each leg; leg axis first, broadcast over spot/years"""
+    is_option = types != 'stock'
+    shape = (len(types),) + (1,) * max(np.ndim(spot), np.ndim(years))
+    option_strikes = np.where(is_option, strikes, 1.0).reshape(shape)
+    values = black_scholes(spot, option_strikes, years, vol, rate,
+                           (types == 'call').reshape(shape), greeks=False)['price']
+    return np.where(is_option.reshape(shape), values, np.broadcast_to(spot, values.shape))
+
+
+def expiry_payoff(legs: Tuple[Leg, ...], spots: np.ndarray, entry_cost: float) -> np.ndarray:
+    """P&L at expiry (intrinsic values minus what was paid)"""
+    types, units, strikes = _leg_arrays(legs)
+    spots = np.asarray(spots, dtype=float)[None, :]
+    intrinsic = np.where(types[:, None] == 'call', np.maximum(spots - strikes[:, None], 0.0),
+                         np.where(types[:, None] == 'put', np.maximum(strikes[:, None] - spots, 0.0), spots))
+    return (units[:, None] * intrinsic).sum(axis=0) - entry_cost
+
+
+def payoff_extremes(legs: Tuple[Leg, ...], entry_cost: float) -> Dict:
+    """Breakevens and max profit/loss of the piecewise-linear expiry payoff"""
+    types, units, strikes = _leg_arrays(legs)
+    kinks = np.unique(np.concatenate(([0.0], strikes[types != 'stock'])))
+    values = expiry_payoff(legs, kinks, entry_cost)
+    # Past the highest strike only calls and stock still move with the spot
+    tail_slope = float(units[types != 'put'].sum())
+
+    breakevens: List[float] = []
+    for left, right, value_left, value_right in zip(kinks[:-1], kinks[1:], values[:-1], values[1:]):
+        if value_left == 0:
+            breakevens.append(left)
+        elif value_left * value_right < 0:
+            breakevens.append(left + (right - left) * value_left / (value_left - value_right))
+    if values[-1] == 0 and tail_slope == 0:
+        breakevens.append(kinks[-1])
+    elif values[-1] * tail_slope < 0 or (values[-1] == 0 and tail_slope != 0):
+        breakevens.append(kinks[-1] - values[-1] / tail_slope)
+
+    max_profit = float(values.max())
+    max_loss = float(values.min())
+    return {
+        'breakevens': [round(float(value), 4) for value in sorted(set(breakevens)) if value > 0],
+        'max_profit': 'unlimited' if tail_slope > 0 else round(max_profit, 2),
+        'max_loss': 'unlimited' if tail_slope < 0 else round(max_loss, 2)
+    }
+
+
+class StrategyBook:
+    """A normalized leg set with its entry premiums, valued in bulk"""
+
+    def __init__(self, legs: Tuple[Leg, ...], spot: float, vol: float, rate: float, days: float):
+        self.legs = legs
+        self.vol = vol
+        self.rate = rate
+        self.types, self.units, self.strikes = _leg_arrays(legs)
+        model_premiums = _leg_values(self.types, self.strikes, spot, days / DAYS_PER_YEAR, vol, rate)
+        self.premiums = np.array([model if leg[3] is None else leg[3] for leg, model in zip(legs, model_premiums)])
+        self.entry_cost = float((self.units * self.premiums).sum())
+
+    def pnl(self, spot, years) -> np.ndarray:
+        """Mark-to-market P&L at broadcastable spot/years-to-expiry arrays"""
+        values = _leg_values(self.types, self.strikes, spot, years, self.vol, self.rate)
+        return np.tensordot(self.units, values, axes=1) - self.entry_cost
+
+
+@lru_cache(maxsize=SURFACE_CACHE_SIZE)
+def _surface(legs: Tuple[Leg, ...], spot: float, vol: float, rate: float, days: float,
+             low: float, high: float, price_steps: int, time_steps: int) -> Dict:
+    book = StrategyBook(legs, spot, vol, rate, days)
+    entry_cost = book.entry_cost
+
+    spots = np.linspace(low, high, price_steps)
+    elapsed = np.linspace(0.0, days, time_steps)
+    remaining = (days - elapsed) / DAYS_PER_YEAR
+    # legs x time x spot in one pricing call
+    pnl = book.pnl(spots[None, :], remaining[:, None])
+
+    surface = {
+        'spots': spots,
+        'days_elapsed': elapsed,
+        'pnl': pnl,
+        'expiry_pnl': expiry_payoff(legs, spots, entry_cost),
+        'premiums': book.premiums,
+        'entry_cost': entry_cost,
+        **payoff_extremes(legs, entry_cost)
+    }
+    for value in surface.values():
+        # Cached results are shared between requests
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+    return surface
+
+
+def pl_surface(legs: Sequence, spot: float = 100.0, vol: float = 0.25, rate: float = 0.05,
+               days_to_expiry: float = 30.0, price_range: Optional[Sequence[float]] = None,
+               price_steps: int = 101, time_steps: int = 11) -> Dict:
+    """P&L over a spot x days-elapsed grid, plus breakevens and max profit/loss"""
+    if spot <= 0 or vol < 0 or days_to_expiry <= 0:
+        raise ValueError("spot and days_to_expiry must be positive and vol non-negative")
+    if not 2 <= price_steps <= MAX_PRICE_STEPS or not 2 <= time_steps <= MAX_TIME_STEPS:
+        raise ValueError(f"price_steps must be 2-{MAX_PRICE_STEPS} and time_steps 2-{MAX_TIME_STEPS}")
+    low, high = price_range if price_range is not None else (spot * 0.7, spot * 1.3)
+    if not 0 < low < high:
+        raise ValueError("price_range must be [low, high] with 0 < low < high")
+    return _surface(normalize_legs(legs), _round(spot), _round(vol), _round(rate), _round(days_to_expiry),
+                    _round(low), _round(high), int(price_steps), int(time_steps))
+
+
+def strategy_legs(strategy_id: str) -> List[Tuple]:
+    """Template legs for an OPTIONS_STRATEGIES id; raises KeyError if unknown"""
+    return STRATEGY_TEMPLATES[strategy_id]['legs']
+
+
+def surface_cache_stats() -> Dict:
+    info = _surface.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_ratio': (info.hits / lookups) if lookups else 0.0
+    }
@@ -1,82 +1,312 @@
-from supabase import create_client, Client
-from dotenv import load_dotenv
 import os
+import copy
 import json
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Any
 from datetime import datetime
+from cache import TTLCache
+from leaderboard_index import CURSOR_FIELDS, LeaderboardIndex
+from write_behind import WriteBehindBuffer, register_shutdown_flush
+from resilience import UpstreamUnavailable, note_served_stale
+from pagination import decode_cursor, encode_cursor, iter_keyset, keyset_query, split_page
+from config import LazyProxy, load_env
+from connection import connection_pool
 
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
+
+QUIZ_ATTEMPT_COLUMNS = ('id', 'user_id', 'quiz_id', 'score', 'max_score', 'percentage', 'time_taken',
+                        'answers', 'passed', 'attempt_number', 'completed_at')
+# `answers` holds the full JSON answer payload; callers ask for it explicitly
+DEFAULT_QUIZ_ATTEMPT_FIELDS = tuple(column for column in QUIZ_ATTEMPT_COLUMNS if column != 'answers')
+QUIZ_ATTEMPT_CURSOR_FIELDS = ('completed_at', 'id')
+QUIZ_ATTEMPT_ORDER = [('completed_at', True), ('id', True)]
+
+def quiz_attempt_columns(fields: Optional[str] = None) -> str:
+    """Select list for a comma-separated `fields` parameter; raises ValueError on unknown columns"""
+    requested = [field.strip() for field in fields.split(',') if field.strip()] if fields else []
+    unknown = [field for field in requested if field not in QUIZ_ATTEMPT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown quiz attempt fields: {', '.join(unknown)}")
+    columns = requested or list(DEFAULT_QUIZ_ATTEMPT_FIELDS)
+    # The sort key is always returned so the last row can become the next cursor
+    columns += [field for field in QUIZ_ATTEMPT_CURSOR_FIELDS if field not in columns]
+    return ', '.join(columns)
+
+def build_user_stats(user: Dict, counts: Dict) -> Dict:
+    """Assemble the stats payload from a profile and its `user_activity_counts` row"""
+    total_quizzes = counts.get('distinct_quizzes') or 0
+    passed_quizzes = len(user.get('completed_quizzes', []))
+    
+    return {
+        'user_id': user['user_id'],
+        'username': user['username'],
+        'level': user['level'],
+        'total_exp': user['total_exp'],
+        'badges_count': len(user.get('badges', [])),
+        'completed_quizzes': passed_quizzes,
+        'total_quiz_attempts': counts.get('total_quiz_attempts') or 0,
+        'quiz_success_rate': (passed_quizzes / total_quizzes * 100) if total_quizzes > 0 else 0,
+        'learning_streak': user.get('learning_streak', 0),
+        'total_activities': counts.get('total_activities') or 0,
+        'last_active': user['last_active']
+    }
+
+def new_profile_cache() -> TTLCache:
+    """Read-through user_profiles cache sized and timed from the environment"""
+    return TTLCache(
+        maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("PROFILE_CACHE_TTL", "30")),
+        stale_ttl=float(os.getenv("PROFILE_CACHE_STALE_TTL", "600"))
+    )
+
+LEADERBOARD_FIELDS = ('user_id', 'username', 'total_exp', 'level', 'badges', 'learning_streak')
+# Ranking fields plus the sort key, as read from user_profiles
+LEADERBOARD_COLUMNS = 'user_id, username, total_exp, level, badges, learning_streak, created_at'
+LEADERBOARD_ORDER = [('total_exp', True), ('created_at', False), ('user_id', False)]
+# Stable while XP changes, so a paged full load sees every profile once
+LEADERBOARD_ROWS_ORDER = [('user_id', False)]
+
+def new_leaderboard_index(loader=None) -> LeaderboardIndex:
+    """Ranked index over user_profiles XP (seeded by `loader`, or through install())"""
+    return LeaderboardIndex(
+        loader,
+        id_field='user_id',
+        xp_field='total_exp',
+        fields=LEADERBOARD_FIELDS,
+        reseed_interval=float(os.getenv("LEADERBOARD_RESEED_SECONDS", "300"))
+    )
+
+# Query builders shared with async_client.py; callers run .execute() (sync or awaited)
+def leaderboard_rows_query(supabase):
+    """Every profile's ranking fields, to be read in LEADERBOARD_ROWS_ORDER"""
+    return supabase.table('user_profiles').select(LEADERBOARD_COLUMNS)
+
+def leaderboard_page_query(supabase, after: Optional[Dict], limit: int):
+    """Keyset page of the leaderboard read straight from user_profiles"""
+    return keyset_query(
+        supabase.table('user_profiles').select(LEADERBOARD_COLUMNS),
+        LEADERBOARD_ORDER,
+        [after[field] for field in CURSOR_FIELDS] if after else None,
+        limit
+    )
+
+def profile_query(supabase, user_id: str):
+    return supabase.table('user_profiles').select('*').eq('user_id', user_id)
+
+def activity_counts_query(supabase, user_id: str):
+    # Counted server-side: one small row however long the user's history is
+    return supabase.rpc('user_activity_counts', {'p_user_id': user_id})
+
+def quiz_attempts_page_query(supabase, user_id: str, quiz_id: Optional[str], columns: str,
+                             after: Optional[Dict], limit: int):
+    query = supabase.table('quiz_attempts').select(columns).eq('user_id', user_id)
+    if quiz_id:
+        query = query.eq('quiz_id', quiz_id)
+    return keyset_query(
+        query, QUIZ_ATTEMPT_ORDER,
+        [after[field] for field in QUIZ_ATTEMPT_CURSOR_FIELDS] if after else None,
+        limit
+    )
+
+def quiz_attempts_page(rows: List[Dict], limit: int) -> Dict:
+    """Shape an executed quiz_attempts_page_query as {'entries', 'next_cursor'}"""
+    rows, more = split_page(rows, limit)
+    last = rows[-1] if more and rows else None
+    return {
+        'entries': rows,
+        'next_cursor': encode_cursor({field: last[field] for field in QUIZ_ATTEMPT_CURSOR_FIELDS}) if last else None
+    }
+
+def remember_profile(profile_cache: TTLCache, leaderboard: LeaderboardIndex,
+                     profile: Optional[Dict]) -> Optional[Dict]:
+    """Store a freshly written/read profile row in the cache and the leaderboard"""
+    if profile and profile.get('user_id'):
+        profile_cache.set(profile['user_id'], copy.deepcopy(profile))
+        leaderboard.update({
+            field: profile[field]
+            for field in ('user_id', 'username', 'total_exp', 'level', 'badges',
+                          'learning_streak', 'created_at')
+            if field in profile
+        })
+    return profile
+
+def profile_insert_query(supabase, user_data: Dict):
+    return supabase.table('user_profiles').insert({
+        'user_id': user_data.get('user_id'),
+        'username': user_data.get('username'),
+        'email': user_data.get('email'),
+        'total_exp': 0,
+        'level': 1,
+        'badges': [],
+        'completed_quizzes': [],
+        'learning_streak': 0,
+        'last_active': datetime.now().isoformat(),
+        'created_at': datetime.now().isoformat()
+    })
+
+def award_experience_call(supabase, user_id: str, exp_gained: int, activity_type: str,
+                          completed_quiz_id: Optional[str], metadata: Optional[Dict], log: bool):
+    return supabase.rpc('award_experience', {
+        'p_user_id': user_id,
+        'p_exp_gained': exp_gained,
+        'p_activity_type': activity_type,
+        'p_completed_quiz_id': str(completed_quiz_id) if completed_quiz_id is not None else None,
+        'p_metadata': metadata or {},
+        'p_log': log
+    })
+
+def experience_log_row(user_id: str, exp_gained: int, activity_type: str, profile: Dict,
+                       metadata: Optional[Dict]) -> Dict:
+    """experience_logs row for an award_experience call made with log=False"""
+    return {
+        'user_id': user_id,
+        'exp_gained': exp_gained,
+        'activity_type': activity_type,
+        'total_exp_after': profile['total_exp'],
+        'timestamp': datetime.now().isoformat(),
+        'metadata': metadata or {}
+    }
+
+def quiz_attempt_insert_query(supabase, quiz_attempt_data: Dict):
+    return supabase.table('quiz_attempts').insert({
+        'user_id': quiz_attempt_data.get('user_id'),
+        'quiz_id': quiz_attempt_data.get('quiz_id'),
+        'score': quiz_attempt_data.get('score'),
+        'max_score': quiz_attempt_data.get('max_score'),
+        'percentage': quiz_attempt_data.get('percentage'),
+        'time_taken': quiz_attempt_data.get('time_taken'),
+        'answers': json.dumps(quiz_attempt_data.get('answers', [])),
+        'passed': quiz_attempt_data.get('passed', False),
+        'attempt_number': quiz_attempt_data.get('attempt_number', 1),
+        'completed_at': datetime.now().isoformat()
+    })
+
+def completed_quiz_call(supabase, user_id: str, quiz_id: str):
+    # Appended server-side: rewriting the array from a (cached) copy
+    # would drop completions recorded meanwhile by other workers
+    return supabase.rpc('add_completed_quiz', {
+        'p_user_id': user_id,
+        'p_quiz_id': str(quiz_id)
+    })
+
+def badge_call(supabase, user_id: str, badge_id: str, badge_name: str):
+    # Appended server-side, and only if the user has no badge with this id
+    return supabase.rpc('add_user_badge', {
+        'p_user_id': user_id,
+        'p_badge': {
+            'id': badge_id,
+            'name': badge_name,
+            'earned_at': datetime.now().isoformat()
+        }
+    })
 
 class SupabaseClient:
     def __init__(self):
-        url: str = os.getenv("SUPABASE_URL")
-        key: str = os.getenv("SUPABASE_ANON_KEY")
+        load_env()
+        # Shared with the other backend client: one keep-alive pool per process
+        self.supabase: "Client" = connection_pool.get_client()
         
-        if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
+        # Read-through profile cache; every write path below refreshes it
+        self.profile_cache = new_profile_cache()
         
-        self.supabase: Client = create_client(url, key)
+        # Ranked in-memory leaderboard, moved along by the same write paths
+        self.leaderboard = new_leaderboard_index(self._load_leaderboard)
+        
+        # experience_logs is an audit trail: in "buffered" mode its rows are
+        # bulk-inserted in the background; "sync" writes them inside the RPC
+        self.exp_log_buffer: Optional[WriteBehindBuffer] = None
+        if os.getenv("EXP_LOG_DURABILITY", "buffered").lower() == "buffered":
+            self.exp_log_buffer = WriteBehindBuffer(
+                self._insert_experience_logs,
+                batch_size=int(os.getenv("EXP_LOG_BATCH_SIZE", "100")),
+                flush_interval=float(os.getenv("EXP_LOG_FLUSH_MS", "500")) / 1000,
+                max_pending=int(os.getenv("EXP_LOG_MAX_PENDING", "10000")),
+                name='experience_logs'
+            )
+            register_shutdown_flush(self.exp_log_buffer)
+    
+    def _insert_experience_logs(self, rows: List[Dict]) -> None:
+        """Bulk-insert buffered experience_logs rows (raises on failure)"""
+        self.supabase.table('experience_logs').insert(rows, returning='minimal').execute()
+    
+    def get_write_buffer_stats(self) -> Dict:
+        """Get experience_logs write-behind buffer counters"""
+        if self.exp_log_buffer is None:
+            return {'experience_logs': {'mode': 'sync'}}
+        return {'experience_logs': {'mode': 'buffered', **self.exp_log_buffer.stats()}}
+    
+    def _cache_profile(self, profile: Optional[Dict]) -> Optional[Dict]:
+        """Store a freshly written/read profile row in the cache"""
+        return remember_profile(self.profile_cache, self.leaderboard, profile)
+    
+    def _load_leaderboard(self) -> List[Dict]:
+        """Fetch every profile's ranking fields, a page at a time (raises on failure)"""
+        return list(iter_keyset(lambda: leaderboard_rows_query(self.supabase), LEADERBOARD_ROWS_ORDER, page_size=1000))
+    
+    def get_cache_stats(self) -> Dict:
+        """Get profile cache hit/miss/eviction counters"""
+        return {'profiles': self.profile_cache.stats()}
     
     # User Experience Data Methods
     def create_user_profile(self, user_data: Dict) -> Dict:
         """Create a new user profile with initial experience data"""
         try:
-            result = self.supabase.table('user_profiles').insert({
-                'user_id': user_data.get('user_id'),
-                'username': user_data.get('username'),
-                'email': user_data.get('email'),
-                'total_exp': 0,
-                'level': 1,
-                'badges': [],
-                'completed_quizzes': [],
-                'learning_streak': 0,
-                'last_active': datetime.now().isoformat(),
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return result.data[0] if result.data else None
+            result = profile_insert_query(self.supabase, user_data).execute()
+            return self._cache_profile(result.data[0] if result.data else None)
         except Exception as e:
             print(f"Error creating user profile: {e}")
             return None
     
     def get_user_profile(self, user_id: str) -> Optional[Dict]:
         """Get user profile by user_id"""
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            # Hand out a copy so callers can't mutate the cached row
+            return copy.deepcopy(cached)
+        
         try:
-            result = self.supabase.table('user_profiles').select('*').eq('user_id', user_id).execute()
-            return result.data[0] if result.data else None
+            result = profile_query(self.supabase, user_id).execute()
+            return self._cache_profile(result.data[0] if result.data else None)
+        except UpstreamUnavailable as e:
+            # Serve the last known profile rather than failing while upstream is down
+            print(f"Error getting user profile: {e}")
+            stale = self.profile_cache.get_stale(user_id)
+            if stale is None:
+                return None
+            note_served_stale()
+            return copy.deepcopy(stale)
         except Exception as e:
             print(f"Error getting user profile: {e}")
             return None
     
-    def update_user_exp(self, user_id: str, exp_gained: int, activity_type: str) -> Dict:
+    def update_user_exp(self, user_id: str, exp_gained: int, activity_type: str,
+                        completed_quiz_id: Optional[str] = None) -> Dict:
         """Update user experience points and level"""
+        return self.award_experience(user_id, exp_gained, activity_type, completed_quiz_id)
+    
+    def award_experience(self, user_id: str, exp_gained: int, activity_type: str,
+                         completed_quiz_id: Optional[str] = None,
+                         metadata: Optional[Dict] = None) -> Optional[Dict]:
+        """Award experience in a single round trip via the award_experience RPC.
+        
+        The database function increments total_exp, recomputes the level,
+        (optionally) records a completed quiz under one row lock, and returns
+        the updated profile. The experience_logs row is written by the RPC in
+        sync mode, or queued on the write-behind buffer in buffered mode.
+        """
         try:
-            # Get current user data
-            user = self.get_user_profile(user_id)
-            if not user:
-                return None
+            result = award_experience_call(
+                self.supabase, user_id, exp_gained, activity_type, completed_quiz_id, metadata,
+                log=self.exp_log_buffer is None
+            ).execute()
             
-            new_total_exp = user['total_exp'] + exp_gained
-            new_level = self.calculate_level(new_total_exp)
+            profile = result.data[0] if result.data else None
+            if profile and self.exp_log_buffer is not None:
+                self.exp_log_buffer.put(experience_log_row(user_id, exp_gained, activity_type, profile, metadata))
             
-            # Record the experience gain
-            self.supabase.table('experience_logs').insert({
-                'user_id': user_id,
-                'exp_gained': exp_gained,
-                'activity_type': activity_type,
-                'timestamp': datetime.now().isoformat(),
-                'total_exp_after': new_total_exp
-            }).execute()
-            
-            # Update user profile
-            result = self.supabase.table('user_profiles').update({
-                'total_exp': new_total_exp,
-                'level': new_level,
-                'last_active': datetime.now().isoformat()
-            }).eq('user_id', user_id).execute()
-            
-            return result.data[0] if result.data else None
+            return self._cache_profile(profile)
         except Exception as e:
-            print(f"Error updating user exp: {e}")
+            print(f"Error awarding experience: {e}")
             return None
     
     def calculate_level(self, total_exp: int) -> int:
@@ -86,24 +316,17 @@ class SupabaseClient:
         return math.floor(math.sqrt(total_exp / 100)) + 1
     
     # Quiz Data Methods
-    def save_quiz_attempt(self, quiz_attempt_data: Dict) -> Dict:
-        """Save a quiz attempt"""
+    def save_quiz_attempt(self, quiz_attempt_data: Dict, update_completion: bool = True) -> Dict:
+        """Save a quiz attempt
+        
+        Pass update_completion=False when the completion is recorded through
+        award_experience instead, to avoid an extra profile read and update.
+        """
         try:
-            result = self.supabase.table('quiz_attempts').insert({
-                'user_id': quiz_attempt_data.get('user_id'),
-                'quiz_id': quiz_attempt_data.get('quiz_id'),
-                'score': quiz_attempt_data.get('score'),
-                'max_score': quiz_attempt_data.get('max_score'),
-                'percentage': quiz_attempt_data.get('percentage'),
-                'time_taken': quiz_attempt_data.get('time_taken'),
-                'answers': json.dumps(quiz_attempt_data.get('answers', [])),
-                'passed': quiz_attempt_data.get('passed', False),
-                'attempt_number': quiz_attempt_data.get('attempt_number', 1),
-                'completed_at': datetime.now().isoformat()
-            }).execute()
+            result = quiz_attempt_insert_query(self.supabase, quiz_attempt_data).execute()
             
             # Update user's completed quizzes if passed
-            if quiz_attempt_data.get('passed', False):
+            if update_completion and quiz_attempt_data.get('passed', False):
                 self.update_user_quiz_completion(
                     quiz_attempt_data.get('user_id'),
                     quiz_attempt_data.get('quiz_id')
@@ -117,22 +340,17 @@ class SupabaseClient:
     def update_user_quiz_completion(self, user_id: str, quiz_id: str):
         """Update user's completed quizzes list"""
         try:
-            user = self.get_user_profile(user_id)
-            if user:
-                completed_quizzes = user.get('completed_quizzes', [])
-                if quiz_id not in completed_quizzes:
-                    completed_quizzes.append(quiz_id)
-                    
-                    self.supabase.table('user_profiles').update({
-                        'completed_quizzes': completed_quizzes
-                    }).eq('user_id', user_id).execute()
+            result = completed_quiz_call(self.supabase, user_id, quiz_id).execute()
+            
+            if result.data:
+                self._cache_profile(result.data[0])
         except Exception as e:
             print(f"Error updating quiz completion: {e}")
     
-    def get_user_quiz_attempts(self, user_id: str, quiz_id: str = None) -> List[Dict]:
-        """Get quiz attempts for a user"""
+    def get_user_quiz_attempts(self, user_id: str, quiz_id: str = None, fields: Optional[str] = None) -> List[Dict]:
+        """Get all quiz attempts for a user (see get_user_quiz_attempts_page for paging)"""
         try:
-            query = self.supabase.table('quiz_attempts').select('*').eq('user_id', user_id)
+            query = self.supabase.table('quiz_attempts').select(quiz_attempt_columns(fields)).eq('user_id', user_id)
             if quiz_id:
                 query = query.eq('quiz_id', quiz_id)
             
@@ -142,9 +360,36 @@ class SupabaseClient:
             print(f"Error getting quiz attempts: {e}")
             return []
     
+    def get_user_quiz_attempts_page(self, user_id: str, quiz_id: str = None, limit: int = 50,
+                                    cursor: Optional[str] = None, fields: Optional[str] = None) -> Dict:
+        """Get one keyset page of a user's quiz attempts, newest first, and the next cursor"""
+        # Bad cursors and field names are the caller's error, so let ValueError through
+        columns = quiz_attempt_columns(fields)
+        after = decode_cursor(cursor, QUIZ_ATTEMPT_CURSOR_FIELDS) if cursor else None
+        try:
+            result = quiz_attempts_page_query(self.supabase, user_id, quiz_id, columns, after, limit).execute()
+            return quiz_attempts_page(result.data, limit)
+        except Exception as e:
+            print(f"Error getting quiz attempts page: {e}")
+            return {'entries': [], 'next_cursor': None}
+    
+    def iter_user_quiz_attempts(self, user_id: str, quiz_id: str = None, fields: Optional[str] = None) -> Iterator[Dict]:
+        """Stream quiz attempts for a user, newest first, fetching page by page"""
+        columns = quiz_attempt_columns(fields)
+        
+        def make_query():
+            query = self.supabase.table('quiz_attempts').select(columns).eq('user_id', user_id)
+            if quiz_id:
+                query = query.eq('quiz_id', quiz_id)
+            return query
+        return iter_keyset(make_query, QUIZ_ATTEMPT_ORDER)
+    
     def get_leaderboard(self, limit: int = 100) -> List[Dict]:
         """Get leaderboard data"""
         try:
+            if self.leaderboard.ensure_seeded():
+                return self.leaderboard.top(limit)
+            
             result = self.supabase.table('user_profiles').select(
                 'user_id, username, total_exp, level, badges, learning_streak'
             ).order('total_exp', desc=True).limit(limit).execute()
@@ -154,28 +399,39 @@ class SupabaseClient:
             print(f"Error getting leaderboard: {e}")
             return []
     
+    def get_leaderboard_page(self, limit: int = 100, cursor: Optional[str] = None) -> Dict:
+        """Get one keyset page of the leaderboard and the cursor for the next page"""
+        # A malformed cursor is the caller's error, so let ValueError through
+        after = decode_cursor(cursor, CURSOR_FIELDS) if cursor else None
+        try:
+            if self.leaderboard.ensure_seeded():
+                return self.leaderboard.cursor_page(after, limit)
+            
+            result = leaderboard_page_query(self.supabase, after, limit).execute()
+            return self.leaderboard.rows_page(*split_page(result.data, limit))
+        except Exception as e:
+            print(f"Error getting leaderboard page: {e}")
+            return {'entries': [], 'next_cursor': None}
+    
+    def get_leaderboard_rank(self, user_id: str, radius: int = 0) -> Optional[Dict]:
+        """Get a user's leaderboard rank and the users ranked around them"""
+        try:
+            if not self.leaderboard.ensure_seeded():
+                return None
+            return self.leaderboard.ranking(user_id, radius)
+        except Exception as e:
+            print(f"Error getting leaderboard rank: {e}")
+            return None
+    
     def award_badge(self, user_id: str, badge_id: str, badge_name: str) -> bool:
         """Award a badge to a user"""
         try:
-            user = self.get_user_profile(user_id)
-            if user:
-                badges = user.get('badges', [])
-                badge_data = {
-                    'id': badge_id,
-                    'name': badge_name,
-                    'earned_at': datetime.now().isoformat()
-                }
-                
-                # Check if badge already exists
-                if not any(badge['id'] == badge_id for badge in badges):
-                    badges.append(badge_data)
-                    
-                    self.supabase.table('user_profiles').update({
-                        'badges': badges
-                    }).eq('user_id', user_id).execute()
-                    
-                    return True
-            return False
+            result = badge_call(self.supabase, user_id, badge_id, badge_name).execute()
+            
+            if not result.data:
+                return False
+            self._cache_profile(result.data[0])
+            return True
         except Exception as e:
             print(f"Error awarding badge: {e}")
             return False
@@ -187,31 +443,13 @@ class SupabaseClient:
             if not user:
                 return None
             
-            # Get quiz statistics
-            quiz_attempts = self.get_user_quiz_attempts(user_id)
-            total_quizzes = len(set(attempt['quiz_id'] for attempt in quiz_attempts))
-            passed_quizzes = len(user.get('completed_quizzes', []))
-            
-            # Get experience logs for activity
-            exp_logs = self.supabase.table('experience_logs').select('*').eq('user_id', user_id).execute()
-            total_activities = len(exp_logs.data) if exp_logs.data else 0
+            result = activity_counts_query(self.supabase, user_id).execute()
+            counts = result.data[0] if result.data else {}
             
-            return {
-                'user_id': user_id,
-                'username': user['username'],
-                'level': user['level'],
-                'total_exp': user['total_exp'],
-                'badges_count': len(user.get('badges', [])),
-                'completed_quizzes': passed_quizzes,
-                'total_quiz_attempts': len(quiz_attempts),
-                'quiz_success_rate': (passed_quizzes / total_quizzes * 100) if total_quizzes > 0 else 0,
-                'learning_streak': user.get('learning_streak', 0),
-                'total_activities': total_activities,
-                'last_active': user['last_active']
-            }
+            return build_user_stats(user, counts)
         except Exception as e:
             print(f"Error getting user stats: {e}")
             return None
 
-# Global instance
-supabase_client = SupabaseClient()
+# Global instance, built on first use so importing this module is cheap
+supabase_client = LazyProxy(SupabaseClient)
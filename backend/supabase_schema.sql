@@ -84,11 +84,14 @@ CREATE TABLE daily_streaks (
 -- Create indexes for better performance
 CREATE INDEX idx_user_profiles_user_id ON user_profiles(user_id);
 CREATE INDEX idx_user_profiles_total_exp ON user_profiles(total_exp DESC);
+CREATE INDEX idx_user_profiles_leaderboard ON user_profiles(total_exp DESC, created_at ASC, user_id ASC);
 CREATE INDEX idx_experience_logs_user_id ON experience_logs(user_id);
 CREATE INDEX idx_experience_logs_timestamp ON experience_logs(timestamp DESC);
 CREATE INDEX idx_quiz_attempts_user_id ON quiz_attempts(user_id);
 CREATE INDEX idx_quiz_attempts_quiz_id ON quiz_attempts(quiz_id);
+CREATE INDEX idx_quiz_attempts_user_quiz ON quiz_attempts(user_id, quiz_id);
 CREATE INDEX idx_quiz_attempts_completed_at ON quiz_attempts(completed_at DESC);
+CREATE INDEX idx_quiz_attempts_user_history ON quiz_attempts(user_id, completed_at DESC, id DESC);
 CREATE INDEX idx_learning_progress_user_id ON learning_progress(user_id);
 CREATE INDEX idx_learning_progress_content ON learning_progress(content_id, content_type);
 CREATE INDEX idx_user_achievements_user_id ON user_achievements(user_id);
@@ -186,6 +189,83 @@ CREATE TRIGGER update_level_on_exp_change
     BEFORE UPDATE ON user_profiles
     FOR EACH ROW EXECUTE FUNCTION update_user_level();
 
+-- Award experience atomically: increment XP, recompute level, append the
+-- experience log row and (optionally) a completed quiz in one round trip.
+-- The UPDATE takes a row lock, so concurrent awards never lose increments.
+-- Pass p_log => FALSE when the caller batches experience_logs inserts itself.
+CREATE OR REPLACE FUNCTION award_experience(
+    p_user_id TEXT,
+    p_exp_gained INTEGER,
+    p_activity_type TEXT,
+    p_completed_quiz_id TEXT DEFAULT NULL,
+    p_metadata JSONB DEFAULT '{}'::jsonb,
+    p_log BOOLEAN DEFAULT TRUE
+)
+RETURNS SETOF user_profiles AS $$
+DECLARE
+    updated_profile user_profiles;
+BEGIN
+    UPDATE user_profiles
+    SET total_exp = total_exp + p_exp_gained,
+        level = calculate_user_level(total_exp + p_exp_gained),
+        last_active = NOW(),
+        completed_quizzes = CASE
+            WHEN p_completed_quiz_id IS NULL OR p_completed_quiz_id = ANY(completed_quizzes)
+            THEN completed_quizzes
+            ELSE array_append(completed_quizzes, p_completed_quiz_id)
+        END
+    WHERE user_id = p_user_id
+    RETURNING * INTO updated_profile;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF p_log THEN
+        INSERT INTO experience_logs (user_id, exp_gained, activity_type, total_exp_after, metadata)
+        VALUES (p_user_id, p_exp_gained, p_activity_type, updated_profile.total_exp, p_metadata);
+    END IF;
+
+    RETURN NEXT updated_profile;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Append a completed quiz / badge under the UPDATE's row lock (instead of
+-- rewriting the whole array from a possibly stale copy). Each returns the
+-- profile only if something was added.
+CREATE OR REPLACE FUNCTION add_completed_quiz(p_user_id TEXT, p_quiz_id TEXT)
+RETURNS SETOF user_profiles AS $$
+    UPDATE user_profiles
+    SET completed_quizzes = array_append(completed_quizzes, p_quiz_id)
+    WHERE user_id = p_user_id
+      AND NOT (p_quiz_id = ANY(completed_quizzes))
+    RETURNING *;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION add_user_badge(p_user_id TEXT, p_badge JSONB)
+RETURNS SETOF user_profiles AS $$
+    UPDATE user_profiles
+    SET badges = COALESCE(badges, '[]'::jsonb) || jsonb_build_array(p_badge)
+    WHERE user_id = p_user_id
+      AND NOT COALESCE(badges, '[]'::jsonb) @> jsonb_build_array(jsonb_build_object('id', p_badge->'id'))
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Per-user activity counters for get_user_stats, computed server-side so the
+-- response is one small row however much history the user has. The counts
+-- are answered from the (user_id, ...) indexes without reading quiz answers.
+CREATE OR REPLACE FUNCTION user_activity_counts(p_user_id TEXT)
+RETURNS TABLE (
+    total_quiz_attempts BIGINT,
+    distinct_quizzes BIGINT,
+    total_activities BIGINT
+) AS $$
+    SELECT
+        (SELECT COUNT(*) FROM quiz_attempts WHERE user_id = p_user_id),
+        (SELECT COUNT(DISTINCT quiz_id) FROM quiz_attempts WHERE user_id = p_user_id),
+        (SELECT COUNT(*) FROM experience_logs WHERE user_id = p_user_id);
+$$ LANGUAGE sql STABLE;
+
 -- Create view for leaderboard
 CREATE VIEW leaderboard AS
 SELECT 
@@ -113,6 +113,6 @@ if __name__ == "__main__":
         print("❌ Some tests failed. Please check the errors above.")
         
     print("\n📚 Useful commands:")
-    print("   Start server: python app.py")
-    print("   Test API: curl http://localhost:5001/")
+    print("   Start server: python server.py")
+    print("   Test API: curl http://localhost:5000/edu/")
     print("   View schema: cat supabase_schema.sql")
@@ -0,0 +1,54 @@
+# conftest.py - Shared fixtures: every test gets its own in-memory SQLite database
+import os
+import sys
+
+import pytest
+
+# Before any backend module reads them (load_env() does not override)
+os.environ.update({
+    'STORAGE_BACKEND': 'sqlite',
+    'SQLITE_PATH': ':memory:',
+    'RATE_LIMIT_ENABLED': 'false',
+    'UPSTREAM_MAX_RETRIES': '0',
+    'EXP_LOG_DURABILITY': 'sync',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection import connection_pool
+from resilience import ResilienceConfig, UpstreamGuard
+from sqlite_backend import SqliteBackend
+from upstream import InstrumentedClient
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """A fresh database behind the same guard/instrumentation as production"""
+    client = InstrumentedClient(SqliteBackend(':memory:'), UpstreamGuard(ResilienceConfig(), enforce_timeouts=False))
+    monkeypatch.setattr(connection_pool, 'get_client', lambda: client)
+    return client
+
+
+@pytest.fixture
+def education_client(storage, monkeypatch):
+    """Flask test client for app.py, backed by a fresh SupabaseClient"""
+    import app as education_app
+    from supabase_client import SupabaseClient
+
+    client = SupabaseClient()
+    monkeypatch.setattr(education_app, 'supabase_client', client)
+    with education_app.app.test_client() as http:
+        http.backend = client
+        yield http
+
+
+@pytest.fixture
+def quiz_http(storage, monkeypatch):
+    """Flask test client for quiz_app.py, backed by a fresh QuizSupabaseClient"""
+    import quiz_app
+    from quiz_client import QuizSupabaseClient
+
+    client = QuizSupabaseClient()
+    monkeypatch.setattr(quiz_app, 'quiz_client', client)
+    with quiz_app.app.test_client() as http:
+        http.backend = client
+        yield http
@@ -0,0 +1,139 @@
+# test_education_api.py - app.py endpoints against the SQLite backend
+import json
+
+
+def create_user(http, user_id, username=None):
+    response = http.post('/api/user/profile', json={'user_id': user_id, 'username': username or user_id})
+    assert response.status_code == 201
+    return response.get_json()['data']
+
+
+def test_profile_round_trip(education_client):
+    create_user(education_client, 'alice')
+
+    response = education_client.get('/api/user/profile/alice')
+    assert response.status_code == 200
+    profile = response.get_json()['data']
+    assert profile['username'] == 'alice'
+    assert profile['total_exp'] == 0 and profile['level'] == 1
+
+    assert education_client.get('/api/user/profile/nobody').status_code == 404
+
+
+def test_experience_updates_level_and_stats(education_client):
+    create_user(education_client, 'alice')
+
+    response = education_client.post('/api/user/alice/experience', json={'exp_gained': 450, 'activity_type': 'lesson'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['total_exp'] == 450
+    assert response.get_json()['data']['level'] == 3
+
+    bad = education_client.post('/api/user/alice/experience', json={'exp_gained': 0})
+    assert bad.status_code == 400
+
+    stats = education_client.get('/api/user/alice/stats').get_json()['data']
+    assert stats['total_exp'] == 450
+    assert stats['total_activities'] == 1
+
+
+def test_quiz_attempt_awards_experience_and_completion(education_client):
+    create_user(education_client, 'alice')
+
+    response = education_client.post('/api/quiz/attempt', json={
+        'user_id': 'alice', 'quiz_id': 'q1', 'score': 8, 'max_score': 10, 'answers': [1, 2]
+    })
+    assert response.status_code == 201
+    assert response.get_json()['exp_gained'] == 50
+
+    profile = education_client.get('/api/user/profile/alice').get_json()['data']
+    assert profile['total_exp'] == 50
+    assert profile['completed_quizzes'] == ['q1']
+
+    missing = education_client.post('/api/quiz/attempt', json={'user_id': 'alice', 'quiz_id': 'q1'})
+    assert missing.status_code == 400
+
+
+def test_quiz_attempts_are_paged_by_cursor(education_client):
+    create_user(education_client, 'alice')
+    for score in range(5):
+        education_client.post('/api/quiz/attempt', json={
+            'user_id': 'alice', 'quiz_id': 'q1', 'score': score, 'max_score': 10, 'answers': []
+        })
+
+    seen = []
+    cursor = None
+    while True:
+        query = '?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        body = education_client.get(f'/api/user/alice/quiz-attempts{query}').get_json()
+        seen += [attempt['score'] for attempt in body['data']]
+        assert all('answers' not in attempt for attempt in body['data'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert seen == [4, 3, 2, 1, 0]
+
+    with_answers = education_client.get('/api/user/alice/quiz-attempts?limit=1&fields=score,answers').get_json()
+    assert 'answers' in with_answers['data'][0]
+
+    assert education_client.get('/api/user/alice/quiz-attempts?cursor=garbage').status_code == 400
+    assert education_client.get('/api/user/alice/quiz-attempts?fields=password').status_code == 400
+
+
+def test_quiz_attempts_stream_as_ndjson(education_client):
+    create_user(education_client, 'alice')
+    for score in range(3):
+        education_client.post('/api/quiz/attempt', json={
+            'user_id': 'alice', 'quiz_id': 'q1', 'score': score, 'max_score': 10, 'answers': []
+        })
+
+    response = education_client.get('/api/user/alice/quiz-attempts?format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data().splitlines()]
+    assert [row['score'] for row in rows] == [2, 1, 0]
+
+
+def test_leaderboard_pages_and_rank(education_client):
+    for user_id, exp in (('a', 300), ('b', 100), ('c', 200)):
+        create_user(education_client, user_id)
+        education_client.post(f'/api/user/{user_id}/experience', json={'exp_gained': exp})
+
+    first = education_client.get('/api/leaderboard?limit=2').get_json()
+    assert [entry['user_id'] for entry in first['data']] == ['a', 'c']
+    second = education_client.get(f"/api/leaderboard?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [entry['user_id'] for entry in second['data']] == ['b']
+    assert second['next_cursor'] is None
+
+    ranking = education_client.get('/api/leaderboard/rank/c?radius=1').get_json()['data']
+    assert ranking['rank'] == 2 and ranking['total'] == 3
+    assert [entry['user_id'] for entry in ranking['neighbors']] == ['a', 'c', 'b']
+
+    around = education_client.get('/api/leaderboard?around=b&radius=0').get_json()
+    assert around['rank'] == 3
+
+    assert education_client.get('/api/leaderboard/rank/nobody').status_code == 404
+
+
+def test_badges_are_awarded_once(education_client):
+    create_user(education_client, 'alice')
+
+    first = education_client.post('/api/user/alice/badge', json={'badge_id': 'starter', 'badge_name': 'Starter'})
+    assert first.status_code == 200
+    again = education_client.post('/api/user/alice/badge', json={'badge_id': 'starter', 'badge_name': 'Starter'})
+    assert again.status_code == 400
+
+    profile = education_client.get('/api/user/profile/alice').get_json()['data']
+    assert [badge['id'] for badge in profile['badges']] == ['starter']
+    assert profile['total_exp'] == 100
+
+
+def test_unavailable_storage_answers_503(education_client, monkeypatch):
+    import sqlite_backend
+
+    def down(self):
+        raise TimeoutError('storage down')
+
+    monkeypatch.setattr(sqlite_backend._Query, '_execute', down)
+    response = education_client.get('/api/user/profile/alice')
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
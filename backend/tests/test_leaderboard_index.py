@@ -0,0 +1,105 @@
+# test_leaderboard_index.py - leaderboard_index.py ranking and keyset pages
+import random
+
+from leaderboard_index import LeaderboardIndex, RankedSkipList
+from pagination import decode_cursor
+
+
+def make_index(rows):
+    index = LeaderboardIndex(lambda: rows, 'id', 'xp', fields=('id', 'xp'))
+    assert index.seed()
+    return index
+
+
+def user(user_id, xp, created_at='2024-01-01'):
+    return {'id': user_id, 'xp': xp, 'created_at': created_at}
+
+
+def test_skiplist_rank_and_select_match_sorted_order():
+    keys = random.Random(7).sample(range(10000), 500)
+    ranked = RankedSkipList()
+    for key in keys:
+        ranked.insert(key, str(key))
+    for key in keys[:100]:
+        ranked.remove(key)
+
+    expected = sorted(keys[100:])
+    assert len(ranked) == len(expected)
+    assert [key for key, _ in ranked.iter_from(0)] == expected
+    assert [key for key, _ in ranked.iter_from(250)] == expected[250:]
+    assert all(ranked.rank(key) == i for i, key in enumerate(expected))
+
+
+def test_ties_rank_earlier_signups_first():
+    index = make_index([user('b', 10, '2024-02-01'), user('a', 10, '2024-01-01'), user('c', 30)])
+    assert [entry['id'] for entry in index.top(3)] == ['c', 'a', 'b']
+    assert [entry['rank'] for entry in index.top(3)] == [1, 2, 3]
+
+
+def test_updates_move_users():
+    index = make_index([user('a', 10), user('b', 20)])
+    index.update({'id': 'a', 'xp': 50})
+    index.update(user('c', 5))
+
+    assert [entry['id'] for entry in index.top(10)] == ['a', 'b', 'c']
+    assert index.rank_of('c') == 3
+    assert index.rank_of('missing') is None
+
+
+def test_pages_walk_every_user_once():
+    rows = [user(f'u{i:03d}', i % 17) for i in range(100)]
+    index = make_index(rows)
+
+    seen, after = [], None
+    while True:
+        page = index.cursor_page(after, 7)
+        seen.extend(entry['id'] for entry in page['entries'])
+        if not page['next_cursor']:
+            break
+        after = decode_cursor(page['next_cursor'], ('xp', 'created_at', 'id'))
+    assert seen == [entry['id'] for entry in index.top(100)]
+
+
+def test_pages_stay_stable_when_users_above_the_cursor_move():
+    index = make_index([user(f'u{i}', 100 - i) for i in range(10)])
+    entries, after = index.page(None, 5)
+    index.update({'id': 'u9', 'xp': 1000})
+
+    rest, _ = index.page(after, 5)
+    assert [entry['id'] for entry in rest] == ['u5', 'u6', 'u7', 'u8']
+
+
+def test_around_returns_neighbors_and_next_cursor():
+    index = make_index([user(f'u{i}', 100 - i) for i in range(10)])
+    ranking = index.ranking('u4', 2)
+
+    assert ranking['rank'] == 5 and ranking['total'] == 10
+    assert [entry['id'] for entry in ranking['neighbors']] == ['u2', 'u3', 'u4', 'u5', 'u6']
+    assert ranking['entry']['id'] == 'u4'
+    assert decode_cursor(ranking['next_cursor'], ('id',))['id'] == 'u6'
+
+
+def test_failed_reseed_keeps_serving_the_previous_index():
+    rows = [user('a', 1)]
+    index = make_index(rows)
+
+    def failing_loader():
+        raise TimeoutError('upstream down')
+
+    index._loader = failing_loader
+    assert not index.seed()
+    assert index.seed_errors == 1
+    assert [entry['id'] for entry in index.top(1)] == ['a']
+
+
+def test_writes_during_a_reseed_survive_it():
+    index = LeaderboardIndex(None, 'id', 'xp', fields=('id', 'xp'))
+
+    def loader():
+        # A write lands while the snapshot is being read
+        index.update({'id': 'a', 'xp': 99})
+        return [user('a', 1), user('b', 2)]
+
+    index._loader = loader
+    assert index.seed()
+    assert [entry['id'] for entry in index.top(2)] == ['a', 'b']
@@ -0,0 +1,71 @@
+# test_pagination.py - pagination.py cursors and keyset helpers
+import pytest
+
+import pagination
+from pagination import decode_cursor, encode_cursor, iter_keyset, keyset_filter, split_page
+
+
+def test_cursor_round_trip():
+    position = {'xp': 120, 'created_at': '2024-01-01T00:00:00+00:00', 'id': 'a,b'}
+    cursor = encode_cursor(position)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, ('xp', 'created_at', 'id')) == position
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor!', encode_cursor({'xp': 1}), encode_cursor([1, 2])])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor, ('xp', 'id'))
+
+
+def test_keyset_filter_quotes_values():
+    order = [('xp', True), ('created_at', False), ('id', False)]
+    assert keyset_filter(order, [10, '2024-01-01T00:00:00', 'x"y']) == (
+        'xp.lt."10",'
+        'and(xp.eq."10",created_at.gt."2024-01-01T00:00:00"),'
+        'and(xp.eq."10",created_at.eq."2024-01-01T00:00:00",id.gt."x\\"y")'
+    )
+
+
+def test_split_page():
+    assert split_page([{'id': 1}, {'id': 2}, {'id': 3}], 2) == ([{'id': 1}, {'id': 2}], True)
+    assert split_page([{'id': 1}], 2) == ([{'id': 1}], False)
+    assert split_page(None, 2) == ([], False)
+
+
+class FakeQuery:
+    """Records the keyset calls and serves rows of a sorted list"""
+
+    def __init__(self, rows, filters):
+        self.rows = rows
+        self.filters = filters
+        self._limit = None
+
+    def or_(self, expression):
+        self.filters.append(expression)
+        after = int(expression.split('"')[1])
+        self.rows = [row for row in self.rows if row['id'] > after]
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def execute(self):
+        return type('Response', (), {'data': self.rows[:self._limit]})()
+
+
+def test_iter_keyset_yields_every_row_once():
+    rows = [{'id': i} for i in range(1, 12)]
+    filters = []
+    streamed = list(iter_keyset(lambda: FakeQuery(rows, filters), [('id', False)], page_size=5))
+
+    assert streamed == rows
+    assert filters == ['id.gt."5"', 'id.gt."10"']
+
+
+def test_iter_keyset_defaults_to_stream_page_size():
+    assert iter_keyset.__defaults__ == (pagination.STREAM_PAGE_SIZE,)
@@ -0,0 +1,67 @@
+# test_pricing.py - pricing.py Black-Scholes prices, Greeks and implied vol
+import math
+
+import numpy as np
+import pytest
+
+from pricing import black_scholes, implied_volatility, price_batch
+
+
+def test_matches_reference_price():
+    # Hull, Options, Futures and Other Derivatives, example 15.6
+    call = black_scholes(42, 40, 0.5, 0.2, 0.1, True)
+    put = black_scholes(42, 40, 0.5, 0.2, 0.1, False)
+    assert float(call['price']) == pytest.approx(4.76, abs=0.005)
+    assert float(put['price']) == pytest.approx(0.81, abs=0.005)
+
+
+def test_put_call_parity_with_dividends():
+    strikes = np.linspace(50, 150, 11)
+    call = black_scholes(100, strikes, 0.75, 0.3, 0.04, True, dividend=0.02, greeks=False)['price']
+    put = black_scholes(100, strikes, 0.75, 0.3, 0.04, False, dividend=0.02, greeks=False)['price']
+    parity = 100 * math.exp(-0.02 * 0.75) - strikes * math.exp(-0.04 * 0.75)
+    np.testing.assert_allclose(call - put, parity, atol=1e-6)
+
+
+def test_greek_signs_and_units():
+    call = black_scholes(100, 100, 1.0, 0.25, 0.05, True)
+    put = black_scholes(100, 100, 1.0, 0.25, 0.05, False)
+
+    assert 0 < call['delta'] < 1 and -1 < put['delta'] < 0
+    assert call['gamma'] == pytest.approx(put['gamma']) and call['gamma'] > 0
+    assert call['vega'] == pytest.approx(put['vega']) and call['vega'] > 0
+    assert call['theta'] < 0 and call['rho'] > 0 > put['rho']
+
+    # vega is per volatility point
+    bumped = black_scholes(100, 100, 1.0, 0.26, 0.05, True, greeks=False)['price']
+    assert float(bumped - call['price']) == pytest.approx(float(call['vega']), rel=0.01)
+
+
+def test_expired_options_are_worth_intrinsic_value():
+    result = black_scholes([90, 110], 100, 0.0, 0.3, 0.05, True)
+    np.testing.assert_allclose(result['price'], [0, 10])
+    np.testing.assert_allclose(result['delta'], [0, 1])
+    assert not np.isnan(result['gamma']).any()
+
+
+def test_implied_volatility_recovers_the_input():
+    price = black_scholes(100, [80, 100, 120], 0.5, 0.35, 0.03, True, greeks=False)['price']
+    result = implied_volatility(price, 100, [80, 100, 120], 0.5, 0.03, True)
+    assert result['converged'].all()
+    np.testing.assert_allclose(result['implied_vol'], 0.35, atol=1e-6)
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'spot': -1}, 'spot and strike must be positive'),
+    ({'vol': -0.1}, 'vol must not be negative'),
+    ({'option_type': 'straddle'}, "Option type must be 'call' or 'put'"),
+])
+def test_invalid_inputs_raise_value_error(kwargs, message):
+    args = {'spot': 100, 'strike': 100, 't': 1, 'vol': 0.2, 'rate': 0.01, 'option_type': 'call', **kwargs}
+    with pytest.raises(ValueError, match=message):
+        price_batch(**args)
+
+
+def test_batch_size_is_capped():
+    with pytest.raises(ValueError, match='Batch too large'):
+        price_batch(100, np.arange(1, 12), 1, 0.2, 0.01, 'call', max_size=10)
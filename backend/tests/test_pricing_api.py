@@ -0,0 +1,49 @@
+# test_pricing_api.py - pricing_api.py request validation
+import pytest
+
+
+@pytest.fixture
+def pricing_http():
+    import server
+
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('leg', [
+    {'type': 'call', 'action': 'buy', 'strike': 'nan', 'quantity': 1},
+    {'type': 'call', 'action': 'buy', 'strike': 100, 'quantity': 'inf'},
+    {'type': 'put', 'action': 'sell', 'strike': 100, 'quantity': 1, 'premium': '-inf'},
+    {'type': 'put', 'action': 'sell', 'strike': 100, 'quantity': 1, 'premium': '1e400'},
+])
+@pytest.mark.parametrize('path', ['/api/pricing/pl-surface', '/api/pricing/monte-carlo'])
+def test_non_finite_legs_are_rejected(pricing_http, path, leg):
+    response = pricing_http.post(path, json={'legs': [leg], 'paths': 1000})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "Leg strike, quantity and premium must be finite numbers"
+
+
+def test_custom_legs_build_a_surface(pricing_http):
+    response = pricing_http.post('/api/pricing/pl-surface', json={
+        'legs': [{'type': 'call', 'action': 'buy', 'strike': 100, 'quantity': 1, 'premium': 2.5}],
+        'price_steps': 11, 'time_steps': 3
+    })
+    assert response.status_code == 200
+    assert response.get_json()['data']['max_loss'] == pytest.approx(-250)
+
+
+@pytest.mark.parametrize('greeks, status, fields', [
+    (True, 200, {'price', 'delta', 'gamma', 'theta', 'vega', 'rho'}),
+    (False, 200, {'price'}),
+    ('false', 400, None),
+    (0, 400, None),
+    (None, 400, None),
+])
+def test_greeks_flag_must_be_a_boolean(pricing_http, greeks, status, fields):
+    response = pricing_http.post('/api/pricing/batch', json={
+        'spot': 100, 'strike': [95, 105], 't': 0.5, 'vol': 0.2, 'rate': 0.03, 'greeks': greeks
+    })
+    assert response.status_code == status
+    if fields:
+        assert set(response.get_json()['data']) == fields
+    else:
+        assert response.get_json()['message'] == 'greeks must be true or false'
@@ -0,0 +1,165 @@
+# test_quiz_api.py - quiz_app.py endpoints against the SQLite backend
+import json
+import threading
+import uuid
+
+import pytest
+
+
+def create_user(http, username='trader'):
+    user_id = str(uuid.uuid4())
+    response = http.post('/api/users/profile', json={'user_id': user_id, 'username': username})
+    assert response.status_code == 201
+    return user_id
+
+
+@pytest.fixture
+def quiz(quiz_http):
+    """The first sample quiz"""
+    return quiz_http.get('/api/quizzes').get_json()['data'][0]
+
+
+def test_quizzes_are_listed_and_filtered(quiz_http):
+    quizzes = quiz_http.get('/api/quizzes').get_json()['data']
+    assert quizzes
+    easy = quiz_http.get('/api/quizzes?difficulty=easy').get_json()['data']
+    assert easy and all(q['difficulty'] == 'easy' for q in easy)
+
+    assert quiz_http.get(f"/api/quizzes/{quizzes[0]['id']}").status_code == 200
+    assert quiz_http.get('/api/quizzes/99999').status_code == 404
+
+
+def test_created_quiz_is_served_from_the_catalog(quiz_http):
+    response = quiz_http.post('/api/quizzes', json={
+        'question': 'What is theta?', 'choices': ['Time decay', 'Volatility'],
+        'correct_choice': 0, 'xp_reward': 15, 'difficulty': 'medium'
+    })
+    assert response.status_code == 201
+    quiz_id = response.get_json()['data']['id']
+    assert quiz_http.get(f'/api/quizzes/{quiz_id}').get_json()['data']['question'] == 'What is theta?'
+
+    invalid = quiz_http.post('/api/quizzes', json={
+        'question': 'q', 'choices': ['a', 'b'], 'correct_choice': 2, 'xp_reward': 1, 'difficulty': 'easy'
+    })
+    assert invalid.status_code == 400
+
+
+def test_first_correct_answer_earns_xp_once(quiz_http, quiz):
+    user_id = create_user(quiz_http)
+    path = f"/api/users/{user_id}/quiz/{quiz['id']}/answer"
+    wrong = (quiz['correct_choice'] + 1) % len(quiz['choices'])
+
+    assert quiz_http.post(path, json={'selected_choice': wrong}).get_json()['xp_earned'] == 0
+    first = quiz_http.post(path, json={'selected_choice': quiz['correct_choice']}).get_json()
+    assert first['correct'] and first['xp_earned'] == quiz['xp_reward']
+    assert quiz_http.post(path, json={'selected_choice': quiz['correct_choice']}).get_json()['xp_earned'] == 0
+
+    progress = quiz_http.get(f"/api/users/{user_id}/quiz/{quiz['id']}/progress").get_json()['data']
+    assert progress['attempts'] == 3 and progress['best_score'] == 1
+    assert progress['earned_xp'] == quiz['xp_reward']
+    assert quiz_http.get(f'/api/users/{user_id}/profile').get_json()['data']['total_xp'] == quiz['xp_reward']
+
+
+def test_batch_answers_grade_in_one_call(quiz_http, quiz):
+    user_id = create_user(quiz_http)
+    answers = [
+        {'quiz_id': quiz['id'], 'selected_choice': quiz['correct_choice']},
+        {'quiz_id': 99999, 'selected_choice': 0},
+        {'quiz_id': quiz['id'], 'selected_choice': quiz['correct_choice']},
+    ]
+
+    body = quiz_http.post(f'/api/users/{user_id}/quiz/answers', json={'answers': answers}).get_json()
+    assert body['success']
+    assert [result.get('xp_earned') for result in body['results']] == [quiz['xp_reward'], None, 0]
+    assert body['results'][1]['message'] == 'Quiz not found'
+    assert body['xp_earned'] == quiz['xp_reward']
+
+
+def test_concurrent_batches_award_xp_once(quiz_http, quiz):
+    import quiz_app
+
+    user_id = create_user(quiz_http)
+    answer = {'answers': [{'quiz_id': quiz['id'], 'selected_choice': quiz['correct_choice']}]}
+
+    def submit():
+        quiz_app.app.test_client().post(f'/api/users/{user_id}/quiz/answers', json=answer)
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert quiz_http.get(f'/api/users/{user_id}/profile').get_json()['data']['total_xp'] == quiz['xp_reward']
+    progress = quiz_http.get(f"/api/users/{user_id}/quiz/{quiz['id']}/progress").get_json()['data']
+    assert progress['attempts'] == 8
+
+
+@pytest.mark.parametrize('answers, message', [
+    ([], 'answers must be a non-empty list'),
+    ([{'quiz_id': 1}], 'Each answer requires quiz_id and selected_choice'),
+    ([{'quiz_id': True, 'selected_choice': 0}], 'quiz_id must be an integer'),
+    ([{'quiz_id': '1', 'selected_choice': 0}], 'quiz_id must be an integer'),
+    ([{'quiz_id': 1, 'selected_choice': 0}] * 101, 'At most 100 answers can be submitted at once'),
+])
+def test_batch_answers_are_validated(quiz_http, answers, message):
+    response = quiz_http.post('/api/users/someone/quiz/answers', json={'answers': answers})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == message
+
+
+def test_batch_answers_for_unknown_user_fail(quiz_http, quiz):
+    response = quiz_http.post(f'/api/users/{uuid.uuid4()}/quiz/answers', json={
+        'answers': [{'quiz_id': quiz['id'], 'selected_choice': 0}]
+    })
+    assert response.status_code == 400
+    assert not response.get_json()['success']
+
+
+def test_batch_answers_spend_a_token_per_answer(quiz_http, quiz, monkeypatch):
+    import rate_limit
+
+    monkeypatch.setattr(rate_limit, 'rate_limiter', rate_limit.RateLimiter(
+        rate_limit.MemoryBucketStore(), {'answer': (0.001, 5)}))
+    user_id = create_user(quiz_http)
+    answers = {'answers': [{'quiz_id': quiz['id'], 'selected_choice': 0}] * 4}
+
+    assert quiz_http.post(f'/api/users/{user_id}/quiz/answers', json=answers).status_code == 200
+    limited = quiz_http.post(f'/api/users/{user_id}/quiz/answers', json=answers)
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+
+
+def test_balance_never_goes_negative(quiz_http):
+    user_id = create_user(quiz_http)
+    assert quiz_http.post(f'/api/users/{user_id}/balance', json={'amount': 50}).get_json()['data']['balance'] == 50
+    assert quiz_http.post(f'/api/users/{user_id}/balance', json={'amount': -80}).get_json()['data']['balance'] == 0
+    assert quiz_http.post(f'/api/users/{user_id}/balance', json={}).status_code == 400
+
+
+def test_leaderboard_follows_xp_writes(quiz_http, quiz):
+    leader = create_user(quiz_http, 'leader')
+    other = create_user(quiz_http, 'other')
+    quiz_http.post(f"/api/users/{leader}/quiz/{quiz['id']}/answer", json={'selected_choice': quiz['correct_choice']})
+
+    board = quiz_http.get('/api/leaderboard?limit=1').get_json()
+    assert [entry['username'] for entry in board['data']] == ['leader']
+    rest = quiz_http.get(f"/api/leaderboard?limit=1&cursor={board['next_cursor']}").get_json()
+    assert [entry['username'] for entry in rest['data']] == ['other']
+
+    ranking = quiz_http.get(f'/api/leaderboard/rank/{other}').get_json()['data']
+    assert ranking['rank'] == 2 and ranking['total'] == 2
+
+
+def test_progress_and_statistics_stream_as_ndjson(quiz_http, quiz):
+    user_id = create_user(quiz_http)
+    quiz_http.post(f"/api/users/{user_id}/quiz/{quiz['id']}/answer", json={'selected_choice': 0})
+
+    progress = quiz_http.get(f'/api/users/{user_id}/quiz-progress', headers={'Accept': 'application/x-ndjson'})
+    rows = [json.loads(line) for line in progress.get_data().splitlines()]
+    assert [row['quiz_id'] for row in rows] == [quiz['id']]
+    assert rows[0]['quizzes']['question'] == quiz['question']
+
+    stats = quiz_http.get('/api/quiz-statistics?format=ndjson')
+    ids = [json.loads(line)['id'] for line in stats.get_data().splitlines()]
+    assert ids == sorted(ids) and quiz['id'] in ids
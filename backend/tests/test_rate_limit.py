@@ -0,0 +1,58 @@
+# test_rate_limit.py - rate_limit.py token buckets
+import pytest
+
+from rate_limit import MemoryBucketStore, RateLimiter, SharedBucketStore
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SharedBucketStore(str(tmp_path / 'buckets'), slots=64)
+
+
+def test_burst_then_wait(store):
+    for _ in range(3):
+        assert store.take('user', 1.0, 3) == 0
+    assert store.take('user', 1.0, 3) == pytest.approx(1.0, abs=0.05)
+    # Other users have their own bucket
+    assert store.take('other', 1.0, 3) == 0
+
+
+def test_refill_admits_again(store, monkeypatch):
+    import rate_limit
+
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    for _ in range(2):
+        store.take('user', 2.0, 2)
+    assert store.take('user', 2.0, 2) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert store.take('user', 2.0, 2) == 0
+
+
+def test_cost_larger_than_burst_leaves_debt(store, monkeypatch):
+    import rate_limit
+
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    assert store.take('user', 1.0, 10, cost=25) == 0
+    # 15 tokens of debt plus one for the next request
+    assert store.take('user', 1.0, 10) == pytest.approx(16.0)
+
+
+def test_shared_buckets_are_seen_by_every_store(tmp_path):
+    path = str(tmp_path / 'buckets')
+    first, second = SharedBucketStore(path, slots=64), SharedBucketStore(path, slots=64)
+    assert first.take('user', 1.0, 1) == 0
+    assert second.take('user', 1.0, 1) > 0
+
+
+def test_limiter_checks_configured_classes_only():
+    limiter = RateLimiter(MemoryBucketStore(), {'answer': (1.0, 1)})
+    assert limiter.check('answer', 'user') == 0
+    assert limiter.check('answer', 'user') > 0
+    assert limiter.check('unknown', 'user') == 0
+
+    disabled = RateLimiter(MemoryBucketStore(), {'answer': (1.0, 1)}, enabled=False)
+    assert all(disabled.check('answer', 'user') == 0 for _ in range(5))
@@ -0,0 +1,105 @@
+# test_resilience.py - resilience.py circuit breaker and upstream guard
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, ResilienceConfig, UpstreamGuard, UpstreamUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(10)
+
+
+def test_breaker_lets_one_probe_through_after_reset(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.opened == 2
+
+
+def make_guard(retries=2):
+    config = ResilienceConfig()
+    config.max_retries = retries
+    config.backoff_base = config.backoff_max = 0
+    config.breaker_threshold = 10
+    return UpstreamGuard(config, enforce_timeouts=False)
+
+
+def flaky(failures):
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise TimeoutError('timed out')
+        return 'ok'
+
+    return attempt, calls
+
+
+def test_guard_retries_reads():
+    attempt, calls = flaky(2)
+    assert make_guard().call(attempt, 'users_profile', 'select') == 'ok'
+    assert len(calls) == 3
+
+
+def test_guard_does_not_retry_writes():
+    attempt, calls = flaky(1)
+    with pytest.raises(UpstreamUnavailable):
+        make_guard().call(attempt, 'users_profile', 'update')
+    assert len(calls) == 1
+
+
+def test_guard_passes_non_transient_errors_through():
+    guard = make_guard()
+
+    def attempt():
+        raise KeyError('constraint')
+
+    with pytest.raises(KeyError):
+        guard.call(attempt, 'users_profile', 'insert')
+    assert guard.breaker.state == 'closed'
+
+
+def test_open_breaker_rejects_without_calling():
+    guard = make_guard(retries=0)
+    guard.breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    attempt, calls = flaky(5)
+
+    with pytest.raises(UpstreamUnavailable):
+        guard.call(attempt, 'users_profile', 'select')
+    with pytest.raises(UpstreamUnavailable) as rejected:
+        guard.call(attempt, 'users_profile', 'select')
+    assert len(calls) == 1
+    assert rejected.value.retry_after > 0
@@ -0,0 +1,35 @@
+# test_risk_api.py - risk_api.py portfolio request validation
+import pytest
+
+
+@pytest.fixture
+def risk_http():
+    import server
+
+    return server.app.test_client()
+
+
+def test_portfolio_risk(risk_http):
+    response = risk_http.post('/api/risk/portfolio', json={
+        'positions': {'value': [5000, 3000], 'risk': [100, 300], 'symbol': ['AAPL', 'MSFT']},
+        'account_value': [10000, 20000]
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['data']['risk_percentage'] == [4.0, 2.0]
+    assert body['positions']['risk_share'] == [0.25, 0.75]
+
+
+@pytest.mark.parametrize('positions, message', [
+    ([1, 2], 'positions must be an object with value and risk lists'),
+    ({'value': 5000, 'risk': [100]}, 'positions.value must be a list of numbers'),
+    ({'value': 'abc', 'risk': [100]}, 'positions.value must be a list of numbers'),
+    ({'value': [5000]}, 'positions.risk must be a list of numbers'),
+    ({'value': [5000], 'risk': ['100']}, 'positions.risk must be a list of numbers'),
+    ({'value': [5000], 'risk': [True]}, 'positions.risk must be a list of numbers'),
+    ({'value': [5000], 'risk': [100], 'symbol': 'AAPL'}, 'positions.symbol must be a list'),
+])
+def test_portfolio_fields_are_named_when_invalid(risk_http, positions, message):
+    response = risk_http.post('/api/risk/portfolio', json={'positions': positions, 'account_value': 10000})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == message
@@ -0,0 +1,31 @@
+# test_server.py - server.py readiness probe
+import threading
+
+
+def test_readyz_answers_while_caches_warm_in_the_background(monkeypatch):
+    import server
+
+    began, release = threading.Event(), threading.Event()
+    started = []
+
+    def slow_warm_caches(force=False):
+        started.append(1)
+        began.set()
+        release.wait(5)
+
+    monkeypatch.setattr(server, 'cache_status', lambda: {'quiz_catalog': False})
+    monkeypatch.setattr(server, 'warm_caches', slow_warm_caches)
+    http = server.app.test_client()
+
+    try:
+        for _ in range(3):
+            response = http.get('/readyz')
+            assert response.status_code == 503
+            assert response.get_json()['data'] == {'quiz_catalog': False}
+        assert began.wait(5)
+        assert len(started) == 1
+    finally:
+        release.set()
+
+    monkeypatch.setattr(server, 'cache_status', lambda: {'quiz_catalog': True})
+    assert http.get('/readyz').status_code == 200
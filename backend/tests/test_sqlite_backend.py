@@ -0,0 +1,105 @@
+# test_sqlite_backend.py - the PostgREST filters the clients generate, run through sqlite_backend
+import pytest
+
+import quiz_client
+import supabase_client
+from leaderboard_index import CURSOR_FIELDS
+from pagination import keyset_filter
+from sqlite_backend import SqliteBackend
+
+# Ids with the characters PostgREST filter values must quote
+AWKWARD_IDS = ['plain', 'with,comma', 'with.dot', 'with(paren)', 'with"quote', 'with\\slash', 'with:colon']
+
+
+@pytest.fixture
+def db():
+    backend = SqliteBackend(':memory:', seed_quizzes=False)
+    yield backend
+    backend.close()
+
+
+def walk(make_query, fields, limit):
+    """Every row reached by following keyset pages of `limit` rows"""
+    rows, after = [], None
+    while True:
+        page = make_query(after, limit).execute().data
+        rows.extend(page[:limit])
+        if len(page) <= limit:
+            return rows
+        after = {field: page[limit - 1][field] for field in fields}
+
+
+def test_keyset_filter_compares_quoted_numbers_as_numbers(db):
+    db.table('users_profile').insert([{'username': f'u{xp}', 'total_xp': xp} for xp in (9, 10, 100, 2)]).execute()
+    rows = db.table('users_profile').select('username').or_(
+        keyset_filter([('total_xp', True)], [10])).order('total_xp', desc=True).execute().data
+    assert [row['username'] for row in rows] == ['u9', 'u2']
+
+
+def test_keyset_filter_matches_awkward_values_exactly(db):
+    db.table('user_profiles').insert([
+        {'user_id': user_id, 'username': user_id} for user_id in AWKWARD_IDS
+    ]).execute()
+    for user_id in AWKWARD_IDS:
+        rows = db.table('user_profiles').select('user_id').or_(
+            keyset_filter([('user_id', False)], [user_id])).execute().data
+        assert sorted(row['user_id'] for row in rows) == sorted(i for i in AWKWARD_IDS if i > user_id)
+
+
+def test_education_leaderboard_pages_cover_every_profile_once(db):
+    # Ties on XP and on created_at exercise every clause of the filter
+    db.table('user_profiles').insert([
+        {'user_id': user_id, 'username': user_id, 'total_exp': (i % 3) * 50,
+         'created_at': f'2024-01-0{i % 2 + 1}T00:00:00+00:00'}
+        for i, user_id in enumerate(AWKWARD_IDS + [f'user-{n}' for n in range(13)])
+    ]).execute()
+    expected = db.table('user_profiles').select('user_id').order('total_exp', desc=True) \
+        .order('created_at').order('user_id').execute().data
+
+    def page(after, limit):
+        position = {'xp': after['total_exp'], 'created_at': after['created_at'], 'id': after['user_id']} \
+            if after else None
+        return supabase_client.leaderboard_page_query(db, position, limit)
+
+    for limit in (1, 3, 7):
+        rows = walk(page, ('total_exp', 'created_at', 'user_id'), limit)
+        assert [row['user_id'] for row in rows] == [row['user_id'] for row in expected]
+
+
+def test_quiz_leaderboard_pages_follow_index_cursors(db):
+    db.table('users_profile').insert([
+        {'username': f'user-{n}', 'total_xp': (n % 4) * 10, 'created_at': '2024-01-01T00:00:00+00:00'}
+        for n in range(20)
+    ]).execute()
+    index = quiz_client.new_leaderboard_index(
+        lambda: quiz_client.leaderboard_rows_query(db).execute().data)
+    index.seed()
+
+    # Positions produced by the in-memory index seek the same rows in the database
+    entries, after = index.page(None, 6)
+    while after:
+        rows = quiz_client.leaderboard_page_query(db, after, 6).execute().data[:6]
+        expected, after = index.page(after, 6)
+        assert [row['username'] for row in rows] == [entry['username'] for entry in expected]
+        assert set(after or {}) <= set(CURSOR_FIELDS)
+
+
+def test_quiz_attempt_pages_are_newest_first_without_gaps(db):
+    db.table('user_profiles').insert({'user_id': 'u', 'username': 'u'}).execute()
+    db.table('quiz_attempts').insert([
+        {'user_id': 'u', 'quiz_id': f'q{n % 3}', 'score': n, 'max_score': 10, 'percentage': n * 10,
+         'answers': [], 'completed_at': f'2024-01-01T00:00:0{n % 4}+00:00'}
+        for n in range(15)
+    ]).execute()
+    columns = supabase_client.quiz_attempt_columns('score')
+
+    def page(after, limit):
+        return supabase_client.quiz_attempts_page_query(db, 'u', None, columns, after, limit)
+
+    rows = walk(page, supabase_client.QUIZ_ATTEMPT_CURSOR_FIELDS, 4)
+    assert sorted(row['score'] for row in rows) == list(range(15))
+    assert [(row['completed_at'], row['id']) for row in rows] == sorted(
+        ((row['completed_at'], row['id']) for row in rows), reverse=True)
+
+    only_q1 = supabase_client.quiz_attempts_page_query(db, 'u', 'q1', columns, None, 50).execute().data
+    assert sorted(row['score'] for row in only_q1) == [1, 4, 7, 10, 13]
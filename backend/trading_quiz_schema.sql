@@ -42,6 +42,7 @@ CREATE INDEX idx_quizzes_difficulty ON quizzes(difficulty);
 CREATE INDEX idx_quizzes_created_at ON quizzes(created_at DESC);
 CREATE INDEX idx_users_profile_username ON users_profile(username);
 CREATE INDEX idx_users_profile_total_xp ON users_profile(total_xp DESC);
+CREATE INDEX idx_users_profile_leaderboard ON users_profile(total_xp DESC, created_at ASC, id ASC);
 CREATE INDEX idx_users_profile_level ON users_profile(level DESC);
 CREATE INDEX idx_user_quiz_progress_user_id ON user_quiz_progress(user_id);
 CREATE INDEX idx_user_quiz_progress_quiz_id ON user_quiz_progress(quiz_id);
@@ -106,6 +107,76 @@ CREATE TRIGGER trigger_insert_user_level
     FOR EACH ROW
     EXECUTE FUNCTION update_user_level();
 
+-- Atomically add XP to a user and return the updated profile
+-- (the level trigger recomputes level on the same UPDATE)
+CREATE OR REPLACE FUNCTION add_user_xp(p_user_id UUID, p_xp INTEGER)
+RETURNS SETOF users_profile AS $$
+    UPDATE users_profile
+    SET total_xp = total_xp + p_xp
+    WHERE id = p_user_id
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Grade a batch of answers ({"quiz_id", "correct", "xp_reward"}) in one
+-- transaction: progress rows are locked while updated and the XP delta is
+-- applied with them, so only the first correct answer for a quiz earns XP
+CREATE OR REPLACE FUNCTION submit_quiz_answers(p_user_id UUID, p_answers JSONB)
+RETURNS TABLE (answer_index INTEGER, quiz_id BIGINT, xp_earned INTEGER, total_xp INTEGER, level INTEGER) AS $$
+DECLARE
+    v_answer JSONB;
+    v_index BIGINT;
+    v_quiz_id BIGINT;
+    v_correct BOOLEAN;
+    v_best_score INTEGER;
+    v_xp INTEGER;
+    v_total INTEGER := 0;
+    v_earned INTEGER[] := '{}';
+    v_total_xp INTEGER;
+    v_level INTEGER;
+BEGIN
+    -- Lock the profile first so concurrent batches for a user serialize
+    PERFORM 1 FROM users_profile WHERE id = p_user_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    FOR v_answer, v_index IN SELECT * FROM jsonb_array_elements(p_answers) WITH ORDINALITY LOOP
+        v_quiz_id := (v_answer->>'quiz_id')::BIGINT;
+        v_correct := (v_answer->>'correct')::BOOLEAN;
+
+        INSERT INTO user_quiz_progress (user_id, quiz_id, attempts, best_score, earned_xp)
+        VALUES (p_user_id, v_quiz_id, 0, 0, 0)
+        ON CONFLICT (user_id, quiz_id) DO NOTHING;
+
+        SELECT uqp.best_score INTO v_best_score
+        FROM user_quiz_progress uqp
+        WHERE uqp.user_id = p_user_id AND uqp.quiz_id = v_quiz_id
+        FOR UPDATE;
+
+        v_xp := CASE WHEN v_correct AND v_best_score = 0 THEN (v_answer->>'xp_reward')::INTEGER ELSE 0 END;
+        v_total := v_total + v_xp;
+        v_earned := array_append(v_earned, v_xp);
+
+        UPDATE user_quiz_progress uqp
+        SET attempts = uqp.attempts + 1,
+            best_score = GREATEST(uqp.best_score, CASE WHEN v_correct THEN 1 ELSE 0 END),
+            earned_xp = uqp.earned_xp + v_xp,
+            last_attempted = NOW()
+        WHERE uqp.user_id = p_user_id AND uqp.quiz_id = v_quiz_id;
+    END LOOP;
+
+    -- The level trigger recomputes level on this UPDATE
+    UPDATE users_profile up
+    SET total_xp = up.total_xp + v_total
+    WHERE up.id = p_user_id
+    RETURNING up.total_xp, up.level INTO v_total_xp, v_level;
+
+    RETURN QUERY
+    SELECT (e.i - 1)::INTEGER, (p_answers->(e.i::INTEGER - 1)->>'quiz_id')::BIGINT, e.xp, v_total_xp, v_level
+    FROM unnest(v_earned) WITH ORDINALITY AS e(xp, i);
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create a view for leaderboard
 CREATE VIEW leaderboard AS
 SELECT 
@@ -0,0 +1,61 @@
+# transport.py - httpx transports used by the shared Supabase connection pool
+#
+# Imported lazily by connection.py so that httpx is only loaded once a
+# Supabase client is actually built.
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import httpx
+
+# Per-call timeout override in seconds (see connection.call_timeout)
+call_timeout_override: ContextVar[Optional[float]] = ContextVar('supabase_call_timeout', default=None)
+
+
+def _apply_call_timeout(request: httpx.Request) -> None:
+    override = call_timeout_override.get()
+    if override is not None:
+        request.extensions = {**request.extensions, 'timeout': httpx.Timeout(override).as_dict()}
+
+
+def connection_counts(transport) -> Dict:
+    """Open/idle connection counts from the underlying httpcore pool"""
+    try:
+        connections = transport._pool.connections
+    except AttributeError:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {'connections': len(connections), 'idle_connections': idle}
+
+
+class PooledTransport(httpx.HTTPTransport):
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _apply_call_timeout(request)
+        self.stats.started()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.finished(failed)
+
+
+class AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _apply_call_timeout(request)
+        self.stats.started()
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.finished(failed)
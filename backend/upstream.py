@@ -0,0 +1,103 @@
+# upstream.py - Instrumented wrapper around the storage client
+#
+# Both backend clients only talk to storage through `client.table(...)` query
+# builders and `client.rpc(...)`, each finished by `.execute()`. Wrapping the
+# client returned by the connection pool therefore lets every storage round
+# trip be timed and attributed to a table and operation (select, insert,
+# update, upsert, delete or rpc) in one place, for Supabase and SQLite alike.
+# The same place runs each call under the deadline/retry/circuit-breaker
+# policy from resilience.py.
+import time
+from typing import Any, Optional
+
+from metrics import record_upstream_call
+from resilience import UpstreamGuard
+
+_OPERATIONS = ('select', 'insert', 'update', 'upsert', 'delete')
+
+
+class InstrumentedQuery:
+    """Query builder proxy that remembers the operation and times execute()"""
+
+    __slots__ = ('_builder', '_table', '_operation', '_guard', '_asynchronous')
+
+    def __init__(self, builder: Any, table: str, operation: str,
+                 guard: Optional[UpstreamGuard] = None, asynchronous: bool = False):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._guard = guard
+        self._asynchronous = asynchronous
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+        operation = name if name in _OPERATIONS else self._operation
+
+        def chained(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            # Builders return new (or the same) builder objects; keep wrapping them
+            if hasattr(result, 'execute'):
+                return InstrumentedQuery(result, self._table, operation, self._guard, self._asynchronous)
+            return result
+
+        return chained
+
+    def execute(self):
+        if self._asynchronous:
+            if self._guard is None:
+                return self._execute_once_async()
+            return self._guard.call_async(self._execute_once_async, self._table, self._operation)
+        if self._guard is None:
+            return self._execute_once()
+        return self._guard.call(self._execute_once, self._table, self._operation)
+
+    def _execute_once(self):
+        started = time.perf_counter()
+        try:
+            result = self._builder.execute()
+        except Exception as e:
+            record_upstream_call(self._table, self._operation, time.perf_counter() - started, type(e).__name__)
+            raise
+        record_upstream_call(self._table, self._operation, time.perf_counter() - started)
+        return result
+
+    async def _execute_once_async(self):
+        started = time.perf_counter()
+        try:
+            result = await self._builder.execute()
+        except Exception as e:
+            record_upstream_call(self._table, self._operation, time.perf_counter() - started, type(e).__name__)
+            raise
+        record_upstream_call(self._table, self._operation, time.perf_counter() - started)
+        return result
+
+
+class InstrumentedClient:
+    """Storage client proxy whose table()/rpc() calls are timed and guarded"""
+
+    def __init__(self, client: Any, guard: Optional[UpstreamGuard] = None, asynchronous: bool = False):
+        self._client = client
+        self._guard = guard
+        self._asynchronous = asynchronous
+
+    @property
+    def wrapped(self) -> Any:
+        return self._client
+
+    def rebind(self, client: Any) -> None:
+        """Point this proxy (and everything holding it) at a new underlying client"""
+        self._client = client
+
+    def table(self, name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.table(name), name, 'select', self._guard, self._asynchronous)
+
+    def from_(self, name: str) -> InstrumentedQuery:
+        return self.table(name)
+
+    def rpc(self, fn: str, params=None, **kwargs) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.rpc(fn, params, **kwargs), fn, 'rpc', self._guard, self._asynchronous)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
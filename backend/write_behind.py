@@ -0,0 +1,176 @@
+# write_behind.py - Batched, asynchronous inserts for append-only rows
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class WriteBehindBuffer:
+    """Queue rows in memory and write them in bulk from a background thread.
+
+    A batch is flushed as soon as `batch_size` rows are queued or the oldest
+    queued row is `flush_interval` seconds old, whichever comes first. At most
+    `max_pending` rows are held: when the buffer is full, `put` blocks for up
+    to `put_timeout` seconds and then writes the row itself, so a slow
+    database pushes back on callers instead of growing memory or losing rows.
+    Failed batches are retried on the next flush; rows only get dropped (and
+    counted) if a retry would overflow `max_pending`.
+    """
+
+    def __init__(self, writer: Callable[[List[Dict]], None], batch_size: int = 100,
+                 flush_interval: float = 0.5, max_pending: int = 10000,
+                 put_timeout: float = 1.0, name: str = 'write-behind'):
+        self._writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.name = name
+
+        self._pending = deque()
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+        self.inline_writes = 0
+
+    def _ensure_thread(self) -> None:
+        # Started on first use, and again in a forked child (threads don't survive fork)
+        if self._thread is None or self._pid != os.getpid():
+            if self._pid is not None:
+                # Rows queued before the fork belong to the parent, which writes them
+                self._pending.clear()
+                self._oldest = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def put(self, row: Dict) -> None:
+        """Queue a row for the next bulk insert"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} buffer is closed")
+            self._ensure_thread()
+
+            deadline = time.monotonic() + self.put_timeout
+            while len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_full.wait(remaining)
+
+            if len(self._pending) < self.max_pending:
+                if not self._pending:
+                    self._oldest = time.monotonic()
+                self._pending.append(row)
+                self.queued += 1
+                if len(self._pending) >= self.batch_size:
+                    self._not_empty.notify()
+                return
+            self.inline_writes += 1
+
+        # Still full after waiting: the caller pays for its own write
+        self._write([row])
+
+    def _take_batch(self) -> List[Dict]:
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        self._oldest = time.monotonic() if self._pending else None
+        self._not_full.notify_all()
+        return batch
+
+    def _requeue(self, batch: List[Dict]) -> None:
+        with self._lock:
+            room = self.max_pending - len(self._pending)
+            if room < len(batch):
+                self.dropped += len(batch) - room
+                batch = batch[len(batch) - room:] if room > 0 else []
+            self._pending.extendleft(reversed(batch))
+            if self._pending and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _write(self, batch: List[Dict]) -> bool:
+        with self._write_lock:
+            try:
+                self._writer(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error flushing {self.name} batch of {len(batch)}: {e}")
+                return False
+            self.written += len(batch)
+            self.batches += 1
+            return True
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._pending and time.monotonic() - self._oldest >= self.flush_interval:
+                        break
+                    timeout = self.flush_interval
+                    if self._oldest is not None:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                    self._not_empty.wait(timeout)
+                if self._closed:
+                    return
+                batch = self._take_batch()
+
+            if not self._write(batch):
+                self._requeue(batch)
+                # Back off instead of hammering a failing database
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> bool:
+        """Write everything queued so far from the calling thread"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+                batch = self._take_batch()
+            if not self._write(batch):
+                self._requeue(batch)
+                return False
+
+    def close(self) -> bool:
+        """Stop the background thread and flush what is left (shutdown hook)"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        return self.flush()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'max_pending': self.max_pending,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'queued': self.queued,
+                'written': self.written,
+                'batches': self.batches,
+                'errors': self.errors,
+                'dropped': self.dropped,
+                'inline_writes': self.inline_writes
+            }
+
+
+def register_shutdown_flush(buffer: WriteBehindBuffer) -> None:
+    """Flush `buffer` when the interpreter exits normally"""
+    atexit.register(buffer.close)
@@ -76,7 +76,7 @@ export interface QuizStatistics {
 }
 
 // API Base URL - Update this to match your Flask backend
-const API_BASE_URL = 'http://localhost:5002/api';
+const API_BASE_URL = 'http://localhost:5000/quiz/api';
 
 export class QuizService {
   private static instance: QuizService;
@@ -84,7 +84,14 @@ export interface UserStats {
 }
 
 // API Base URL - Update this to match your Flask backend
-const API_BASE_URL = 'http://localhost:5001/api';
+const API_BASE_URL = 'http://localhost:5000/edu/api';
+
+// Quiz attempt history is fetched in pages of this size (the API allows up to 500)
+const QUIZ_ATTEMPTS_PAGE_SIZE = 500;
+const QUIZ_ATTEMPT_FIELDS: (keyof QuizAttempt)[] = [
+  'id', 'user_id', 'quiz_id', 'score', 'max_score', 'percentage', 'time_taken',
+  'answers', 'passed', 'attempt_number', 'completed_at',
+];
 
 // Supabase Service Class
 export class SupabaseService {
@@ -208,12 +215,26 @@ export class SupabaseService {
 
   async getUserQuizAttempts(userId: string, quizId?: string): Promise<QuizAttempt[]> {
     try {
-      const endpoint = quizId 
+      const endpoint = quizId
         ? `/user/${userId}/quiz-attempts/${quizId}`
         : `/user/${userId}/quiz-attempts`;
-        
-      const response = await this.apiCall(endpoint);
-      return response.success ? response.data : [];
+      // The API pages its results and leaves `answers` out unless it is asked for
+      const fields = QUIZ_ATTEMPT_FIELDS.join(',');
+      const attempts: QuizAttempt[] = [];
+      let cursor: string | null = null;
+
+      do {
+        const query = `?fields=${fields}&limit=${QUIZ_ATTEMPTS_PAGE_SIZE}` +
+          (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+        const response = await this.apiCall(`${endpoint}${query}`);
+        if (!response.success) {
+          return attempts;
+        }
+        attempts.push(...response.data);
+        cursor = response.next_cursor;
+      } while (cursor);
+
+      return attempts;
     } catch (error) {
       console.error('Error getting quiz attempts:', error);
       return [];